@@ -0,0 +1,85 @@
+"""
+Compares the ONNX Runtime backend ("inference backend") with PyTorch on a fixed corpus: throughput of both and
+whether the ONNX results match the torch results within tolerance.
+
+Run from the src directory:
+    python -m backend.benchmarks.onnx_benchmark [--repeat N] [--batch-size N]
+"""
+import argparse
+import time
+
+from backend.benchmarks.quantization_benchmark import CORPUS, SENTIMENT_MODEL, ENCODER_MODEL
+from backend.operations.onnx_backend import load_onnx_classifier, load_onnx_encoder
+from backend.operations.operation_utils import load_pipeline, load_transformer
+
+SCORE_TOLERANCE = 1e-3
+EMBEDDING_TOLERANCE = 1e-3
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def benchmark_sentiment(repeat: int, batch_size: int) -> bool:
+    texts = CORPUS * repeat
+    torch_classifier = load_pipeline("sentiment-analysis", SENTIMENT_MODEL)
+    onnx_classifier = load_onnx_classifier(SENTIMENT_MODEL)
+
+    torch_time, torch_predictions = timed(lambda: torch_classifier(texts, batch_size=batch_size, truncation=True))
+    onnx_time, onnx_predictions = timed(lambda: onnx_classifier(texts, batch_size=batch_size, truncation=True))
+
+    labels_match = all(a["label"] == b["label"] for a, b in zip(torch_predictions, onnx_predictions))
+    score_difference = max(abs(a["score"] - b["score"]) for a, b in zip(torch_predictions, onnx_predictions))
+
+    print(f"Sentiment ({SENTIMENT_MODEL}, {len(texts)} texts)")
+    print(f"  torch: {len(texts) / torch_time:8.1f} texts/s")
+    print(f"  onnx:  {len(texts) / onnx_time:8.1f} texts/s ({torch_time / onnx_time:.2f}x)")
+    print(f"  labels match: {labels_match}, max score difference: {score_difference:.6f}")
+    return labels_match and score_difference <= SCORE_TOLERANCE
+
+
+def benchmark_encoder(repeat: int, batch_size: int) -> bool:
+    import numpy as np
+    import torch
+
+    texts = CORPUS * repeat
+    tokenizer, model = load_transformer(ENCODER_MODEL)
+    encoder = load_onnx_encoder(ENCODER_MODEL)
+
+    def encode_torch():
+        embeddings = []
+        with torch.no_grad():
+            for i in range(0, len(texts), batch_size):
+                inputs = tokenizer(texts[i:i + batch_size], return_tensors="pt", padding=True, truncation=True,
+                                   max_length=512)
+                hidden = model(**inputs).last_hidden_state
+                mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                embeddings.append(((hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)).numpy())
+        return np.concatenate(embeddings)
+
+    def encode_onnx():
+        return np.concatenate([encoder.encode(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+
+    torch_time, torch_embeddings = timed(encode_torch)
+    onnx_time, onnx_embeddings = timed(encode_onnx)
+    difference = float(np.abs(torch_embeddings - onnx_embeddings).max())
+
+    print(f"Encoder ({ENCODER_MODEL}, {len(texts)} texts)")
+    print(f"  torch: {len(texts) / torch_time:8.1f} texts/s")
+    print(f"  onnx:  {len(texts) / onnx_time:8.1f} texts/s ({torch_time / onnx_time:.2f}x)")
+    print(f"  max embedding difference: {difference:.6f}")
+    return difference <= EMBEDDING_TOLERANCE
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="How often the corpus is repeated.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    matches = benchmark_sentiment(args.repeat, args.batch_size)
+    matches = benchmark_encoder(args.repeat, args.batch_size) and matches
+    if not matches:
+        raise SystemExit("ONNX results differ from torch beyond tolerance.")
@@ -0,0 +1,89 @@
+"""
+Compares fp32 and int8 ("inference precision") transformer inference on a fixed corpus:
+throughput of both precisions and how far the int8 outputs drift from the fp32 ones.
+
+Run from the src directory:
+    python -m backend.benchmarks.quantization_benchmark [--repeat N] [--batch-size N]
+"""
+import argparse
+import time
+
+from backend.operations.operation_utils import load_pipeline, load_transformer, FP32, INT8
+
+SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+ENCODER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+CORPUS = [
+    "The lecture was well structured and the examples helped a lot.",
+    "I did not understand the exercises, the instructions were confusing.",
+    "Great course, I would recommend it to every student.",
+    "The online platform crashed twice during the exam.",
+    "Feedback on the assignments came quickly and was very helpful.",
+    "Too much content for the little time we had.",
+    "The tutor answered all questions patiently.",
+    "I hate that the slides were only published after the lecture.",
+    "The group project was fun, but the grading felt unfair.",
+    "Overall an average course without any highlights.",
+    "The reading list was long, but the texts were interesting.",
+    "Audio quality of the recordings was terrible.",
+]
+
+
+def benchmark_sentiment(repeat: int, batch_size: int):
+    texts = CORPUS * repeat
+    results = {}
+    for precision in (FP32, INT8):
+        classifier = load_pipeline("sentiment-analysis", SENTIMENT_MODEL, precision=precision)
+        classifier(texts[:batch_size], batch_size=batch_size, truncation=True)  # warm up
+        start = time.perf_counter()
+        predictions = classifier(texts, batch_size=batch_size, truncation=True)
+        results[precision] = (time.perf_counter() - start, predictions)
+
+    fp32_time, fp32_predictions = results[FP32]
+    int8_time, int8_predictions = results[INT8]
+    agreement = sum(a["label"] == b["label"] for a, b in zip(fp32_predictions, int8_predictions)) / len(texts)
+    score_drift = max(abs(a["score"] - b["score"]) for a, b in zip(fp32_predictions, int8_predictions))
+
+    print(f"Sentiment ({SENTIMENT_MODEL}, {len(texts)} texts)")
+    print(f"  fp32: {len(texts) / fp32_time:8.1f} texts/s")
+    print(f"  int8: {len(texts) / int8_time:8.1f} texts/s ({fp32_time / int8_time:.2f}x)")
+    print(f"  label agreement: {agreement:.1%}, max score difference: {score_drift:.4f}")
+
+
+def benchmark_encoder(repeat: int, batch_size: int):
+    import torch
+
+    texts = CORPUS * repeat
+    results = {}
+    for precision in (FP32, INT8):
+        tokenizer, model = load_transformer(ENCODER_MODEL, precision=precision)
+        start = time.perf_counter()
+        embeddings = []
+        with torch.no_grad():
+            for i in range(0, len(texts), batch_size):
+                inputs = tokenizer(texts[i:i + batch_size], return_tensors="pt", padding=True, truncation=True,
+                                   max_length=512)
+                hidden = model(**inputs).last_hidden_state
+                mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                embeddings.append((hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9))
+        results[precision] = (time.perf_counter() - start, torch.cat(embeddings))
+
+    fp32_time, fp32_embeddings = results[FP32]
+    int8_time, int8_embeddings = results[INT8]
+    similarity = torch.nn.functional.cosine_similarity(fp32_embeddings, int8_embeddings, dim=1)
+
+    print(f"Encoder ({ENCODER_MODEL}, {len(texts)} texts)")
+    print(f"  fp32: {len(texts) / fp32_time:8.1f} texts/s")
+    print(f"  int8: {len(texts) / int8_time:8.1f} texts/s ({fp32_time / int8_time:.2f}x)")
+    print(f"  cosine similarity to fp32 embeddings: mean {similarity.mean().item():.4f}, "
+          f"min {similarity.min().item():.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="How often the corpus is repeated.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    benchmark_sentiment(args.repeat, args.batch_size)
+    benchmark_encoder(args.repeat, args.batch_size)
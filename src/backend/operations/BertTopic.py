@@ -1,9 +1,12 @@
+from backend.operations.batching import padded_batches, restore_order
 from backend.operations.operation_utils import load_sentence_transformer, load_transformer
+from backend.storage.embeddingStore import EmbeddingStore, EMBEDDINGS
 from backend.transferObjects.eventTransferObjects import StepState, LogLevels
 
 from backend.transferObjects.visualization import PlotlyViz, MultiVisualization
 from backend.types.config import Config
 from backend.types.frontendNotifier import FrontendNotifier
+from backend.types.instrumentation import span, TOKENIZE, FORWARD, POST_PROCESS
 from backend.types.operation import StepOperation
 from backend.types.payload import Payload
 
@@ -18,6 +21,15 @@ class BertTopicOperation(StepOperation):
     Operation class for BERTopic modeling with optional verbose progress reporting.
     """
 
+    @classmethod
+    def requiredModels(cls, config: Config):
+        loaders = [lambda notifier: load_sentence_transformer("all-MiniLM-L6-v2")]
+        if config["topic modeling"].get("Use verbose progress reporting", False):
+            precision = config.get("inference precision", "fp32")
+            loaders.append(lambda notifier: load_transformer("distilbert-base-multilingual-cased",
+                                                             precision=precision))
+        return loaders
+
     def initialize(self, config: Config, notifier: FrontendNotifier):
         """Delayed imports for BERTopic core functionality"""
         super().initialize(config, notifier)
@@ -55,6 +67,9 @@ class BertTopicOperation(StepOperation):
 
         # Load from local cache, inject into pipeline
         emb_model = load_sentence_transformer("all-MiniLM-L6-v2")
+        self.sentence_model = emb_model
+        self.embedding_space = EmbeddingStore.space("all-MiniLM-L6-v2", "sentence-transformers",
+                                                    getattr(emb_model, "max_seq_length", None))
 
         self.topic_model = BERTopic(
             embedding_model=emb_model,
@@ -78,82 +93,64 @@ class BertTopicOperation(StepOperation):
         import torch
 
         notifier.log("Verbose progress reporting enabled", LogLevels.INFO)
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        precision = self.config.get("inference precision", "fp32")
 
         notifier.log(f"Initializing DistilBERT model and tokenizer for {self.language}...", LogLevels.INFO)
 
+        # The shared model is already in eval mode on its inference device
         self.tokenizer, self.embedding_model = load_transformer(
-            "distilbert-base-multilingual-cased"
+            "distilbert-base-multilingual-cased", precision=precision
         )
+        self.device = self.embedding_model.device
 
-        if torch.cuda.device_count() > 1:
+        if self.device.type == "cuda" and torch.cuda.device_count() > 1:
             notifier.log(f"Using {torch.cuda.device_count()} GPUs", LogLevels.INFO)
+            # Wraps the shared model without modifying it
             self.embedding_model = torch.nn.DataParallel(self.embedding_model)
-
-        self.embedding_model.to(self.device).eval()
         self.batch_size = self.config["topic modeling"].get("batch_size", 64)
+        self.embedding_space = EmbeddingStore.space("distilbert-base-multilingual-cased", "mean", 512,
+                                                    precision=precision)
 
     def compute_embeddings(self, texts, notifier):
         """Delayed imports for embedding computation"""
-        import numpy as np
         import torch
-        from torch.utils.data import DataLoader
         from torch.cuda.amp import autocast
 
-        # Define dataset class here to defer torch imports
-        class TextDataset(torch.utils.data.Dataset):
-            def __init__(self, texts, tokenizer, max_length=512):
-                self.texts = texts
-                self.tokenizer = tokenizer
-                self.max_length = max_length
-
-            def __len__(self): return len(self.texts)
-
-            def __getitem__(self, idx):
-                return self.tokenizer(
-                    self.texts[idx],
-                    padding='max_length',
-                    truncation=True,
-                    max_length=self.max_length,
-                    return_tensors='pt'
-                )
-
         notifier.log("Starting embedding creation...", LogLevels.INFO)
         notifier.sendStatus(StepState.RUNNING, progress=10)
 
-        dataset = TextDataset(texts, self.tokenizer)
-        dataloader = DataLoader(
-            dataset,
-            batch_size=self.batch_size,
-            num_workers=4,
-            pin_memory=True,
-            prefetch_factor=2,
-            persistent_workers=True
-        )
+        # Texts of similar length are batched together and padded only to the longest of their batch.
+        with span(TOKENIZE):
+            batches, inputs = padded_batches(self.tokenizer, texts, max_length=512, max_batch_size=self.batch_size)
 
         embeddings = []
-        total_batches = len(dataloader)
-        for i, batch in enumerate(dataloader, 1):
+        total_batches = len(batches)
+        for i in range(1, total_batches + 1):
+            # Padding a batch is part of the tokenization
+            with span(TOKENIZE):
+                batch = next(inputs)
             with torch.no_grad():
                 with autocast():  # Enable mixed precision
-                    input_ids = batch['input_ids'].squeeze(1).to(self.device, non_blocking=True)
-                    attention_mask = batch['attention_mask'].squeeze(1).to(self.device, non_blocking=True)
-                    outputs = self.embedding_model(input_ids=input_ids, attention_mask=attention_mask)
+                    with span(FORWARD):
+                        input_ids = batch['input_ids'].to(self.device, non_blocking=True)
+                        attention_mask = batch['attention_mask'].to(self.device, non_blocking=True)
+                        outputs = self.embedding_model(input_ids=input_ids, attention_mask=attention_mask)
 
                     # Compute mean of the last hidden state as sentence embeddings
-                    last_hidden_state = outputs.last_hidden_state
-                    mask = attention_mask.unsqueeze(-1).expand(last_hidden_state.size()).float()
-                    masked_hidden_state = last_hidden_state * mask
-                    summed = torch.sum(masked_hidden_state, dim=1)
-                    counts = torch.clamp(mask.sum(dim=1), min=1e-9)
-                    mean_embeddings = summed / counts
-                    embeddings.append(mean_embeddings.cpu().numpy())
+                    with span(POST_PROCESS):
+                        last_hidden_state = outputs.last_hidden_state
+                        mask = attention_mask.unsqueeze(-1).expand(last_hidden_state.size()).float()
+                        masked_hidden_state = last_hidden_state * mask
+                        summed = torch.sum(masked_hidden_state, dim=1)
+                        counts = torch.clamp(mask.sum(dim=1), min=1e-9)
+                        mean_embeddings = summed / counts
+                        embeddings.append(mean_embeddings.cpu().numpy())
 
             # Update progress
             progress = 10 + (i / total_batches) * 30  # Embedding takes from 10% to 40%
             notifier.sendStatus(StepState.RUNNING, progress=int(progress))
 
-        embeddings = np.vstack(embeddings)
+        embeddings = restore_order(batches, embeddings)
         notifier.sendStatus(StepState.RUNNING, progress=40)
         notifier.log("Embedding creation completed.", LogLevels.INFO)
         return embeddings
@@ -182,8 +179,10 @@ class BertTopicOperation(StepOperation):
             notifier.sendStatus(StepState.RUNNING, progress=0)
 
             if self.use_verbose:
-                # Verbose Mode: Manual Embedding Creation
-                embeddings = self.compute_embeddings(texts, notifier)
+                # Verbose Mode: Manual Embedding Creation, only for texts that were not embedded before
+                embeddings = EMBEDDINGS.getOrCompute(self.embedding_space, texts,
+                                                     lambda missing: self.compute_embeddings(missing, notifier),
+                                                     notifier)
 
                 # Fitting BERTopic with precomputed embeddings
                 notifier.log("Fitting BERTopic model to embeddings...", LogLevels.INFO)
@@ -200,17 +199,23 @@ class BertTopicOperation(StepOperation):
                 notifier.sendStatus(StepState.RUNNING, progress=85)
             else:
                 # Original Mode: Standard BERTopic Workflow
+                # The embeddings BERTopic would compute with its model (twice, for fit and transform), taken from
+                # the embedding store where possible
+                embeddings = EMBEDDINGS.getOrCompute(
+                    self.embedding_space, texts,
+                    lambda missing: self.sentence_model.encode(missing, show_progress_bar=False), notifier)
+
                 # Fitting BERTopic
                 notifier.log("Fitting BERTopic model to data...", LogLevels.INFO)
                 notifier.sendStatus(StepState.RUNNING, progress=10)
-                self.topic_model.fit(texts)
+                self.topic_model.fit(texts, embeddings=embeddings)
                 notifier.log("BERTopic model fitting completed.", LogLevels.INFO)
                 notifier.sendStatus(StepState.RUNNING, progress=50)
 
                 # Transforming data
                 notifier.log("Transforming data to assign topics...", LogLevels.INFO)
                 notifier.sendStatus(StepState.RUNNING, progress=70)
-                topics, probs = self.topic_model.transform(texts)
+                topics, probs = self.topic_model.transform(texts, embeddings=embeddings)
                 notifier.log("Topic assignment completed.", LogLevels.INFO)
                 notifier.sendStatus(StepState.RUNNING, progress=85)
 
@@ -9,10 +9,16 @@ from backend.types.config import Config
 from backend.types.frontendNotifier import FrontendNotifier
 from backend.types.operation import ParallelizableTextOperation
 from backend.types.payload import Payload
+from backend.types.threadPolicy import ThreadPolicy
 
 
 class DataPreparationOperation(ParallelizableTextOperation):
 
+    @classmethod
+    def requiredModels(cls, config: Config):
+        language = config["remove stopwords"]["language"]
+        return [lambda notifier: load_spacy_model_on_demand(language, notifier)]
+
     def initialize(self, config: Config, notifier: FrontendNotifier):
         super().initialize(config, notifier)
         language = self.config["remove stopwords"]["language"]
@@ -26,10 +32,7 @@ class DataPreparationOperation(ParallelizableTextOperation):
 
 
 
-    def single_cell_operation(self, notifier: FrontendNotifier, payload: Payload, text: str) -> str:
-
-        stopword_counter = Counter()
-
+    def _normalize(self, text: str) -> str:
         # Apply operations based on config
         if self.do_lowercase:
             text = text.lower()
@@ -37,18 +40,18 @@ class DataPreparationOperation(ParallelizableTextOperation):
             text = ''.join(char for char in text if ord(char) < 128)
         if self.do_remove_punctuation:
             text = re.sub(r'[^\\w\\s]', '', text)
+        return text
 
-        # Remove stopwords (and count those removed) if requested.
-        if self.do_stopwords:
-            doc = self.nlp(text)
-            filtered_tokens = []
-            for token in doc:
-                if token.is_stop:
-                    stopword_counter[token.text.lower()] += 1
-                else:
-                    filtered_tokens.append(token.lemma_ if self.do_lemmatize else token.text)
-            text = ' '.join(filtered_tokens)
+    def _removeStopwords(self, doc, stopword_counter: Counter) -> str:
+        filtered_tokens = []
+        for token in doc:
+            if token.is_stop:
+                stopword_counter[token.text.lower()] += 1
+            else:
+                filtered_tokens.append(token.lemma_ if self.do_lemmatize else token.text)
+        return ' '.join(filtered_tokens)
 
+    def _finalize(self, text: str) -> str:
         # Combine lowercasing and ASCII removal in one pass.
         if self.do_lowercase or self.do_no_ascii:
             new_chars = []
@@ -60,7 +63,9 @@ class DataPreparationOperation(ParallelizableTextOperation):
                     continue
                 new_chars.append(new_char)
             text = ''.join(new_chars)
+        return text
 
+    def _visualize(self, payload: Payload, stopword_counter: Counter):
         # Prepare a visually improved HTML visualization for stopword removal.
         top_stopwords = stopword_counter.most_common(10)
         stats_html = """
@@ -86,7 +91,48 @@ class DataPreparationOperation(ParallelizableTextOperation):
         """
 
         payload.addVisualization(HTMLViz(stats_html))
+        for word, count in stopword_counter.items():
+            payload.summarize("Removed stopwords", word, count)
+
+    def single_cell_operation(self, notifier: FrontendNotifier, payload: Payload, text: str) -> str:
+
+        stopword_counter = Counter()
+
+        text = self._normalize(text)
+
+        # Remove stopwords (and count those removed) if requested.
+        if self.do_stopwords:
+            text = self._removeStopwords(self.nlp(text), stopword_counter)
+
+        text = self._finalize(text)
+
+        self._visualize(payload, stopword_counter)
         notifier.sendStatus(StepState.SUCCESS, progress=100.0)
         return text
 
-        
+    def batch_operation(self, notifier: FrontendNotifier, payload: Payload, texts: list) -> list:
+        results = []
+        valid = []
+        for text in texts:
+            try:
+                valid.append((len(results), self._normalize(text)))
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+
+        # Let spaCy process all texts of the batch in one go.
+        if self.do_stopwords:
+            docs = list(self.nlp.pipe([text for _, text in valid],
+                                      **ThreadPolicy.pipeOptions(self.threadPolicy, len(valid))))
+            if len(docs) != len(valid):
+                raise ValueError(f"spaCy returned {len(docs)} documents for {len(valid)} texts.")
+        else:
+            docs = [None] * len(valid)
+
+        for (i, text), doc in zip(valid, docs):
+            stopword_counter = Counter()
+            if doc is not None:
+                text = self._removeStopwords(doc, stopword_counter)
+            results[i] = self._finalize(text)
+            self._visualize(payload, stopword_counter)
+        return results
@@ -7,10 +7,16 @@ from backend.types.config import Config
 from backend.types.frontendNotifier import FrontendNotifier
 from backend.types.operation import ParallelizableTextOperation
 from backend.types.payload import Payload
+from backend.types.threadPolicy import ThreadPolicy
 
 
 class KeywordExtractionOperation(ParallelizableTextOperation):
 
+    @classmethod
+    def requiredModels(cls, config: Config):
+        language_model = config.get("keyword extraction", {}).get("language_model", "en_core_web_sm")
+        return [lambda notifier: load_spacy_model_on_demand(language_model, notifier)]
+
     def initialize(self, config: Config, notifier: FrontendNotifier):
         self.config = config
         # Get input and output column names from the configuration
@@ -26,14 +32,7 @@ class KeywordExtractionOperation(ParallelizableTextOperation):
         self.nlp = load_spacy_model_on_demand(self.language_model, notifier)
         notifier.log("Keyword Extraction Operation initialized successfully.", LogLevels.INFO)
 
-    def single_cell_operation(self, notifier: FrontendNotifier, payload: Payload, text: str) -> str:
-        if not text or not isinstance(text, str):
-            notifier.sendStatus(StepState.SUCCESS, progress=100)
-            return ""
-
-        # Process the text with spaCy.
-        doc = self.nlp(text)
-
+    def _extractKeywords(self, doc) -> list:
         # Consider only alphabetic tokens that are not stopwords.
         tokens = [token.text.lower() for token in doc if token.is_alpha and not token.is_stop]
 
@@ -42,8 +41,9 @@ class KeywordExtractionOperation(ParallelizableTextOperation):
 
         # Get the most common tokens as keywords.
         most_common = token_counts.most_common(self.num_keywords)
-        keywords = [word for word, _ in most_common]
+        return [word for word, _ in most_common]
 
+    def _visualize(self, payload: Payload, text: str, keywords: list):
         # Create an HTML visualization for this cell.
         visual_html = f"""
         <div style="border:1px solid #ddd; border-radius: 4px; padding: 10px; margin: 10px 0; font-family: Arial, sans-serif;">
@@ -53,9 +53,35 @@ class KeywordExtractionOperation(ParallelizableTextOperation):
         </div>
         """
         payload.addVisualization(HTMLViz(visual_html))
+        for keyword in keywords:
+            payload.summarize("Most frequent keywords", keyword)
+
+    def single_cell_operation(self, notifier: FrontendNotifier, payload: Payload, text: str) -> str:
+        if not text or not isinstance(text, str):
+            notifier.sendStatus(StepState.SUCCESS, progress=100)
+            return ""
+
+        # Process the text with spaCy.
+        keywords = self._extractKeywords(self.nlp(text))
+        self._visualize(payload, text, keywords)
 
         # Send a success status after processing the cell.
         notifier.sendStatus(StepState.SUCCESS, progress=100)
 
         # Return the keywords as a comma-separated string.
         return ", ".join(keywords)
+
+    def batch_operation(self, notifier: FrontendNotifier, payload: Payload, texts: list) -> list:
+        results = ["" for _ in texts]
+        valid_indices = [i for i, text in enumerate(texts) if text and isinstance(text, str)]
+
+        # Let spaCy process all texts of the batch in one go.
+        docs = list(self.nlp.pipe([texts[i] for i in valid_indices],
+                                  **ThreadPolicy.pipeOptions(self.threadPolicy, len(valid_indices))))
+        if len(docs) != len(valid_indices):
+            raise ValueError(f"spaCy returned {len(docs)} documents for {len(valid_indices)} texts.")
+        for i, doc in zip(valid_indices, docs):
+            keywords = self._extractKeywords(doc)
+            self._visualize(payload, texts[i], keywords)
+            results[i] = ", ".join(keywords)
+        return results
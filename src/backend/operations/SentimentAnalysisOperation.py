@@ -1,4 +1,6 @@
 # backend/operations/sentiment_analysis_operation.py
+import threading
+
 from backend.transferObjects.eventTransferObjects import StepState, LogLevels
 from backend.transferObjects.visualization import HTMLViz
 
@@ -8,10 +10,37 @@ from backend.types.config import Config
 from backend.types.frontendNotifier import FrontendNotifier
 from backend.types.operation import ParallelizableOperation
 from backend.types.payload import Payload
+from backend.operations import long_texts
 from backend.operations.operation_utils import load_pipeline
 
 
 class SentimentAnalysisOperation(ParallelizableOperation, ABC):
+    # Torch releases the GIL during forward passes, so batches may run in threads (see serialize_preprocessing).
+    THREAD_SAFE = True
+
+    SENTIMENT_MODELS = {
+        "en": "distilbert-base-uncased-finetuned-sst-2-english",
+        "de": "oliverguhr/german-sentiment-bert"
+    }
+
+    @classmethod
+    def requiredModels(cls, config: Config):
+        model_name = cls.SENTIMENT_MODELS.get(config["sentiment analysis"]["language"])
+        if model_name is None:
+            return []
+        backend = config.get("inference backend", "torch")
+        precision = config.get("inference precision", "fp32")
+        return [lambda notifier: cls._loadClassifier(model_name, backend, precision, notifier)]
+
+    @staticmethod
+    def _loadClassifier(model_name: str, backend: str, precision: str, notifier: FrontendNotifier):
+        if backend == "onnx":
+            try:
+                from backend.operations.onnx_backend import load_onnx_classifier
+                return load_onnx_classifier(model_name, precision=precision)
+            except ImportError as e:
+                notifier.log(f"ONNX Runtime is not available ({e}), using torch instead.", LogLevels.WARN)
+        return load_pipeline("sentiment-analysis", model_name=model_name, precision=precision)
 
     def initialize(self, config: Config, notifier: FrontendNotifier):
         super().initialize(config, notifier)
@@ -19,54 +48,87 @@ class SentimentAnalysisOperation(ParallelizableOperation, ABC):
         self.language = config["sentiment analysis"]["language"]
 
         self.output_prefix = config["sentiment analysis"].get("output columns prefix", "sentiment_")
+        self.precision = config.get("inference precision", "fp32")
+        self.backend = config.get("inference backend", "torch")
+        self.long_texts = long_texts.check_mode(config.get("long texts", long_texts.TRUNCATE))
 
         notifier.log("Initializing Sentiment Analysis Operation for language " + self.language, LogLevels.INFO)
 
-        if self.language == "en":
-            self.sentiment_pipeline = load_pipeline("sentiment-analysis",
-                                                    model_name="distilbert-base-uncased-finetuned-sst-2-english")
-        elif self.language == "de":
-            self.sentiment_pipeline = load_pipeline("sentiment-analysis", model_name="oliverguhr/german-sentiment-bert")
-        else:
+        if self.language not in self.SENTIMENT_MODELS:
             raise ValueError("Unsupported language for sentiment analysis.")
+        self.sentiment_pipeline = self._loadClassifier(self.SENTIMENT_MODELS[self.language], self.backend,
+                                                       self.precision, notifier)
+        # The lock that guards the tokenizer inside the classifier, or one of this instance if it has none
+        self._tokenization_lock = getattr(self.sentiment_pipeline, "tokenization_lock", None) or \
+            getattr(self.sentiment_pipeline, "tokenizer_lock", None) or threading.Lock()
         notifier.log("Sentiment Analysis Operation initialized successfully. ", LogLevels.INFO)
 
+    def _predict(self, texts: list) -> list:
+        """
+        Returns the {"label", "score"} prediction of each text. Unless long texts are truncated, texts longer than
+        the model's input are split into windows, all windows are classified in one batched call and the class
+        probabilities of the windows of each text are pooled.
+        """
+        if self.long_texts == long_texts.TRUNCATE:
+            return self.sentiment_pipeline(texts, padding=True, truncation=True, batch_size=len(texts))
+
+        import numpy as np
+
+        tokenizer = self.sentiment_pipeline.tokenizer
+        with self._tokenization_lock:
+            windows, owners, lengths = long_texts.window_texts(tokenizer, texts,
+                                                               max_length=min(tokenizer.model_max_length, 512))
+        predictions = self.sentiment_pipeline(windows, padding=True, truncation=True, batch_size=self.batch_size,
+                                              top_k=None)
+        labels = sorted({prediction["label"] for window in predictions for prediction in window})
+        columns = {label: column for column, label in enumerate(labels)}
+        probabilities = np.zeros((len(windows), len(labels)), dtype=np.float32)
+        for row, window in enumerate(predictions):
+            for prediction in window:
+                probabilities[row, columns[prediction["label"]]] = prediction["score"]
+        pooled = long_texts.pool_windows(probabilities, owners, lengths, len(texts), self.long_texts)
+        return [{"label": labels[int(row.argmax())], "score": float(row.max())} for row in pooled]
+
     def getColumnNames(self) -> list:
         return [self.output_prefix + "label", self.output_prefix + "score"]
 
+    def _visualize(self, payload: Payload, text: str, label: str, score: float):
+        # Sample text logic
+        text_sample = text if len(text) <= self.text_sample_size else text[:self.text_sample_size] + "..."
+
+        # Styling based on label
+        label_color = "#52c41a" if label == "POSITIVE" else "#f5222d"
+
+        stats_html = f"""
+        <div style="font-family: Arial, sans-serif; padding: 20px; border-radius: 8px; background: #f9f9f9; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
+            <h4 style="color: #333; text-align: center; margin-bottom: 20px;">Sentiment Analysis Result</h4>
+            <div style="display: flex; justify-content: space-between; align-items: center; padding: 10px; background: #fff; border-radius: 6px; border: 1px solid #ddd;">
+                <div style="flex: 1; margin-right: 10px;">
+                    <p style="margin: 0; color: #555;"><strong>Text:</strong></p>
+                    <p style="margin: 0; color: #333; font-style: italic;">"{text_sample}"</p>
+                </div>
+                <div style="text-align: center; flex: 0 0 100px;">
+                    <p style="margin: 0; font-size: 14px; color: #555;"><strong>Label:</strong></p>
+                    <p style="margin: 5px 0; font-size: 16px; font-weight: bold; color: {label_color};">{label}</p>
+                </div>
+                <div style="text-align: center; flex: 0 0 100px;">
+                    <p style="margin: 0; font-size: 14px; color: #555;"><strong>Score:</strong></p>
+                    <p style="margin: 5px 0; font-size: 16px; font-weight: bold; color: #1890ff;">{score}</p>
+                </div>
+            </div>
+        </div>
+        """
+
+        payload.addVisualization(HTMLViz(stats_html))
+        payload.summarize("Sentiment labels", label)
+
     def single_cell_operation(self, notifier: FrontendNotifier, payload: Payload, text: str):
         try:
-            result = self.sentiment_pipeline(text, padding=True, truncation=True)[0]
+            result = self._predict([text])[0]
             label = result['label']
             score = round(result['score'], 4)
 
-            # Sample text logic
-            text_sample = text if len(text) <= self.text_sample_size else text[:self.text_sample_size] + "..."
-
-            # Styling based on label
-            label_color = "#52c41a" if label == "POSITIVE" else "#f5222d"
-
-            stats_html = f"""
-            <div style="font-family: Arial, sans-serif; padding: 20px; border-radius: 8px; background: #f9f9f9; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
-                <h4 style="color: #333; text-align: center; margin-bottom: 20px;">Sentiment Analysis Result</h4>
-                <div style="display: flex; justify-content: space-between; align-items: center; padding: 10px; background: #fff; border-radius: 6px; border: 1px solid #ddd;">
-                    <div style="flex: 1; margin-right: 10px;">
-                        <p style="margin: 0; color: #555;"><strong>Text:</strong></p>
-                        <p style="margin: 0; color: #333; font-style: italic;">"{text_sample}"</p>
-                    </div>
-                    <div style="text-align: center; flex: 0 0 100px;">
-                        <p style="margin: 0; font-size: 14px; color: #555;"><strong>Label:</strong></p>
-                        <p style="margin: 5px 0; font-size: 16px; font-weight: bold; color: {label_color};">{label}</p>
-                    </div>
-                    <div style="text-align: center; flex: 0 0 100px;">
-                        <p style="margin: 0; font-size: 14px; color: #555;"><strong>Score:</strong></p>
-                        <p style="margin: 5px 0; font-size: 16px; font-weight: bold; color: #1890ff;">{score}</p>
-                    </div>
-                </div>
-            </div>
-            """
-
-            payload.addVisualization(HTMLViz(stats_html))
+            self._visualize(payload, text, label, score)
             notifier.sendStatus(StepState.SUCCESS, progress=100.0)
             return label, score
 
@@ -75,3 +137,18 @@ class SentimentAnalysisOperation(ParallelizableOperation, ABC):
             notifier.log(f"Error in sentiment analysis: {e}", LogLevels.ERROR)
             notifier.sendStatus(StepState.FAILED, progress=100.0)
             return None
+
+    def batch_operation(self, notifier: FrontendNotifier, payload: Payload, texts: list) -> list:
+        # Only valid texts are passed to the model; all others fail individually.
+        valid_indices = [i for i, text in enumerate(texts) if isinstance(text, str)]
+        results = [ValueError(f"Cannot analyse sentiment of {text!r}.") for text in texts]
+        if not valid_indices:
+            return results
+
+        predictions = self._predict([texts[i] for i in valid_indices])
+        for i, prediction in zip(valid_indices, predictions):
+            label = prediction['label']
+            score = round(prediction['score'], 4)
+            self._visualize(payload, texts[i], label, score)
+            results[i] = (label, score)
+        return results
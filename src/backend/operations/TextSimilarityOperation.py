@@ -1,25 +1,53 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas
 
 from backend.transferObjects.eventTransferObjects import StepState, LogLevels
 from backend.transferObjects.visualization import MultiVisualization, HTMLViz, SimpleTextViz
 
-import time
-
+from backend.types import instrumentation
 from backend.types.config import Config
+from backend.types.instrumentation import span, TOKENIZE, FORWARD, POST_PROCESS
 from backend.types.frontendNotifier import FrontendNotifier
 from backend.types.operation import StepOperation
 from backend.types.payload import Payload
 
+from backend.operations import heatmap, long_texts
+from backend.operations.batching import map_encoded_batches
 from backend.operations.operation_utils import load_transformer
+from backend.storage.embeddingStore import EmbeddingStore, EMBEDDINGS
 
 
 class TextSimilarityAnalysisOperation(StepOperation):
-    def initialize(self, config: Config, notifier: FrontendNotifier):
-
-        print("Importing TextSimilarity deps")
-        import torch
-        print("Done.")
+    # Number of texts embedded per forward pass, unless the config defines a "batch size"
+    DEFAULT_BATCH_SIZE = 32
+    # Tokens (texts x padded length) per forward pass; batches of long texts hold fewer than "batch size" texts
+    MAX_BATCH_TOKENS = 16384
+    # Rows of the first column compared with all texts of the second column at once in cross comparison
+    TILE_ROWS = 1024
+    # Outputs of cross comparison: the dense similarity matrix, or an edge list of the most similar pairs
+    MATRIX = "matrix"
+    EDGES = "edges"
+
+    @classmethod
+    def requiredModels(cls, config: Config):
+        model_name = config.get("transformer model", "distilbert-base-uncased")
+        precision = config.get("inference precision", "fp32")
+        if config.get("inference backend", "torch") == "onnx":
+            return [lambda notifier: cls._loadOnnxEncoder(model_name, precision, notifier)]
+        return [lambda notifier: load_transformer(model_name=model_name, precision=precision)]
+
+    @staticmethod
+    def _loadOnnxEncoder(model_name: str, precision: str, notifier: FrontendNotifier):
+        try:
+            from backend.operations.onnx_backend import load_onnx_encoder
+            return load_onnx_encoder(model_name, precision=precision)
+        except ImportError as e:
+            notifier.log(f"ONNX Runtime is not available ({e}), using torch instead.", LogLevels.WARN)
+            return None
 
+    def initialize(self, config: Config, notifier: FrontendNotifier):
         self.config = config
         # Read two input column names from the configuration.
         self.first_column = config.get("first text column", "text1")
@@ -28,53 +56,219 @@ class TextSimilarityAnalysisOperation(StepOperation):
         self.output_column = config.get("output column", "similarity")
 
         self.cross_compare = config.get("Do cross comparison", False)
+        self.cross_output = config.get("cross comparison output", self.MATRIX)
+        if self.cross_output not in (self.MATRIX, self.EDGES):
+            raise ValueError(f"Unsupported cross comparison output '{self.cross_output}'.")
+        self.threshold = float(config.get("similarity threshold", 0.8))
+        self.top_k = max(0, int(config.get("top k", 0) or 0))
+        self.heatmap_aggregation = config.get("heatmap aggregation", heatmap.MAX)
+        if self.heatmap_aggregation not in heatmap.AGGREGATIONS:
+            raise ValueError(f"Unsupported heatmap aggregation '{self.heatmap_aggregation}'.")
+
+        batch_size = config.get("batch size", None)
+        self.batch_size = max(1, int(batch_size)) if batch_size else self.DEFAULT_BATCH_SIZE
+        # Forward passes release the GIL, so batches can be embedded in parallel threads.
+        self.workers = max(1, int(config.get("workers", 1) or 1))
+        self._tokenizer_lock = threading.Lock()
 
         # Transformer model types
         self.model_name = config.get("transformer model", "distilbert-base-uncased")
         notifier.log(f"Loading transformer model and tokenizer '{self.model_name}' for text similarity...",
                      LogLevels.INFO)
-        self.tokenizer, self.model = load_transformer(model_name=self.model_name)
-        self.model.eval()
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
+        self.precision = config.get("inference precision", "fp32")
+        # With the ONNX backend, embeddings are numpy arrays and torch is not needed at all.
+        self.encoder = None
+        if config.get("inference backend", "torch") == "onnx":
+            self.encoder = self._loadOnnxEncoder(self.model_name, self.precision, notifier)
+        # Embeddings differ slightly between backends and precisions, so they are stored separately.
+        backend = "onnx" if self.encoder is not None else "torch"
+        self.long_texts = long_texts.check_mode(config.get("long texts", long_texts.TRUNCATE))
+        self.embedding_space = EmbeddingStore.space(self.model_name, "mean", 512, precision=self.precision,
+                                                    backend=backend, long_texts=self.long_texts)
+        if self.encoder is not None:
+            notifier.log("Text Similarity Analysis Operation initialized using ONNX Runtime.", LogLevels.INFO)
+            return
+
+        print("Importing TextSimilarity deps")
+        import torch
+        print("Done.")
+
+        # The shared model is already in eval mode on its inference device
+        self.tokenizer, self.model = load_transformer(model_name=self.model_name, precision=self.precision)
+        self.device = self.model.device
         notifier.log("Text Similarity Analysis Operation initialized using transformer model.", LogLevels.INFO)
 
     def compute_embedding(self, text: str):
         """Handle varying hidden sizes automatically"""
+        return self.compute_embeddings([text])
+
+    def compute_embeddings(self, texts: list):
+        """
+        Embeds a batch of texts in one forward pass, padded to the longest text of the batch.
+        Returns one mean pooled embedding per text (a torch tensor, or a numpy array with the ONNX backend).
+        """
+        if self.encoder is not None:
+            return self.encoder.encode(texts)
+
+        # Fast tokenizers must not be used by several threads at once.
+        with span(TOKENIZE), self._tokenizer_lock:
+            inputs = self.tokenizer(list(texts), return_tensors="pt", padding=True, truncation=True, max_length=512)
+        return self._embedInputs(inputs)
+
+    def _embedInputs(self, inputs):
+        """
+        Mean pooled embeddings (a torch tensor) of tokenized and padded inputs.
+        """
         import torch
         from torch import no_grad, clamp
 
-        inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True, max_length=512)
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
 
-        with no_grad():
+        with span(FORWARD), no_grad():
             outputs = self.model(**inputs)
 
-        # Unified pooling logic
-        if hasattr(outputs, "last_hidden_state"):
-            embeddings = outputs.last_hidden_state
-        else:
-            embeddings = outputs[0]  # Handle models without explicit last_hidden_state
+        with span(POST_PROCESS):
+            # Unified pooling logic
+            if hasattr(outputs, "last_hidden_state"):
+                embeddings = outputs.last_hidden_state
+            else:
+                embeddings = outputs[0]  # Handle models without explicit last_hidden_state
 
-        if "attention_mask" in inputs and inputs["attention_mask"].numel() > 0:
-            attention_mask = inputs["attention_mask"]
+            if "attention_mask" in inputs and inputs["attention_mask"].numel() > 0:
+                attention_mask = inputs["attention_mask"]
+            else:
+                # Create a mask of all ones if attention_mask is missing or empty
+                attention_mask = torch.ones(embeddings.size(0), embeddings.size(1), device=self.device)
+            input_mask_expanded = attention_mask.unsqueeze(-1).expand(embeddings.size()).float()
+            sum_embeddings = (embeddings * input_mask_expanded).sum(dim=1)
+            sum_mask = clamp(input_mask_expanded.sum(dim=1), min=1e-9)
+            return sum_embeddings / sum_mask
+
+    def embed_all(self, texts: list, notifier: FrontendNotifier, progress_share: float = 100):
+        """
+        Returns the embeddings of the texts as one float32 numpy array with L2-normalized rows, so that dot products
+        are cosine similarities. Texts embedded before, by any run, are taken from the embedding store; the others
+        are embedded in batches (see _embedBatches).
+        """
+        import numpy as np
+
+        embeddings = EMBEDDINGS.getOrCompute(self.embedding_space, texts,
+                                             lambda missing: self._embedTexts(missing, notifier, progress_share),
+                                             notifier)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.clip(norms, 1e-8, None)
+
+    def _tokenizerAndLock(self):
+        if self.encoder is not None:
+            return self.encoder.tokenizer, self.encoder.tokenizer_lock
+        return self.tokenizer, self._tokenizer_lock
+
+    def _encode(self, texts: list):
+        """
+        Tokenizes the texts once, unpadded. Returns the encodings and, if long texts are split into windows
+        (see long_texts.window_encodings), the position of the text each window belongs to, otherwise None.
+        """
+        tokenizer, lock = self._tokenizerAndLock()
+        with span(TOKENIZE), lock:
+            if self.long_texts == long_texts.TRUNCATE:
+                return tokenizer(list(texts), truncation=True, max_length=512), None
+            return long_texts.window_encodings(tokenizer, texts, max_length=512)
+
+    def _embedFeatures(self, features: dict):
+        """
+        Embeds one batch of encoded texts (see batching.batch_features), padded to its longest text.
+        """
+        tokenizer, lock = self._tokenizerAndLock()
+        with span(TOKENIZE), lock:
+            inputs = tokenizer.pad(features, padding=True, return_tensors="np" if self.encoder is not None else "pt")
+        if self.encoder is not None:
+            return self.encoder.encode_inputs(inputs)
+        return self._embedInputs(inputs)
+
+    def _embedTexts(self, texts: list, notifier: FrontendNotifier, progress_share: float = 100):
+        """
+        Embeds the texts, which are tokenized only once (see _encode and _embedBatches). Unless long texts are
+        truncated, texts longer than the model's input are split into windows; the windows of all texts are
+        embedded together and pooled per text.
+        """
+        encoded, owners = self._encode(texts)
+        embeddings = self._embedBatches(encoded, notifier, progress_share)
+        if owners is None:
+            return embeddings
+
+        if len(owners) > len(texts):
+            notifier.log(f"Split long texts into windows: embedding {len(owners)} windows of {len(texts)} texts.",
+                         LogLevels.INFO)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        return long_texts.pool_windows(embeddings, owners, lengths, len(texts), self.long_texts)
+
+    def _embedBatches(self, encoded, notifier: FrontendNotifier, progress_share: float = 100):
+        """
+        Embeds the encoded texts into one float32 numpy array, in batches of texts with similar token lengths of at
+        most `batch_size` texts and MAX_BATCH_TOKENS tokens (in parallel threads if configured).
+        Reports progress per batch, scaled to `progress_share` percent.
+        """
+        import numpy as np
+
+        total = len(encoded["input_ids"])
+        embedded = 0
+        progress_lock = threading.Lock()
+
+        def embed(features):
+            nonlocal embedded
+            embeddings = self._embedFeatures(features)
+            if not isinstance(embeddings, np.ndarray):
+                embeddings = embeddings.detach().cpu().numpy()
+            with progress_lock:
+                embedded += len(embeddings)
+                notifier.sendStatus(StepState.RUNNING, progress=progress_share * embedded / total)
+                notifier.log(f"Embedded {embedded}/{total} texts.", LogLevels.DEBUG)
+            return embeddings
+
+        if self.workers > 1 and total > self.batch_size:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="TextSimilarity") as pool:
+                embeddings = map_encoded_batches(encoded, instrumentation.propagate(embed), self.MAX_BATCH_TOKENS,
+                                                 self.batch_size, map_batches=pool.map)
         else:
-            # Create a mask of all ones if attention_mask is missing or empty
-            attention_mask = torch.ones(embeddings.size(0), embeddings.size(1), device=self.device)
-        input_mask_expanded = attention_mask.unsqueeze(-1).expand(embeddings.size()).float()
-        sum_embeddings = (embeddings * input_mask_expanded).sum(dim=1)
-        sum_mask = clamp(input_mask_expanded.sum(dim=1), min=1e-9)
-        return sum_embeddings / sum_mask
+            embeddings = map_encoded_batches(encoded, embed, self.MAX_BATCH_TOKENS, self.batch_size)
+        return embeddings.astype(np.float32, copy=False)
+
+    def embed_columns(self, columns: list, notifier: FrontendNotifier, progress_share: float = 100) -> list:
+        """
+        Embeds every distinct text of the given columns once (see embed_all) and returns one array of normalized
+        embeddings per column. Cells without text get a zero vector, i.e. a similarity of 0 to everything.
+        """
+        import numpy as np
+
+        index = {}
+        for column in columns:
+            for text in column:
+                if isinstance(text, str) and text not in index:
+                    index[text] = len(index)
+        notifier.log(f"Embedding {len(index)} distinct texts in batches of {self.batch_size}.", LogLevels.INFO)
+        if not index:
+            return [np.zeros((len(column), 1), dtype=np.float32) for column in columns]
+
+        embeddings = self.embed_all(list(index), notifier, progress_share)
+        # The extra last row is the zero vector of empty cells
+        embeddings = np.vstack([embeddings, np.zeros((1, embeddings.shape[1]), dtype=embeddings.dtype)])
+        return [embeddings[[index[text] if isinstance(text, str) else -1 for text in column]]
+                for column in columns]
 
     def compute_similarity(self, text1: str, text2: str) -> float:
         if not (isinstance(text1, str) and isinstance(text2, str)):
             return 0.0
 
-        from torch import cosine_similarity
-
         emb1 = self.compute_embedding(text1)
         emb2 = self.compute_embedding(text2)
 
+        if self.encoder is not None:
+            import numpy as np
+            norm = np.linalg.norm(emb1, axis=1) * np.linalg.norm(emb2, axis=1)
+            return float((emb1 * emb2).sum(axis=1)[0] / max(norm[0], 1e-8))
+
+        from torch import cosine_similarity
+
         # Remove unsqueeze(0) - embeddings already have batch dimension
         similarity = cosine_similarity(emb1, emb2, dim=1).item()
         return similarity
@@ -104,23 +298,19 @@ class TextSimilarityAnalysisOperation(StepOperation):
             notifier.log("Input data is empty.", LogLevels.ERROR)
             return StepState.FAILED
 
-        similarity_scores = []
-        viz_rows_html = ""  # accumulate table rows for visualization
+        import numpy as np
 
-        for idx, row in data.iterrows():
-            text1 = row[self.first_column]
-            text2 = row[self.second_column]
-            sim = self.compute_similarity(text1, text2)
-            similarity_scores.append(sim)
+        pairs = list(zip(data[self.first_column], data[self.second_column]))
 
-            # Report progress and logging.
-            progress = ((idx + 1) / total_rows) * 100
-            notifier.sendStatus(StepState.RUNNING, progress=progress)
-            notifier.log(f"Processed row {idx + 1}/{total_rows}: similarity = {sim:.3f}", LogLevels.DEBUG)
+        # Every distinct text is embedded once, however often it occurs in either column.
+        first, second = self.embed_columns([data[self.first_column].tolist(), data[self.second_column].tolist()],
+                                           notifier, progress_share=99)
+        similarity_scores = np.einsum("ij,ij->i", first, second).tolist()
 
-            # Build a snippet for the visualization.
+        # Build a snippet for the visualization.
+        viz_rows_html = ""
+        for (text1, text2), sim in zip(pairs, similarity_scores):
             viz_rows_html += f"<tr><td>{text1}</td><td>{text2}</td><td>{sim:.3f}</td></tr>"
-            time.sleep(0.01)  # simulate delay if needed
 
         # Store the computed similarity scores into the dataframe.
         data[self.output_column] = similarity_scores
@@ -164,6 +354,68 @@ class TextSimilarityAnalysisOperation(StepOperation):
             i -= 1
         return column[0:i+1]
 
+    def similarity_tiles(self, embeddings1, embeddings2):
+        """
+        Yields (first row, block of cosine similarities) for tiles of TILE_ROWS rows of embeddings1 against all
+        of embeddings2, so that only one tile of products is computed at a time.
+        """
+        second = embeddings2.T
+        for start in range(0, len(embeddings1), self.TILE_ROWS):
+            yield start, embeddings1[start:start + self.TILE_ROWS] @ second
+
+    def similarity_matrix(self, embeddings1, embeddings2, notifier: FrontendNotifier, progress_offset: float = 0,
+                          progress_share: float = 100):
+        import numpy as np
+
+        n = len(embeddings1)
+        matrix = np.empty((n, len(embeddings2)), dtype=np.float32)
+        for start, block in self.similarity_tiles(embeddings1, embeddings2):
+            end = start + len(block)
+            matrix[start:end] = block
+            notifier.sendStatus(StepState.RUNNING, progress=progress_offset + progress_share * end / n)
+            notifier.log(f"Compared rows {start + 1}-{end} of {n}.", LogLevels.DEBUG)
+        return matrix
+
+    def similarity_edges(self, embeddings1, embeddings2, notifier: FrontendNotifier, skip_same_rows: bool = False,
+                         progress_offset: float = 0, progress_share: float = 100):
+        """
+        Returns the pairs (row of embeddings1, row of embeddings2, similarity) with a similarity of at least the
+        threshold, limited to the top k per row if top k is set, as three arrays ordered by row and descending
+        similarity. Computed tile by tile, so only one tile of the similarity matrix exists at a time.
+        With `skip_same_rows`, pairs of a row with itself are left out (when comparing a column with itself).
+        """
+        import numpy as np
+
+        n = len(embeddings1)
+        all_rows, all_columns, all_scores = [], [], []
+        for start, block in self.similarity_tiles(embeddings1, embeddings2):
+            if skip_same_rows:
+                local = np.arange(min(len(block), block.shape[1] - start))
+                block[local, start + local] = -np.inf
+
+            if 0 < self.top_k < block.shape[1]:
+                columns = np.argpartition(block, -self.top_k, axis=1)[:, -self.top_k:]
+                scores = np.take_along_axis(block, columns, axis=1)
+                keep = scores >= self.threshold
+                rows = np.broadcast_to(np.arange(len(block))[:, np.newaxis], columns.shape)[keep]
+                columns, scores = columns[keep], scores[keep]
+            else:
+                rows, columns = np.nonzero(block >= self.threshold)
+                scores = block[rows, columns]
+
+            order = np.lexsort((-scores, rows))
+            all_rows.append(start + rows[order])
+            all_columns.append(columns[order])
+            all_scores.append(scores[order])
+
+            end = start + len(block)
+            notifier.sendStatus(StepState.RUNNING, progress=progress_offset + progress_share * end / n)
+            notifier.log(f"Compared rows {start + 1}-{end} of {n}.", LogLevels.DEBUG)
+
+        if not all_rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(all_rows), np.concatenate(all_columns), np.concatenate(all_scores)
+
     def cross_comparison(self, payload: Payload, notifier: FrontendNotifier) -> StepState:
         import pandas as pd
         from backend.transferObjects.visualization import PlotlyViz
@@ -188,32 +440,63 @@ class TextSimilarityAnalysisOperation(StepOperation):
         texts2 = col2.tolist()
         n, m = len(texts1), len(texts2)
 
-        matrix = []
         notifier.sendStatus(StepState.RUNNING, progress=0)
-        for i, t1 in enumerate(texts1):
-            row_sims = []
-            for j, t2 in enumerate(texts2):
-                sim = self.compute_similarity(t1, t2)
-                row_sims.append(sim)
-            matrix.append(row_sims)
-
-            # Update progress after each row
-            progress = ((i + 1) / n) * 90
-            notifier.sendStatus(StepState.RUNNING, progress=progress)
-            notifier.log(f"Processed cross row {i+1}/{n}", LogLevels.DEBUG)
+        # Each text is embedded once; the similarities are then products of the normalized embeddings.
+        embeddings1, embeddings2 = self.embed_columns([texts1, texts2], notifier, progress_share=50)
+        if self.cross_output == self.EDGES:
+            return self._crossComparisonEdges(payload, notifier, col1, col2, embeddings1, embeddings2)
+        matrix = self.similarity_matrix(embeddings1, embeddings2, notifier, progress_offset=50, progress_share=40)
 
         # Create DataFrame of similarities
         sim_df = pd.DataFrame(matrix, index=texts1, columns=texts2)
         payload.data = sim_df
 
-        # Build heatmap visualization
-        fig = go.Figure(data=go.Heatmap(z=matrix, x=texts2, y=texts1))
+        # The full matrix is saved as a binary artifact of the run; the heatmap is a block-aggregated overview of
+        # bounded size, so that large comparisons do not produce a figure with a cell per pair of texts.
+        payload.addArtifact("similarity_matrix", matrix)
+        blocks, rows, columns = heatmap.downsample(matrix, aggregation=self.heatmap_aggregation)
+        fig = go.Figure(data=go.Heatmap(z=blocks, x=heatmap.block_labels(texts2, columns),
+                                        y=heatmap.block_labels(texts1, rows)))
+        if len(rows) < n or len(columns) < m:
+            fig.update_layout(title=f"{self.heatmap_aggregation.capitalize()} similarity of blocks of "
+                                    f"{-(-n // len(rows))} x {-(-m // len(columns))} texts")
         payload.addVisualization(PlotlyViz(fig))
 
         notifier.log("Cross comparison similarity matrix generated.", LogLevels.INFO)
         notifier.sendStatus(StepState.SUCCESS, progress=100)
         return StepState.SUCCESS
 
+    def _crossComparisonEdges(self, payload: Payload, notifier: FrontendNotifier, col1, col2, embeddings1,
+                              embeddings2) -> StepState:
+        import pandas as pd
+        from backend.transferObjects.visualization import PlotlyViz
+        import plotly.graph_objects as go
+
+        rows, columns, scores = self.similarity_edges(
+            embeddings1, embeddings2, notifier, skip_same_rows=self.first_column == self.second_column,
+            progress_offset=50, progress_share=40)
+
+        # One row per pair, referring to the rows of the input data. The columns are named by side rather than
+        # after the input columns, which may be the same one.
+        texts1, texts2 = col1.to_numpy(), col2.to_numpy()
+        payload.data = pd.DataFrame({
+            "source row": col1.index.to_numpy()[rows],
+            "source text": texts1[rows],
+            "target row": col2.index.to_numpy()[columns],
+            "target text": texts2[columns],
+            self.output_column: scores,
+        })
+
+        fig = go.Figure(data=go.Histogram(x=scores, nbinsx=50))
+        fig.update_layout(title=f"Similarities of the {len(scores)} pairs found", xaxis_title="similarity",
+                          yaxis_title="pairs")
+        payload.addVisualization(PlotlyViz(fig))
+
+        notifier.log(f"Cross comparison found {len(scores)} pairs with a similarity of at least {self.threshold}"
+                     + (f", keeping the top {self.top_k} per row." if self.top_k else "."), LogLevels.INFO)
+        notifier.sendStatus(StepState.SUCCESS, progress=100)
+        return StepState.SUCCESS
+
 
 
 
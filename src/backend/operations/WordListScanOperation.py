@@ -83,5 +83,7 @@ class WordListScanOperation(ParallelizableOperation):
         </div>
         """
         payload.addVisualization(HTMLViz(viz_html))
+        for name, count in result.items():
+            payload.summarize("Matches per word list", name, count)
         notifier.sendStatus(StepState.SUCCESS, progress=100)
         return list(count for name, count in result.items())
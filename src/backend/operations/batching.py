@@ -0,0 +1,97 @@
+"""
+Length-bucketed batching for transformer inference. Texts are sorted by their number of tokens and grouped into
+batches under a token budget, and each batch is padded only to its longest text. Short texts therefore do not pay
+for the attention over padding of long ones. Results are computed in the sorted order and put back in the
+original order afterwards.
+"""
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+# Tokens (texts x padded length) per batch; 32 texts at the usual maximum length of 512 tokens
+DEFAULT_MAX_TOKENS = 16384
+
+
+def length_batches(lengths: Sequence[int], max_tokens: int = DEFAULT_MAX_TOKENS,
+                   max_batch_size: Optional[int] = None) -> List[List[int]]:
+    """
+    Groups the positions of the texts with the given token lengths into batches of similar length, shortest
+    first. A batch padded to its longest text stays within `max_tokens` tokens and `max_batch_size` texts;
+    a single text longer than the budget forms a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda position: lengths[position])
+    batches, batch = [], []
+    for position in order:
+        # Sorted ascending, so the current text is the longest of the batch
+        longest = max(1, lengths[position])
+        full = max_batch_size is not None and len(batch) >= max_batch_size
+        if batch and (full or (len(batch) + 1) * longest > max_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(position)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def restore_order(batches: List[List[int]], results: list):
+    """
+    Puts the results of the batches (numpy arrays with one row per text) back into the order of the texts.
+    Without any texts, the result is an empty array.
+    """
+    import numpy as np
+
+    if not batches:
+        return np.empty((0, 0), dtype=np.float32)
+    positions = np.concatenate([np.asarray(batch, dtype=np.int64) for batch in batches])
+    rows = np.concatenate(results)
+    ordered = np.empty_like(rows)
+    ordered[positions] = rows
+    return ordered
+
+
+def batch_features(encoded, batch: Sequence[int]) -> dict:
+    """
+    The features (input_ids, attention_mask, ...) of the texts at the positions of the batch, unpadded.
+    """
+    return {name: [values[position] for position in batch] for name, values in encoded.items()}
+
+
+def padded_batches(tokenizer, texts: Sequence[str], max_length: int = 512, max_tokens: int = DEFAULT_MAX_TOKENS,
+                   max_batch_size: Optional[int] = None,
+                   return_tensors: str = "pt") -> Tuple[List[List[int]], Iterator]:
+    """
+    Tokenizes all texts once and returns the length batches (see length_batches) together with an iterator over
+    their inputs, each padded to the longest text of its batch.
+    """
+    encoded = tokenizer(list(texts), truncation=True, max_length=max_length)
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+    batches = length_batches(lengths, max_tokens, max_batch_size)
+
+    def inputs() -> Iterator:
+        for batch in batches:
+            yield tokenizer.pad(batch_features(encoded, batch), padding=True, return_tensors=return_tensors)
+
+    return batches, inputs()
+
+
+def map_length_batched(texts: Sequence[str], lengths: Sequence[int], compute: Callable[[List[str]], "np.ndarray"],
+                       max_tokens: int = DEFAULT_MAX_TOKENS, max_batch_size: Optional[int] = None,
+                       map_batches: Callable = map):
+    """
+    Calls `compute` on length batches of the texts and returns its results (one row per text) in the order of
+    the texts. `map_batches` may be replaced by the map of a thread pool to compute batches in parallel.
+    """
+    batches = length_batches(lengths, max_tokens, max_batch_size)
+    results = list(map_batches(lambda batch: compute([texts[position] for position in batch]), batches))
+    return restore_order(batches, results)
+
+
+def map_encoded_batches(encoded, compute: Callable[[dict], "np.ndarray"], max_tokens: int = DEFAULT_MAX_TOKENS,
+                        max_batch_size: Optional[int] = None, map_batches: Callable = map):
+    """
+    Like map_length_batched for texts that are tokenized already (without padding): calls `compute` on the
+    features of length batches (see batch_features), so the texts are not tokenized again per batch.
+    """
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+    return map_length_batched(range(len(lengths)), lengths,
+                              lambda positions: compute(batch_features(encoded, positions)),
+                              max_tokens, max_batch_size, map_batches)
@@ -0,0 +1,67 @@
+"""
+Overview heatmaps of large matrices. The matrix is aggregated into at most `max_cells` x `max_cells` blocks and
+the axis labels are truncated, so the size of the figure does not depend on the size of the matrix.
+"""
+from typing import List, Sequence, Tuple
+
+MAX = "max"
+MEAN = "mean"
+AGGREGATIONS = (MAX, MEAN)
+
+# Blocks per axis of an overview heatmap
+DEFAULT_MAX_CELLS = 200
+# Characters of a text shown in an axis label
+DEFAULT_LABEL_LENGTH = 30
+
+
+def block_starts(size: int, max_cells: int = DEFAULT_MAX_CELLS) -> List[int]:
+    """
+    First indices of the (equally sized, apart from the last) blocks an axis of `size` entries is divided into.
+    """
+    block_size = max(1, -(-size // max_cells))
+    return list(range(0, size, block_size))
+
+
+def downsample(matrix, max_cells: int = DEFAULT_MAX_CELLS,
+               aggregation: str = MAX) -> Tuple["np.ndarray", List[int], List[int]]:
+    """
+    Aggregates the matrix into blocks by their maximum or mean. Returns the block matrix and the first row and
+    column of each block.
+    """
+    import numpy as np
+
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Unsupported aggregation '{aggregation}', expected one of {', '.join(AGGREGATIONS)}.")
+    matrix = np.asarray(matrix, dtype=np.float32)
+    rows, columns = block_starts(matrix.shape[0], max_cells), block_starts(matrix.shape[1], max_cells)
+    if len(rows) == matrix.shape[0] and len(columns) == matrix.shape[1]:
+        return matrix, rows, columns
+
+    if aggregation == MAX:
+        blocks = np.maximum.reduceat(np.maximum.reduceat(matrix, rows, axis=0), columns, axis=1)
+    else:
+        sums = np.add.reduceat(np.add.reduceat(matrix, rows, axis=0), columns, axis=1, dtype=np.float64)
+        row_counts = np.diff(rows + [matrix.shape[0]])
+        column_counts = np.diff(columns + [matrix.shape[1]])
+        blocks = (sums / np.outer(row_counts, column_counts)).astype(np.float32)
+    return blocks, rows, columns
+
+
+def truncate(text, length: int = DEFAULT_LABEL_LENGTH) -> str:
+    text = str(text)
+    return text if len(text) <= length else text[:length - 1] + "…"
+
+
+def block_labels(texts: Sequence, starts: List[int], length: int = DEFAULT_LABEL_LENGTH) -> List[str]:
+    """
+    Labels of the blocks starting at `starts`: the (truncated) text for single entries, the range of entries for
+    larger blocks. Labels are numbered, as equal labels would be merged into one category by plotly.
+    """
+    labels = []
+    for block, start in enumerate(starts):
+        end = starts[block + 1] if block + 1 < len(starts) else len(texts)
+        if end - start == 1:
+            labels.append(f"{start + 1}: {truncate(texts[start], length)}")
+        else:
+            labels.append(f"{start + 1}-{end}: {truncate(texts[start], length)} …")
+    return labels
@@ -0,0 +1,106 @@
+"""
+Sliding windows over texts that are longer than a model's maximum input length. Instead of truncating them,
+over-length texts are split into overlapping windows, all windows are run through the model together with the
+other texts, and the per-window results (embeddings or class probabilities) are pooled back into one per text.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+# Modes of the "long texts" parameter
+TRUNCATE = "truncate"
+MEAN = "mean"
+# Windows weighted by the number of tokens they attend to (the sum of their attention mask), so that a short
+# last window counts less than full ones
+ATTENTION_WEIGHTED = "attention-weighted"
+MODES = (TRUNCATE, MEAN, ATTENTION_WEIGHTED)
+
+
+def check_mode(mode: str) -> str:
+    if mode not in MODES:
+        raise ValueError(f"Unsupported long text mode '{mode}', expected one of {', '.join(MODES)}.")
+    return mode
+
+
+def _window_sizes(tokenizer, max_length: int, overlap: Optional[int]) -> Tuple[int, int, int]:
+    """
+    Tokens per window without special tokens, tokens between the starts of consecutive windows and the number of
+    special tokens per window.
+    """
+    special_tokens = tokenizer.num_special_tokens_to_add()
+    budget = max(1, max_length - special_tokens)
+    overlap = budget // 4 if overlap is None else min(overlap, budget - 1)
+    return budget, budget - overlap, special_tokens
+
+
+def _window_starts(tokens: int, budget: int, step: int) -> List[int]:
+    starts = []
+    for start in range(0, max(tokens, 1), step):
+        starts.append(start)
+        if start + budget >= tokens:
+            break
+    return starts
+
+
+def window_texts(tokenizer, texts: Sequence[str], max_length: int = 512,
+                 overlap: Optional[int] = None) -> Tuple[List[str], List[int], List[int]]:
+    """
+    Splits texts of more than `max_length` tokens (including special tokens) into windows that overlap by
+    `overlap` tokens (a quarter of a window by default). Windows are substrings of the original text, cut at
+    token boundaries; shorter texts are their own single window.
+    Returns the windows, the position of the text each window belongs to and the number of tokens per window.
+    Requires a fast tokenizer (for the character offsets of tokens).
+    """
+    budget, step, special_tokens = _window_sizes(tokenizer, max_length, overlap)
+
+    encoded = tokenizer(list(texts), add_special_tokens=False, return_offsets_mapping=True)
+    windows, owners, lengths = [], [], []
+    for position, (text, offsets) in enumerate(zip(texts, encoded["offset_mapping"])):
+        if len(offsets) <= budget:
+            windows.append(text)
+            owners.append(position)
+            lengths.append(len(offsets) + special_tokens)
+            continue
+        for start in _window_starts(len(offsets), budget, step):
+            end = min(start + budget, len(offsets))
+            windows.append(text[offsets[start][0]:offsets[end - 1][1]])
+            owners.append(position)
+            lengths.append(end - start + special_tokens)
+    return windows, owners, lengths
+
+
+def window_encodings(tokenizer, texts: Sequence[str], max_length: int = 512,
+                     overlap: Optional[int] = None) -> Tuple[dict, List[int]]:
+    """
+    Like window_texts, but returns the encodings of the windows (token ids with special tokens, unpadded) instead
+    of substrings, so that each text is tokenized only once. The number of tokens per window is the length of its
+    input_ids. Returns the encodings and the position of the text each window belongs to.
+    """
+    budget, step, _ = _window_sizes(tokenizer, max_length, overlap)
+
+    encoded = tokenizer(list(texts), add_special_tokens=False)
+    windows, owners = {}, []
+    for position, ids in enumerate(encoded["input_ids"]):
+        for start in _window_starts(len(ids), budget, step):
+            window = tokenizer.prepare_for_model(ids[start:start + budget], add_special_tokens=True)
+            for name, values in window.items():
+                windows.setdefault(name, []).append(values)
+            owners.append(position)
+    return windows, owners
+
+
+def pool_windows(values, owners: Sequence[int], lengths: Sequence[int], count: int, mode: str = MEAN):
+    """
+    Averages the rows of `values` (one per window) into one row per text, either plainly (MEAN) or weighted by
+    the number of tokens of each window (ATTENTION_WEIGHTED).
+    """
+    import numpy as np
+
+    values = np.asarray(values, dtype=np.float32)
+    owners = np.asarray(owners, dtype=np.int64)
+    weights = np.asarray(lengths, dtype=np.float32) if mode == ATTENTION_WEIGHTED \
+        else np.ones(len(owners), dtype=np.float32)
+
+    sums = np.zeros((count, values.shape[1]), dtype=np.float32)
+    np.add.at(sums, owners, values * weights[:, np.newaxis])
+    totals = np.zeros(count, dtype=np.float32)
+    np.add.at(totals, owners, weights)
+    return sums / np.clip(totals, 1e-9, None)[:, np.newaxis]
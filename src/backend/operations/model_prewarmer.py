@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, List
+
+from backend.transferObjects.eventTransferObjects import LogLevels, StepState
+from backend.types.blueprint import StepBlueprint, StepValues
+from backend.types.frontendNotifier import FrontendNotifier
+
+
+class ConsoleNotifier(FrontendNotifier):
+    """
+    Models are prewarmed outside of any step, so their logs only go to the console.
+    """
+
+    def log(self, message: str | List[str], level: LogLevels = LogLevels.DEBUG):
+        messages = [message] if isinstance(message, str) else message
+        for m in messages:
+            print(f"{LogLevels.prefix(level)}Prewarm: {m}")
+
+    def sendStatus(self, stepState: StepState, progress: float = 0.0):
+        pass
+
+
+class ModelPrewarmer:
+    """
+    Loads models into the shared model registry in the background, so that steps find them already loaded.
+    A step that needs a model while it is still being prewarmed waits for that load instead of starting another.
+    Failures are only printed; the step then loads the model itself and reports the error.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ModelPrewarmer")
+        self.notifier = ConsoleNotifier()
+
+    def prewarm(self, loaders: List[Callable[[FrontendNotifier], Any]]) -> List[Future]:
+        return [self.executor.submit(self._load, loader) for loader in loaders]
+
+    def _load(self, loader: Callable[[FrontendNotifier], Any]):
+        try:
+            loader(self.notifier)
+        except Exception as e:
+            self.notifier.log(f"Failed to prewarm model: {repr(e)}", LogLevels.WARN)
+
+    def prewarmSteps(self, steps: List[StepBlueprint], stepValues: List[StepValues]) -> List[Future]:
+        """
+        Starts loading the models that the given steps will load with their configured (or default) values.
+        """
+        loaders = []
+        for step, values in zip(steps, stepValues):
+            try:
+                config = step.buildConfig(values)
+                if config.isReady():
+                    loaders.extend(step.operation.requiredModels(config))
+            except Exception as e:
+                self.notifier.log(f"Cannot determine the models of step {step.stepId}: {repr(e)}", LogLevels.WARN)
+        return self.prewarm(loaders)
+
+    def prewarmModels(self, models: List[str]) -> List[Future]:
+        """
+        Starts loading models given as "spacy:<model>", "transformer:<model>", "sentence_transformer:<model>" or
+        "pipeline:<task>:<model>".
+        """
+        return self.prewarm([self.loaderOf(model) for model in models])
+
+    @staticmethod
+    def loaderOf(model: str) -> Callable[[FrontendNotifier], Any]:
+        from backend.operations import operation_utils
+
+        loader, _, name = model.partition(":")
+        if loader == "spacy":
+            return lambda notifier: operation_utils.load_spacy_model_on_demand(name, notifier)
+        if loader == "transformer":
+            return lambda notifier: operation_utils.load_transformer(name)
+        if loader == "sentence_transformer":
+            return lambda notifier: operation_utils.load_sentence_transformer(name)
+        if loader == "pipeline":
+            task, _, name = name.partition(":")
+            return lambda notifier: operation_utils.load_pipeline(task, name)
+        raise ValueError(f"Unknown model loader in '{model}'.")
+
+
+# Shared by the startup of the application and all runs
+PREWARMER = ModelPrewarmer()
@@ -0,0 +1,144 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class ModelRegistry:
+    """
+    Process-wide store of loaded models, shared by all operations and runs. Models are identified by
+    (loader, model name, options) and are loaded once; callers must treat the returned instances as read-only.
+    Anything that changes a model for its use (device placement, locks, instrumentation) is done by its loader,
+    once, at load time.
+
+    The estimated memory of all loaded models is kept below `memory_budget` bytes by dropping the least recently
+    used models. Operations still holding a dropped model keep it alive until they are done with it.
+    """
+
+    DEFAULT_MEMORY_BUDGET = 4 * 1024 ** 3
+    # Estimate for models whose size cannot be determined
+    DEFAULT_MODEL_SIZE = 256 * 1024 ** 2
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.models: "OrderedDict[Tuple, Tuple[Any, int]]" = OrderedDict()  # key -> (model, size)
+        self.lock = threading.Lock()
+        # One lock per key, so that a model is loaded only once while different models load concurrently
+        self.load_locks: Dict[Tuple, threading.Lock] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(loader: str, model_name: str, **options: Hashable) -> Tuple:
+        return loader, model_name, tuple(sorted(options.items()))
+
+    def get(self, loader: str, model_name: str, load: Callable[[], Any], **options: Hashable) -> Any:
+        """
+        Returns the model identified by (loader, model_name, options), calling `load` if it is not loaded yet.
+        """
+        key = self.key(loader, model_name, **options)
+        with self.lock:
+            if key in self.models:
+                return self._hit(key)
+            load_lock = self.load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another thread may have loaded the model in the meantime
+            with self.lock:
+                if key in self.models:
+                    return self._hit(key)
+                self.misses += 1
+
+            model = load()
+            size = self.estimateSize(model)
+
+            with self.lock:
+                self.models[key] = (model, size)
+                self._evict(keep=key)
+            return model
+
+    def _hit(self, key: Tuple) -> Any:
+        self.hits += 1
+        self.models.move_to_end(key)
+        return self.models[key][0]
+
+    def _evict(self, keep: Tuple):
+        total = sum(size for _, size in self.models.values())
+        for key in list(self.models.keys()):
+            if total <= self.memory_budget:
+                break
+            if key == keep:
+                continue
+            _, size = self.models.pop(key)
+            self.load_locks.pop(key, None)
+            total -= size
+            self.evictions += 1
+
+    def isLoaded(self, loader: str, model_name: str, **options: Hashable) -> bool:
+        with self.lock:
+            return self.key(loader, model_name, **options) in self.models
+
+    def setMemoryBudget(self, memory_budget: int):
+        with self.lock:
+            self.memory_budget = memory_budget
+            self._evict(keep=None)
+
+    def clear(self):
+        with self.lock:
+            self.models.clear()
+            self.load_locks.clear()
+
+    def getStatistics(self) -> dict:
+        with self.lock:
+            return {
+                "models": [f"{loader}:{model_name}" for loader, model_name, _ in self.models.keys()],
+                "estimated_bytes": sum(size for _, size in self.models.values()),
+                "memory_budget": self.memory_budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    @staticmethod
+    def estimateSize(model: Any) -> int:
+        """
+        Estimates the memory used by a model: the parameters and buffers of torch modules (also inside
+        pipelines or (tokenizer, model) tuples) and the vectors of spaCy models.
+        """
+        if isinstance(model, (tuple, list)):
+            sizes = [ModelRegistry._moduleSize(part) for part in model]
+            known = [size for size in sizes if size is not None]
+            return sum(known) if known else ModelRegistry.DEFAULT_MODEL_SIZE
+
+        size = getattr(model, "estimated_size", None)
+        if not isinstance(size, int):
+            size = ModelRegistry._moduleSize(model)
+        if size is None:
+            size = ModelRegistry._moduleSize(getattr(model, "model", None))
+        if size is None:
+            size = ModelRegistry._spacySize(model)
+        return size if size is not None else ModelRegistry.DEFAULT_MODEL_SIZE
+
+    @staticmethod
+    def _moduleSize(module: Any):
+        if not (hasattr(module, "parameters") and hasattr(module, "buffers")):
+            return None
+        try:
+            tensors = list(module.parameters()) + list(module.buffers())
+            return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _spacySize(nlp: Any):
+        vectors = getattr(getattr(nlp, "vocab", None), "vectors", None)
+        data = getattr(vectors, "data", None)
+        if data is None or not hasattr(data, "nbytes"):
+            return None
+        # Pipeline components are small compared to the vectors of larger models
+        return int(data.nbytes) + ModelRegistry.DEFAULT_MODEL_SIZE // 2
+
+
+# Shared by all operations of the process
+MODELS = ModelRegistry()
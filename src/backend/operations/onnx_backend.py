@@ -0,0 +1,181 @@
+"""
+Optional ONNX Runtime backend for transformer inference. Models are exported from torch to ONNX once and cached
+under PATHS.cache/onnx; afterwards inference only needs onnxruntime, numpy and the tokenizer, not torch.
+Requires the optional packages 'onnxruntime' (and 'onnx' for the export).
+"""
+import json
+import os
+import threading
+
+from backend.operations.operation_utils import resolve_model, get_model, FP32, INT8
+from backend.storage.paths import PATHS
+from backend.types.instrumentation import span, TOKENIZE, FORWARD, POST_PROCESS
+
+SEQUENCE_CLASSIFICATION = "sequence-classification"
+ENCODER = "encoder"
+
+_OUTPUT_NAMES = {
+    SEQUENCE_CLASSIFICATION: "logits",
+    ENCODER: "last_hidden_state"
+}
+
+_export_lock = threading.Lock()
+
+
+def _export_dir(model_name: str, kind: str) -> str:
+    path = os.path.join(PATHS.cache, "onnx", model_name.replace("/", "--"), kind)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _export(model_name: str, kind: str, snapshot_path: str, export_path: str):
+    import torch
+    from transformers import AutoTokenizer, AutoModel, AutoModelForSequenceClassification
+
+    tokenizer = AutoTokenizer.from_pretrained(snapshot_path, local_files_only=True)
+    model_class = AutoModelForSequenceClassification if kind == SEQUENCE_CLASSIFICATION else AutoModel
+    model = model_class.from_pretrained(snapshot_path, local_files_only=True).eval()
+
+    sample = tokenizer(["Sample text used to trace the model."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    output_name = _OUTPUT_NAMES[kind]
+
+    class Wrapper(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_name] = {0: "batch"} if kind == SEQUENCE_CLASSIFICATION else {0: "batch", 1: "sequence"}
+
+    temp_path = export_path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(Wrapper(), tuple(sample[name] for name in input_names), temp_path,
+                          input_names=input_names, output_names=[output_name], dynamic_axes=dynamic_axes,
+                          opset_version=14, do_constant_folding=True)
+    os.replace(temp_path, export_path)
+
+
+def export_model(model_name: str, kind: str, precision: str = FP32) -> str:
+    """
+    Returns the path of the ONNX export of the model, exporting (and quantizing) it on first use.
+    """
+    export_dir = _export_dir(model_name, kind)
+    fp32_path = os.path.join(export_dir, "model.onnx")
+    path = fp32_path if precision == FP32 else os.path.join(export_dir, f"model.{precision}.onnx")
+
+    with _export_lock:
+        if not os.path.isfile(fp32_path):
+            _export(model_name, kind, resolve_model(model_name), fp32_path)
+        if precision == INT8 and not os.path.isfile(path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+
+            temp_path = path + ".tmp"
+            quantize_dynamic(fp32_path, temp_path, weight_type=QuantType.QInt8)
+            os.replace(temp_path, path)
+        elif precision not in (FP32, INT8):
+            raise ValueError(f"Unsupported inference precision '{precision}'.")
+    return path
+
+
+class OnnxModel:
+    def __init__(self, model_name: str, kind: str, precision: str = FP32):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        snapshot_path = resolve_model(model_name)
+        self.tokenizer = AutoTokenizer.from_pretrained(snapshot_path, local_files_only=True)
+        self.max_length = min(self.tokenizer.model_max_length, 512)
+        # Fast tokenizers must not be used by several threads at once; sessions may be.
+        self.tokenizer_lock = threading.Lock()
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        model_path = export_model(model_name, kind, precision)
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        # Used by the model registry for its memory budget
+        self.estimated_size = os.path.getsize(model_path)
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+        with open(os.path.join(snapshot_path, "config.json"), "r") as f:
+            self.model_config = json.load(f)
+
+    def _tokenize(self, texts: list):
+        with span(TOKENIZE), self.tokenizer_lock:
+            return self.tokenizer(texts, return_tensors="np", padding=True, truncation=True,
+                                  max_length=self.max_length)
+
+    def forward(self, texts: list):
+        return self.forward_inputs(self._tokenize(texts))
+
+    def forward_inputs(self, inputs):
+        """
+        Runs the model on tokenized and padded inputs (numpy arrays by name).
+        """
+        inputs = {name: inputs[name].astype("int64") for name in self.input_names}
+        with span(FORWARD):
+            return self.session.run(None, inputs)[0], inputs
+
+
+class OnnxSequenceClassifier(OnnxModel):
+    """
+    Drop-in replacement for a transformers text classification pipeline: returns one {"label", "score"} per text,
+    or a list of them for all labels with top_k=None.
+    """
+
+    def __init__(self, model_name: str, precision: str = FP32):
+        super().__init__(model_name, SEQUENCE_CLASSIFICATION, precision)
+        self.id2label = {int(i): label for i, label in self.model_config.get("id2label", {}).items()}
+
+    def __call__(self, texts, padding=True, truncation=True, batch_size=None, top_k=1, **kwargs):
+        import numpy as np
+
+        if isinstance(texts, str):
+            texts = [texts]
+        batch_size = batch_size if batch_size else len(texts)
+        results = []
+        for start in range(0, len(texts), batch_size):
+            logits, _ = self.forward(texts[start:start + batch_size])
+            with span(POST_PROCESS):
+                if logits.shape[-1] == 1:
+                    scores = 1 / (1 + np.exp(-logits))
+                else:
+                    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+                    scores = exp / exp.sum(axis=-1, keepdims=True)
+                for row in scores:
+                    ranked = [{"label": self.id2label.get(int(index), f"LABEL_{index}"), "score": float(row[index])}
+                              for index in row.argsort()[::-1]]
+                    results.append(ranked[0] if top_k == 1 else ranked[:top_k])
+        return results
+
+
+class OnnxEncoder(OnnxModel):
+    """
+    Computes mean pooled embeddings (over non-padding tokens) like the torch path of the similarity steps.
+    """
+
+    def __init__(self, model_name: str, precision: str = FP32):
+        super().__init__(model_name, ENCODER, precision)
+
+    def encode(self, texts: list):
+        return self.encode_inputs(self._tokenize(list(texts)))
+
+    def encode_inputs(self, inputs):
+        import numpy as np
+
+        hidden, inputs = self.forward_inputs(inputs)
+        with span(POST_PROCESS):
+            mask = inputs["attention_mask"][..., np.newaxis].astype(hidden.dtype)
+            return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+def load_onnx_classifier(model_name: str, precision: str = FP32) -> OnnxSequenceClassifier:
+    return get_model("onnx_classifier", model_name, lambda: OnnxSequenceClassifier(model_name, precision),
+                      precision=precision)
+
+
+def load_onnx_encoder(model_name: str, precision: str = FP32) -> OnnxEncoder:
+    return get_model("onnx_encoder", model_name, lambda: OnnxEncoder(model_name, precision), precision=precision)
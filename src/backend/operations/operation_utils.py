@@ -1,15 +1,73 @@
+import json
 import os
 import sys
+import threading
+import time
 
 from backend.transferObjects.eventTransferObjects import LogLevels
 from backend.types.frontendNotifier import FrontendNotifier
 
+from backend.operations.model_registry import MODELS
 from backend.storage.paths import PATHS
+from backend.types.instrumentation import recordLoad, processRss, processBytesRead, instrumentPipeline
+
+
+def get_model(loader: str, model_name: str, load, **options):
+    """
+    Returns a model from the shared model registry and records the load (wall time, bytes read, RSS delta and
+    whether the model was already loaded) in the metrics of the current step. Bytes read and RSS are measured
+    for the whole process, so they include anything else happening concurrently.
+    """
+    loaded = []
+
+    def measured_load():
+        loaded.append(True)
+        return load()
+
+    rss_before, read_before = processRss(), processBytesRead()
+    start = time.perf_counter()
+    model = MODELS.get(loader, model_name, measured_load, **options)
+    seconds = time.perf_counter() - start
+    rss_after, read_after = processRss(), processBytesRead()
+
+    recordLoad({
+        "loader": loader,
+        "model": model_name,
+        "options": {key: str(value) for key, value in options.items()},
+        "cache": "miss" if loaded else "hit",
+        "seconds": round(seconds, 4),
+        "bytes_read": read_after - read_before if read_before is not None and read_after is not None else None,
+        "rss_delta": rss_after - rss_before if rss_before is not None and rss_after is not None else None
+    })
+    return model
+
+
+# Loaded when the requested spaCy model is neither installed nor downloadable
+FALLBACK_SPACY_MODEL = "en_core_web_sm"
 
 
 def load_spacy_model_on_demand(model_name: str, notifier: FrontendNotifier):
+    """
+    Returns the shared instance of the specified spaCy model, loading it first if necessary. If it cannot be
+    loaded, the fallback model is returned instead; it is registered under its own name, so the requested model
+    is loaded once it becomes available.
+    """
+    if MODELS.isLoaded("spacy", model_name):
+        notifier.log(f"Using already loaded spaCy model '{model_name}'.", LogLevels.INFO)
+    try:
+        return get_model("spacy", model_name, lambda: _load_spacy_model_on_demand(model_name, notifier))
+    except OSError:
+        notifier.log(f"Using standard language pack for english instead ({FALLBACK_SPACY_MODEL}): ...",
+                     LogLevels.WARN)
+
+    import spacy
+    return get_model("spacy", FALLBACK_SPACY_MODEL, lambda: spacy.load(FALLBACK_SPACY_MODEL))
+
+
+def _load_spacy_model_on_demand(model_name: str, notifier: FrontendNotifier):
     """
     Checks if the specified spaCy model is available. If not, downloads it using spacy cli and pip.
+    Raises OSError if it can be neither loaded nor downloaded.
 
     Caution:
         !!! This function uses the spacy.cli.download function, which requires pip to be installed. !!!
@@ -30,11 +88,14 @@ def load_spacy_model_on_demand(model_name: str, notifier: FrontendNotifier):
         try:
             notifier.log(f"spaCy model '{model_name}' not found. Downloading...", LogLevels.WARN)
             notifier.log(f"This may take a moment.", LogLevels.WARN)
-            spacy.cli.download(model_name)
+            from backend.types.workerPool import ENVIRONMENT_LOCK
+            # Downloads in a pip subprocess
+            with ENVIRONMENT_LOCK:
+                spacy.cli.download(model_name)
             notifier.log(f"Download complete. Now loading '{model_name}'...", LogLevels.INFO)
             nlp = spacy.load(model_name)
             nlp.to_disk(os.path.join(cache_dir, model_name))
-        except OSError:
+        except OSError as e:
             notifier.log(f"Failed to download spaCy model '{model_name}'.", LogLevels.ERROR)
             notifier.log(
                 f"You do not seem to have the python package installer (pip) installed. If you want to download languages packs dynamically install 'pip' .",
@@ -43,8 +104,7 @@ def load_spacy_model_on_demand(model_name: str, notifier: FrontendNotifier):
                 f"Otherwise, in order to use '{model_name}' please install the required language pack manually into cache/spacy/models.",
                 LogLevels.INFO)
             notifier.log(f"Download the model from https://spacy.io/models/", LogLevels.INFO)
-            notifier.log(f"Using standard language pack for english instead (en_core_web_sm): ...", LogLevels.WARN)
-            nlp = spacy.load("en_core_web_sm")
+            raise e
     return nlp
 
 
@@ -61,83 +121,216 @@ def _set_hf_cache():
     os.environ["TRANSFORMERS_CACHE"] = os.path.join(cache_root, "transformers")
 
 
-def ensure_transformer(model_name: str):
-    from transformers import AutoTokenizer, AutoModel
-    from huggingface_hub import snapshot_download
+FP32 = "fp32"
+INT8 = "int8"
 
-    _set_hf_cache()
+
+def inference_device(precision: str = FP32) -> str:
+    """
+    Device transformer models of the given precision run on: the GPU if available, except for quantized models,
+    which only run on the CPU.
+    """
+    import torch
+
+    return "cuda" if precision == FP32 and torch.cuda.is_available() else "cpu"
+
+
+def apply_precision(model, precision: str):
+    """
+    Converts a freshly loaded torch model to the given inference precision. "int8" applies dynamic
+    quantization to the linear layers, which only runs on the CPU.
+    """
+    if precision == FP32:
+        return model
+    if precision == INT8:
+        import torch
+        from torch.ao.quantization import quantize_dynamic
+
+        return quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    raise ValueError(f"Unsupported inference precision '{precision}'.")
+
+
+# Files needed to load tokenizers and models; vocab.txt/merges.txt are used by many tokenizers
+_SNAPSHOT_PATTERNS = ["*.json", "*.model", "*.txt", "*.bin", "*.safetensors"]
+# A snapshot is complete if it has a config, weights and tokenizer files of any of the supported kinds
+_WEIGHTS_SUFFIXES = (".safetensors", ".bin")
+_TOKENIZER_FILES = ("tokenizer.json", "vocab.txt", "vocab.json")
+_MANIFEST_NAME = "manifest.json"
+_manifest_lock = threading.Lock()
+
+
+def _read_manifest() -> dict:
+    manifest_path = os.path.join(_get_or_create_internal(), _MANIFEST_NAME)
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _record_snapshot(model_name: str, snapshot_path: str):
     cache_dir = _get_or_create_internal()
+    manifest_path = os.path.join(cache_dir, _MANIFEST_NAME)
+    with _manifest_lock:
+        manifest = _read_manifest()
+        # Relative, so that the cache stays valid if the storage directory moves
+        manifest[model_name] = os.path.relpath(snapshot_path, cache_dir)
+        temp_path = manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(temp_path, manifest_path)
+
+
+def _is_complete_snapshot(snapshot_path: str) -> bool:
+    """
+    Whether the snapshot has the files _SNAPSHOT_PATTERNS are meant to fetch: the config, weights and the files
+    of a tokenizer. Snapshots downloaded with fewer patterns (e.g. without vocab.txt) are not.
+    """
+    try:
+        names = os.listdir(snapshot_path)
+    except OSError:
+        return False
+    return "config.json" in names \
+        and any(name.endswith(_WEIGHTS_SUFFIXES) for name in names) \
+        and any(name in _TOKENIZER_FILES or name.endswith(".model") for name in names)
+
+
+def model_revisions() -> dict:
+    """
+    Returns the snapshot (i.e. the revision) each resolved model was loaded from, by model name.
+    """
+    return _read_manifest()
 
+
+def resolve_model(model_name: str) -> str:
+    """
+    Returns the local snapshot directory of a Hugging Face model, downloading it only if it is not cached yet
+    or incomplete. Resolved snapshots are recorded in a manifest under the model cache, so later calls neither
+    touch the network nor the hub's cache metadata. Nothing is loaded here.
+    """
+    cache_dir = _get_or_create_internal()
+    relative_path = _read_manifest().get(model_name)
+    if relative_path is not None:
+        snapshot_path = os.path.join(cache_dir, relative_path)
+        if _is_complete_snapshot(snapshot_path):
+            return snapshot_path
+
+    from huggingface_hub import snapshot_download
+
+    _set_hf_cache()
     try:
         # Check if model exists locally
-        snapshot_download(
-            model_name,
-            cache_dir=cache_dir,
-            local_files_only=True
-        )
-    except FileNotFoundError:
-        # Download with proper structure
-        snapshot_download(
-            model_name,
-            cache_dir=cache_dir,
-            allow_patterns=["*.json", "*.model", "*.bin", "*.safetensors"]
-        )
-
-    # Now load normally
-    AutoTokenizer.from_pretrained(model_name, cache_dir=cache_dir)
-    AutoModel.from_pretrained(model_name, cache_dir=cache_dir)
-
-
-def load_transformer(model_name: str):
+        snapshot_path = snapshot_download(model_name, cache_dir=cache_dir, local_files_only=True)
+    except (FileNotFoundError, OSError, ValueError):
+        snapshot_path = None
+    if snapshot_path is None or not _is_complete_snapshot(snapshot_path):
+        # Download with proper structure; files that are already cached are not fetched again
+        snapshot_path = snapshot_download(model_name, cache_dir=cache_dir, allow_patterns=_SNAPSHOT_PATTERNS)
+
+    _record_snapshot(model_name, snapshot_path)
+    return snapshot_path
+
+
+def _weights_options(snapshot_path: str) -> dict:
+    """
+    Prefers the safetensors weights where available and skips initializing the model with random weights before
+    loading them (low_cpu_mem_usage), which keeps the peak memory of a load close to the size of the weights.
+    Neither option keeps the tensors memory-mapped or shares them between processes; workers share the weights
+    because they are forked after the load (see workerPool).
+    """
+    if any(name.endswith(".safetensors") for name in os.listdir(snapshot_path)):
+        return {"use_safetensors": True, "low_cpu_mem_usage": True}
+    return {}
+
+
+def ensure_transformer(model_name: str) -> str:
+    """
+    Makes sure the files of the model are cached and returns their directory.
+    """
+    return resolve_model(model_name)
+
+
+def load_transformer(model_name: str, precision: str = FP32, device: str = None):
+    """
+    Returns the shared (tokenizer, model) of the specified model in eval mode on `device` (by default the
+    inference_device of the precision), loading it first if necessary. Operations must not move or otherwise
+    modify the shared model.
+    """
+    device = device if device else inference_device(precision)
+    return get_model("transformer", model_name, lambda: _load_transformer(model_name, precision, device),
+                      precision=precision, device=device)
+
+
+def _load_transformer(model_name: str, precision: str = FP32, device: str = "cpu"):
     """
     Ensure the model is cached, then load and return (tokenizer, model)
-    strictly from disk (no network).
+    strictly from disk (no network). The weights are read exactly once.
     """
     from transformers import AutoTokenizer, AutoModel
 
-    _set_hf_cache()
-    cache_dir = _get_or_create_internal()
+    snapshot_path = resolve_model(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(snapshot_path, local_files_only=True)
+    model = AutoModel.from_pretrained(snapshot_path, local_files_only=True, **_weights_options(snapshot_path))
+    return tokenizer, apply_precision(model.eval(), precision).to(device)
 
-    # First, ensure the files are present
-    ensure_transformer(model_name)
 
-    # Then load offline
-    tokenizer = AutoTokenizer.from_pretrained(
-        model_name,
-        cache_dir=cache_dir,
-        local_files_only=True
-    )
-    model = AutoModel.from_pretrained(
-        model_name,
-        cache_dir=cache_dir,
-        local_files_only=True
-    )
-    return tokenizer, model
+def load_pipeline(task: str, model_name: str, precision: str = FP32):
+    """
+    Returns the shared transformers pipeline for the task and model, loading it first if necessary. The pipeline
+    is prepared for use by several steps and threads at once (see serialize_preprocessing) and records its stages
+    in the metrics of the step it runs in.
+    """
+    return get_model("pipeline", model_name, lambda: _load_pipeline(task, model_name, precision), task=task,
+                      precision=precision)
 
 
-def load_pipeline(task: str, model_name: str):
+def _load_pipeline(task: str, model_name: str, precision: str = FP32):
     from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
 
-    _set_hf_cache()
-    cache_dir = _get_or_create_internal()
-
     # 1) Make sure the files are on disk (this will fetch if missing)
-    try:
-        AutoTokenizer.from_pretrained(model_name, local_files_only=True, cache_dir=cache_dir)
-        AutoModelForSequenceClassification.from_pretrained(model_name, local_files_only=True, cache_dir=cache_dir)
-    except OSError:
-        AutoTokenizer.from_pretrained(model_name, cache_dir=cache_dir)
-        AutoModelForSequenceClassification.from_pretrained(model_name, cache_dir=cache_dir)
+    snapshot_path = resolve_model(model_name)
 
-    # 2) Load strictly offline
-    tok = AutoTokenizer.from_pretrained(model_name, local_files_only=True, cache_dir=cache_dir)
-    mdl = AutoModelForSequenceClassification.from_pretrained(model_name, local_files_only=True, cache_dir=cache_dir)
+    # 2) Load strictly offline, once
+    tok = AutoTokenizer.from_pretrained(snapshot_path, local_files_only=True)
+    mdl = AutoModelForSequenceClassification.from_pretrained(snapshot_path, local_files_only=True,
+                                                             **_weights_options(snapshot_path))
+    mdl = apply_precision(mdl.eval(), precision)
 
     # 3) Build a pipeline with preloaded objects
-    return pipeline(task, model=mdl, tokenizer=tok)
+    classifier = pipeline(task, model=mdl, tokenizer=tok)
+    serialize_preprocessing(classifier)
+    instrumentPipeline(classifier)
+    return classifier
+
+
+def serialize_preprocessing(pipeline):
+    """
+    Fast tokenizers must not be used by several threads at once. Guards the preprocessing of the pipeline
+    with a lock (available as `tokenization_lock`), while forward passes of concurrent batches still run in
+    parallel.
+    """
+    if not hasattr(pipeline, "preprocess") or hasattr(pipeline, "tokenization_lock"):
+        return
+
+    lock = threading.Lock()
+    preprocess = pipeline.preprocess
+
+    def locked_preprocess(*args, **kwargs):
+        with lock:
+            return preprocess(*args, **kwargs)
+
+    pipeline.preprocess = locked_preprocess
+    pipeline.tokenization_lock = lock
 
 
 def load_sentence_transformer(model_name: str):
+    """
+    Returns the shared sentence-transformers model, loading it first if necessary.
+    """
+    return get_model("sentence_transformer", model_name, lambda: _load_sentence_transformer(model_name))
+
+
+def _load_sentence_transformer(model_name: str):
     from sentence_transformers import SentenceTransformer
     internal_storage = _get_or_create_internal()
 
@@ -1,7 +1,9 @@
 import sys
+import threading
+import time
 from abc import ABC, abstractmethod
 from typing import List, Dict, TypeVar, Generic, Optional, Union
-from backend.transferObjects.eventTransferObjects import StepStatus, LogLevels
+from backend.transferObjects.eventTransferObjects import StepStatus, LogLevels, StepState
 
 # Define a generic type variable
 T = TypeVar("T")
@@ -71,12 +73,46 @@ class StatusChannel(Channel[StepStatus]):
         print(f"Status received: {status.to_json()}")
 
 
+class StatusCoalescer:
+    """
+    Limits the RUNNING updates of each step to at most one per interval and drops those whose (rounded) progress
+    did not change. All other states (e.g. SUCCESS and FAILED) always pass immediately.
+    """
+    DEFAULT_INTERVAL = 0.1  # seconds
+
+    def __init__(self, min_interval: float = DEFAULT_INTERVAL, progress_precision: int = 1):
+        self.min_interval = min_interval
+        self.progress_precision = progress_precision
+        self.last_forwarded = {}  # domain -> (time, progress)
+        self.lock = threading.Lock()
+
+    def accept(self, status: StepStatus) -> bool:
+        key = tuple(status.domain.to_json().values()) if status.domain else None
+        with self.lock:
+            if status.state != StepState.RUNNING:
+                self.last_forwarded.pop(key, None)
+                return True
+
+            now = time.monotonic()
+            progress = round(status.progress, self.progress_precision)
+            if key in self.last_forwarded:
+                last_time, last_progress = self.last_forwarded[key]
+                if progress == last_progress or now - last_time < self.min_interval:
+                    return False
+            self.last_forwarded[key] = (now, progress)
+            return True
+
+
 # Implement the StatusManager by inheriting from Multiplexer
 class StatusManager(Multiplexer[StepStatus]):
-    def __init__(self, channels: Optional[Dict[str, Channel[StepStatus]]] = None):
+    def __init__(self, channels: Optional[Dict[str, Channel[StepStatus]]] = None,
+                 coalescer: Optional[StatusCoalescer] = None):
         super().__init__(channels if channels is not None else {"default": StatusChannel()})
+        self.coalescer = coalescer
 
     def send_status(self, status: StepStatus):
+        if self.coalescer is not None and not self.coalescer.accept(status):
+            return
         self.multiplex(status)
 
     # Allow StatusManager to be called directly
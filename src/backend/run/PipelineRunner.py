@@ -1,15 +1,23 @@
+import threading
 import traceback
+from collections import deque
+from contextlib import nullcontext
 from typing import Dict, List, Union
 
 from backend.run.backendEventApi import BackendEventApi
 from backend.transferObjects.eventTransferObjects import StepState, StepLogUpdate, NotificationDomain, StepStatus, Log, \
     LogLevels
 from backend.core.register import Register
-from backend.run.LogManager import LogManager, LoggerChannel, StatusManager, StatusChannel
+from backend.operations.model_prewarmer import ModelPrewarmer
+from backend.run.LogManager import LogManager, LoggerChannel, StatusManager, StatusChannel, StatusCoalescer
+from backend.storage.stepCache import StepCache
 from backend.transferObjects.visualization import MultiVisualization
 from backend.types.blueprint import StepBlueprint
 from backend.types.frontendNotifier import FrontendNotifier
+from backend.types.instrumentation import StepMetrics, collecting
 from backend.types.payload import Payload
+from backend.types.threadPolicy import ThreadPolicy
+from backend.types.visualizationPolicy import VisualizationPolicy
 from backend.types.pipeline import Pipeline
 
 
@@ -27,6 +35,103 @@ class FrontendLogChannel(LoggerChannel):
         self.events.sendStepLogs(StepLogUpdate(self.domain, logMessages))
 
 
+class BufferedFrontendLogChannel(FrontendLogChannel):
+    """
+    Collects logs in a bounded buffer and sends them to the frontend in batches from a background thread, once
+    `batch_size` logs are waiting or every `flush_interval` seconds. Logging thus never blocks on the frontend.
+    When the buffer is full, DEBUG logs are dropped first, then the oldest ones.
+    Batches that cannot be sent are reported to `errorChannel` (e.g. the run's console log), and the frontend is
+    told how many logs it missed with the next batch that gets through.
+    """
+
+    def __init__(self, events: BackendEventApi, domain: NotificationDomain, max_logs: int = 5000,
+                 batch_size: int = 200, flush_interval: float = 0.25, errorChannel: LoggerChannel = None):
+        super(BufferedFrontendLogChannel, self).__init__(events, domain)
+        self.max_logs = max_logs
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.errorChannel = errorChannel if errorChannel is not None else LoggerChannel()
+
+        self.buffer = deque()
+        self.dropped = 0
+        self.unsent = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        # Held while sending, so that batches keep their order and belong to the domain they were logged in.
+        self.send_lock = threading.Lock()
+
+        self.flusher = threading.Thread(target=self._flushLoop, name="FrontendLogFlusher", daemon=True)
+        self.flusher.start()
+
+    def handle(self, obj: Dict[str, Union[str, LogLevels]]):
+        messages: List[str] = obj.get("messages", [])
+        level: LogLevels = obj.get("level", LogLevels.INFO)
+        with self.condition:
+            for message in messages:
+                self._append(Log(level, message))
+            if len(self.buffer) >= self.batch_size:
+                self.condition.notify()
+
+    def _append(self, log: Log):
+        if len(self.buffer) >= self.max_logs:
+            self.dropped += 1
+            if log.level == LogLevels.DEBUG:
+                return
+            for buffered in self.buffer:
+                if buffered.level == LogLevels.DEBUG:
+                    self.buffer.remove(buffered)
+                    break
+            else:
+                self.buffer.popleft()
+        self.buffer.append(log)
+
+    def _sendBuffered(self):
+        with self.condition:
+            logs = list(self.buffer)
+            self.buffer.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped > 0:
+            logs.insert(0, Log(LogLevels.WARN, f"{dropped} log messages were dropped due to high log volume."))
+        if self.unsent > 0 and logs:
+            logs.insert(0, Log(LogLevels.WARN, f"{self.unsent} log messages could not be sent to the frontend."))
+        for start in range(0, len(logs), self.batch_size):
+            batch = logs[start:start + self.batch_size]
+            try:
+                self.events.sendStepLogs(StepLogUpdate(self.domain, batch))
+                if start == 0:
+                    self.unsent = 0
+            except Exception as e:
+                self.unsent += len(batch)
+                self.errorChannel.handle({"messages": [f"Failed to send {len(batch)} log messages to the frontend: "
+                                                       f"{repr(e)}"], "level": LogLevels.ERROR})
+
+    def _flushLoop(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.closed or len(self.buffer) >= self.batch_size,
+                                        timeout=self.flush_interval)
+                closed = self.closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self):
+        with self.send_lock:
+            self._sendBuffered()
+
+    def setDomain(self, domain: NotificationDomain):
+        # Logs of the previous domain are sent before switching.
+        with self.send_lock:
+            self._sendBuffered()
+            self.domain = domain
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.flusher.join()
+
+
 class FrontendStatusChannel(StatusChannel):
     def __init__(self, events: BackendEventApi, domain: NotificationDomain):
         self.events = events
@@ -39,34 +144,67 @@ class FrontendStatusChannel(StatusChannel):
 
 class RunNotifier(FrontendNotifier):
 
-    def __init__(self, events: BackendEventApi):
+    def __init__(self, events: BackendEventApi, status_interval: float = StatusCoalescer.DEFAULT_INTERVAL):
         super(RunNotifier, self).__init__()
         self.events = events
         self.logger = LogManager()
         self.logger.set_channel("console", LoggerChannel()) # Always also log to console
-        self.status_manager = StatusManager()
+        self.log_channel = None
+        # Operations may report progress for every cell; only forward what the frontend can make use of.
+        self.status_manager = StatusManager(coalescer=StatusCoalescer(status_interval))
         self.domain = None
 
     def log(self, message: str | List[str], level: LogLevels = LogLevels.DEBUG):
         self.logger.log(message, level)
 
     def sendStatus(self, stepState: StepState, progress: float = 0):
+        if stepState != StepState.RUNNING:
+            # The frontend should have all logs of a step once it learns that the step has ended.
+            self.flush()
         status = StepStatus(domain=self.domain, state=stepState, progress=progress)
         self.status_manager.send_status(status)
 
     def withDomain(self, domain: NotificationDomain):
         self.domain = domain
-        self.logger.set_channel("frontend", FrontendLogChannel(self.events, domain))
+        if self.log_channel is None:
+            self.log_channel = BufferedFrontendLogChannel(self.events, domain,
+                                                          errorChannel=self.logger.get_channel("console"))
+            self.logger.set_channel("frontend", self.log_channel)
+        else:
+            self.log_channel.setDomain(domain)
         self.status_manager.set_channel("frontend", FrontendStatusChannel(self.events, domain))
         return self
 
+    def flush(self):
+        if self.log_channel is not None:
+            self.log_channel.flush()
+
+    def close(self):
+        """
+        Sends all remaining logs and stops the background log sender.
+        """
+        if self.log_channel is not None:
+            self.log_channel.close()
+
 
 class PipelineRunner:
+    # Operations visualize single rows; the number of visualizations kept per step is limited, so that memory and
+    # disk use do not grow with the number of rows.
+    VISUALIZATION_POLICY = VisualizationPolicy(max_visualizations=100, sampling=VisualizationPolicy.FIRST_N)
 
-    def __init__(self, events: BackendEventApi, runStorage: "RunStorageApi", registry):
+    def __init__(self, events: BackendEventApi, runStorage: "RunStorageApi", registry,
+                 visualizationPolicy: VisualizationPolicy = None, stepCache: StepCache = None,
+                 prewarmer: ModelPrewarmer = None, threadPolicy: ThreadPolicy = None):
         self.events = events
         self.storage = runStorage
         self.registry = registry
+        self.visualizationPolicy = visualizationPolicy if visualizationPolicy else PipelineRunner.VISUALIZATION_POLICY
+        # Outputs of steps whose inputs and config did not change since an earlier run are taken from this cache.
+        self.stepCache = stepCache
+        # Loads the models of later steps while the first step runs
+        self.prewarmer = prewarmer
+        # CPU threads and workers the steps of this run may use
+        self.threadPolicy = threadPolicy
 
 
     def __call__(self, *args, **kwargs):
@@ -83,12 +221,38 @@ class PipelineRunner:
         # TODO: Add domain in frontend for general logs
         notifier.withDomain(NotificationDomain(run_id, pipeline.id, 0))
 
+        try:
+            blueprint_steps = [blueprints[stepVal.stepId] for stepVal in pipeline.steps]
+            payload = self._createPayload(notifier, blueprint_steps, input)
+            self._saveCheckpoint(notifier, run_id, 0, payload)
+            self._runSteps(notifier, blueprint_steps, pipeline, run_id, payload, 0)
+        finally:
+            notifier.close()
+
+    def resume(self, blueprints: Dict[str, StepBlueprint], pipeline: Pipeline, run_id: str, from_step: int):
+        """
+        Continues an earlier run at step `from_step`, starting from the payload checkpointed before that step.
+        """
+        notifier = RunNotifier(self.events)
+        notifier.withDomain(NotificationDomain(run_id, pipeline.id, from_step))
+
+        try:
+            blueprint_steps = [blueprints[stepVal.stepId] for stepVal in pipeline.steps]
+            payload = Payload(self.storage.loadCheckpoint(run_id, from_step))
+            payload.setVisualizationPolicy(self.visualizationPolicy)
+            notifier.log(f"Resuming run at step {from_step}.", LogLevels.INFO)
+            self._runSteps(notifier, blueprint_steps, pipeline, run_id, payload, from_step)
+        finally:
+            notifier.close()
+
+    def _createPayload(self, notifier: RunNotifier, blueprint_steps: List[StepBlueprint], input: str) -> Payload:
+
         # 2. Create payload and initialize input data
 
         payload = Payload()
+        payload.setVisualizationPolicy(self.visualizationPolicy)
 
         # Find first csv parameter in first step
-        blueprint_steps = [blueprints[stepVal.stepId] for stepVal in pipeline.steps]
         base_csv_type = self.registry.ParamTypeParser.parse("csv[]")
 
         first_csv_parameter = None
@@ -108,33 +272,60 @@ class PipelineRunner:
             payload.original_data = input_data_object
             payload.data = input_data_object
 
+        return payload
+
+    def _runSteps(self, notifier: RunNotifier, blueprint_steps: List[StepBlueprint], pipeline: Pipeline,
+                  run_id: str, payload: Payload, firstStep: int):
+
         # 3. Run step by step
 
-        stepIndex = 0
-        for step, stepVals in zip(blueprint_steps, pipeline.steps):
-            notifier.withDomain(NotificationDomain(run_id, pipeline.id, stepIndex))
-            try:
-                result = step.run(stepVals, payload, notifier)
-            except Exception as e:
-                from backend.core.errors import PipelineError
-                err = PipelineError(f"Backend exception during run: {repr(e)}", step_id=stepVals.stepId)
-                traceback_str = traceback.format_exc()
-                notifier.log(traceback_str, LogLevels.ERROR)
-                notifier.log(err.message, LogLevels.ERROR)
-                notifier.sendStatus(StepState.FAILED)
-                return
+        if self.prewarmer is not None:
+            self.prewarmer.prewarmSteps(blueprint_steps[firstStep + 1:], pipeline.steps[firstStep + 1:])
 
-            if not result or result == StepState.FAILED:
-                notifier.sendStatus(StepState.FAILED)
-                return
+        for stepIndex in range(firstStep, len(blueprint_steps)):
+            step, stepVals = blueprint_steps[stepIndex], pipeline.steps[stepIndex]
+            notifier.withDomain(NotificationDomain(run_id, pipeline.id, stepIndex))
+            cacheKey = self._cacheKey(notifier, step, stepVals, payload)
+            cached = self._loadCached(notifier, cacheKey)
+            if cached is not None:
+                notifier.log(f"Inputs and config of step {stepIndex} are unchanged, using cached outputs.",
+                             LogLevels.INFO)
+                for name, value in cached.outputs.items():
+                    payload[name] = value
+                visualizations = cached.visualizations
+                artifacts = cached.artifacts
+            else:
+                metrics = StepMetrics()
+                threadPolicy = ThreadPolicy.forStep(stepVals.values, self.threadPolicy)
+                try:
+                    with collecting(metrics), threadPolicy.applied() if threadPolicy else nullcontext():
+                        result = step.run(stepVals, payload, notifier, threadPolicy=threadPolicy)
+                except Exception as e:
+                    self._saveMetrics(notifier, run_id, stepIndex, metrics)
+                    from backend.core.errors import PipelineError
+                    err = PipelineError(f"Backend exception during run: {repr(e)}", step_id=stepVals.stepId)
+                    traceback_str = traceback.format_exc()
+                    notifier.log(traceback_str, LogLevels.ERROR)
+                    notifier.log(err.message, LogLevels.ERROR)
+                    notifier.sendStatus(StepState.FAILED)
+                    return
+
+                self._saveMetrics(notifier, run_id, stepIndex, metrics)
+                if not result or result == StepState.FAILED:
+                    notifier.sendStatus(StepState.FAILED)
+                    return
+
+                visualizations = payload.popVisualizations()
+                artifacts = payload.popArtifacts()
+                self._saveCached(notifier, cacheKey, step, payload, visualizations, artifacts)
 
-            visualizations = payload.popVisualizations()
             print(f"Got visualizations: {len(visualizations)}")
             if len(visualizations) == 1:
                 self.storage.saveVisualization(run_id, stepIndex, visualizations[0])
             elif len(visualizations) > 1:
                 allVisualizations = MultiVisualization(visualizations)
                 self.storage.saveVisualization(run_id, stepIndex, allVisualizations)
+            self._saveArtifacts(notifier, run_id, stepIndex, artifacts)
 
             if stepIndex == len(blueprint_steps) - 1:
                 # Last step finished, save the latest data object to filesystem
@@ -143,9 +334,62 @@ class PipelineRunner:
                     self.storage.saveResult(run_id, result)
                 notifier.log(f"Finished processing last step. Saved result to file.", LogLevels.INFO)
             else:
+                self._saveCheckpoint(notifier, run_id, stepIndex + 1, payload)
                 notifier.log(f"Finished processing step {stepIndex}.", LogLevels.INFO)
 
             notifier.sendStatus(StepState.SUCCESS, 100)
-            stepIndex += 1
 
         notifier.sendStatus(StepState.SUCCESS, 100)
+
+    def _saveMetrics(self, notifier: RunNotifier, run_id: str, stepIndex: int, metrics: StepMetrics):
+        notifier.log(["Timings:"] + metrics.summary(), LogLevels.INFO)
+        try:
+            self.storage.saveMetrics(run_id, stepIndex, metrics.toJson())
+        except Exception as e:
+            notifier.log(f"Could not save metrics of step {stepIndex}: {repr(e)}", LogLevels.WARN)
+
+    def _saveArtifacts(self, notifier: RunNotifier, run_id: str, stepIndex: int, artifacts: dict):
+        for name, value in artifacts.items():
+            try:
+                path = self.storage.saveArtifact(run_id, stepIndex, name, value)
+                notifier.log(f"Saved {name} of step {stepIndex} to {path}.", LogLevels.INFO)
+            except Exception as e:
+                notifier.log(f"Could not save {name} of step {stepIndex}: {repr(e)}", LogLevels.WARN)
+
+    def _saveCheckpoint(self, notifier: RunNotifier, run_id: str, stepIndex: int, payload: Payload):
+        values = {key: value for key, value in payload.items() if key not in ("visualizations", "artifacts")}
+        try:
+            self.storage.saveCheckpoint(run_id, stepIndex, values)
+        except Exception as e:
+            notifier.log(f"Could not save checkpoint before step {stepIndex}: {repr(e)}", LogLevels.WARN)
+
+    def _cacheKey(self, notifier: RunNotifier, step: StepBlueprint, stepVals, payload: Payload):
+        if self.stepCache is None:
+            return None
+        try:
+            return self.stepCache.fingerprint(step, stepVals, payload)
+        except Exception as e:
+            notifier.log(f"Could not fingerprint step inputs, the step cache is not used: {repr(e)}", LogLevels.WARN)
+            return None
+
+    def _loadCached(self, notifier: RunNotifier, cacheKey: str):
+        if cacheKey is None:
+            return None
+        try:
+            return self.stepCache.load(cacheKey)
+        except Exception as e:
+            notifier.log(f"Could not read cached step outputs: {repr(e)}", LogLevels.WARN)
+            return None
+
+    def _saveCached(self, notifier: RunNotifier, cacheKey: str, step: StepBlueprint, payload: Payload,
+                    visualizations: list, artifacts: dict):
+        if cacheKey is None:
+            return
+        # Operations may also change the data in place, so it is always part of the cached outputs.
+        names = {"data"} | {output.name for output in step.inOutDef.outputs}
+        outputs = {name: payload[name] for name in names
+                   if name in payload and name not in ("visualizations", "artifacts")}
+        try:
+            self.stepCache.save(cacheKey, outputs, visualizations, artifacts)
+        except Exception as e:
+            notifier.log(f"Could not cache step outputs: {repr(e)}", LogLevels.WARN)
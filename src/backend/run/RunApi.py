@@ -1,7 +1,7 @@
 import json
 import os.path
+import pickle
 import shutil
-import threading
 import uuid
 from tkinter import filedialog
 
@@ -9,8 +9,14 @@ import pandas
 
 from backend.run.backendEventApi import BackendEventApi
 from backend.types.pipeline import Pipeline
+from backend.operations.model_prewarmer import PREWARMER
+from backend.operations.operation_utils import model_revisions
 from backend.run.PipelineRunner import PipelineRunner
+from backend.run.RunScheduler import RunScheduler
+from backend.storage.parsing import PipelineParser
+from backend.storage.stepCache import StepCache
 from backend.storage.storageApi import StorageApi
+from backend.transferObjects.eventTransferObjects import NotificationDomain
 from backend.transferObjects.pipelineTransferObjects import convert_pipeline_to_transfer
 from backend.transferObjects.visualization import Visualization
 
@@ -30,6 +36,7 @@ class RunStorageApi:
         base_path = os.path.join(self.directory, run_id)
         viz_path = os.path.join(base_path, "visualizations")
         os.makedirs(viz_path)
+        os.makedirs(os.path.join(base_path, "checkpoints"))
 
         # Save the original pipeline, so it can be reconstructed
         original_pipeline = convert_pipeline_to_transfer(pipeline).to_dict()
@@ -61,7 +68,7 @@ class RunStorageApi:
         base_path = os.path.join(self.directory, run_id, "visualizations")
         viz_path = os.path.join(base_path, f"{stepIndex}.json")
         with open(viz_path, 'w') as f:
-            json.dump(viz.toJson(), f, indent=4)
+            json.dump(viz.toJson(), f)
         return True
 
     def getVisualization(self, run_id, stepIndex: int) -> dict:
@@ -71,6 +78,63 @@ class RunStorageApi:
             viz_json = json.load(f)
         return viz_json
 
+    def saveMetrics(self, run_id, stepIndex: int, metrics: dict):
+        base_path = os.path.join(self.directory, run_id, "metrics")
+        os.makedirs(base_path, exist_ok=True)
+        with open(os.path.join(base_path, f"{stepIndex}.json"), 'w') as f:
+            json.dump(metrics, f, indent=4)
+        return True
+
+    def getMetrics(self, run_id, stepIndex: int) -> dict:
+        metrics_path = os.path.join(self.directory, run_id, "metrics", f"{stepIndex}.json")
+        with open(metrics_path, 'r') as f:
+            return json.load(f)
+
+    def saveArtifact(self, run_id, stepIndex: int, name: str, value) -> str:
+        """
+            Saves an array produced by step `stepIndex` as `artifacts/{stepIndex}/{name}.npy`, which can be opened
+            memory-mapped with numpy.load(path, mmap_mode="r").
+        """
+        import numpy as np
+
+        base_path = os.path.join(self.directory, run_id, "artifacts", str(stepIndex))
+        os.makedirs(base_path, exist_ok=True)
+        artifact_path = os.path.join(base_path, f"{name}.npy")
+        temp_path = artifact_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, np.asarray(value))
+        os.replace(temp_path, artifact_path)
+        return artifact_path
+
+    def getArtifactPath(self, run_id, stepIndex: int, name: str):
+        artifact_path = os.path.join(self.directory, run_id, "artifacts", str(stepIndex), f"{name}.npy")
+        if os.path.isfile(artifact_path):
+            return artifact_path
+        raise FileNotFoundError(f"Step {stepIndex} of run {run_id} has not saved {name}.")
+
+    def saveCheckpoint(self, run_id, stepIndex: int, values: dict):
+        """
+            Saves the payload values step `stepIndex` starts with, so that the run can be resumed at that step.
+        """
+        base_path = os.path.join(self.directory, run_id, "checkpoints")
+        os.makedirs(base_path, exist_ok=True)
+        checkpoint_path = os.path.join(base_path, f"{stepIndex}.pkl")
+        temp_path = checkpoint_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(values, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, checkpoint_path)
+        return True
+
+    def hasCheckpoint(self, run_id, stepIndex: int):
+        return os.path.isfile(os.path.join(self.directory, run_id, "checkpoints", f"{stepIndex}.pkl"))
+
+    def loadCheckpoint(self, run_id, stepIndex: int) -> dict:
+        checkpoint_path = os.path.join(self.directory, run_id, "checkpoints", f"{stepIndex}.pkl")
+        if not os.path.isfile(checkpoint_path):
+            raise FileNotFoundError(f"No checkpoint has been saved for step {stepIndex} of run {run_id}.")
+        with open(checkpoint_path, 'rb') as f:
+            return pickle.load(f)
+
     def saveResult(self, run_id, data: pandas.DataFrame):
         base_path = os.path.join(self.directory, run_id)
         save_path = os.path.join(base_path, "result.csv")
@@ -109,20 +173,25 @@ class RunStorageApi:
 
 class RunApi:
 
+    # Further runs wait in a queue, so that concurrent runs do not compete for memory and cores.
+    MAX_CONCURRENT_RUNS = 1
+
     def __init__(self, storage: StorageApi, events: BackendEventApi, registry):
         self.runs_dir = storage.PATHS.runs
         self._pipelineApi = storage.PIPELINES
         self._stepApi = storage.STEPS
         self._runStorageApi = RunStorageApi(run_directory=self.runs_dir)
+        self._stepCache = StepCache(os.path.join(storage.PATHS.cache, "steps"), modelRevisions=model_revisions)
         self._eventApi = events
         self._registry = registry
+        self._scheduler = RunScheduler(events, max_concurrent_runs=RunApi.MAX_CONCURRENT_RUNS)
 
 
     def invokeEvent(self, name, data_object):
         self._eventApi.sendEvent(name, data_object)
 
     '''
-    Starts the new run in a separate Thread and returns its identifier (run_id)
+    Queues the new run, which is executed by the run scheduler, and returns its identifier (run_id)
     '''
     def startRun(self, pipelineId, input_handle) -> str:
 
@@ -136,15 +205,42 @@ class RunApi:
         def runStep():
             pipeline = self._pipelineApi.load_pipeline(pipelineId)
             blueprints = {bp.stepId: bp for bp in self._stepApi.load_all()}
-            runner = PipelineRunner(self._eventApi, self._runStorageApi, self._registry)
+            runner = PipelineRunner(self._eventApi, self._runStorageApi, self._registry, stepCache=self._stepCache,
+                                    prewarmer=PREWARMER, threadPolicy=self._scheduler.threadPolicy)
             runner.start(blueprints, pipeline, run_id, input_data)
 
-        runThread = threading.Thread(target=runStep, name=f"StepRunner for {run_id}", daemon=True)
-        runThread.start()
+        self._scheduler.submit(run_id, NotificationDomain(run_id, pipelineId, 0), runStep)
+
+        return run_id
+
+    '''
+    Queues the resumption of an earlier run at step `from_step`, using the pipeline as it was when the run
+    was started and the data checkpointed before that step. Returns the run_id. The run must not be queued or
+    running anymore.
+    '''
+    def resumeRun(self, run_id, from_step: int) -> str:
+        if self._scheduler.isScheduled(run_id):
+            raise ValueError(f"Run {run_id} is still queued or running. Wait until it has finished to resume it.")
+        pipeline = PipelineParser.from_json(self._runStorageApi.getRunPipeline(run_id))
+        if not 0 <= from_step < len(pipeline.steps):
+            raise IndexError(f"Run {run_id} has no step {from_step}.")
+        if not self._runStorageApi.hasCheckpoint(run_id, from_step):
+            raise FileNotFoundError(f"No checkpoint has been saved for step {from_step} of run {run_id}.")
+
+        def resumeSteps():
+            blueprints = {bp.stepId: bp for bp in self._stepApi.load_all()}
+            runner = PipelineRunner(self._eventApi, self._runStorageApi, self._registry, stepCache=self._stepCache,
+                                    prewarmer=PREWARMER, threadPolicy=self._scheduler.threadPolicy)
+            runner.resume(blueprints, pipeline, run_id, from_step)
+
+        self._scheduler.submit(run_id, NotificationDomain(run_id, pipeline.id, from_step), resumeSteps)
 
         return run_id
 
 
+    def getQueuePosition(self, run_id):
+        return self._scheduler.getQueuePosition(run_id)
+
     def getVisualization(self, run_id, stepIndex: int):
         return self._runStorageApi.getVisualization(run_id, stepIndex)
 
@@ -152,6 +248,9 @@ class RunApi:
         dataframe = self._runStorageApi.getResult(run_id)
         return dataframe.to_json(orient='records')
 
+    def getMetrics(self, run_id, stepIndex: int):
+        return self._runStorageApi.getMetrics(run_id, stepIndex)
+
     def getOriginalPipeline(self, run_id):
         return self._runStorageApi.getRunPipeline(run_id)
 
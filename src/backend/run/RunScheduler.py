@@ -0,0 +1,106 @@
+import os
+import queue
+import threading
+import traceback
+from typing import Callable, Optional
+
+from backend.run.backendEventApi import BackendEventApi
+from backend.transferObjects.eventTransferObjects import StepStatus, StepState, NotificationDomain
+from backend.types.threadPolicy import ThreadPolicy
+
+
+class RunScheduler:
+    """
+    Executes runs from a FIFO queue with at most `max_concurrent_runs` runs at the same time. Runs waiting in the
+    queue are reported to the frontend as QUEUED.
+
+    Every run gets a budget of `threads_per_run` CPU threads (by default the cores divided by the number of
+    concurrent runs). `threadPolicy` describes it; runs apply it to their steps, so that concurrent runs do not
+    oversubscribe the cores.
+    """
+
+    def __init__(self, events: BackendEventApi, max_concurrent_runs: int = 1, threads_per_run: Optional[int] = None):
+        if max_concurrent_runs < 1:
+            raise ValueError("At least one run must be allowed to run at a time.")
+        self.events = events
+        self.max_concurrent_runs = max_concurrent_runs
+        self.threads_per_run = threads_per_run if threads_per_run else \
+            max(1, (os.cpu_count() or 1) // max_concurrent_runs)
+        self.threadPolicy = ThreadPolicy.forBudget(self.threads_per_run)
+
+        self.queue = queue.Queue()
+        self.workers = []
+        self.workers_lock = threading.Lock()
+        self.queued = []  # run ids in order of submission
+        self.active = set()
+        self.state_lock = threading.Lock()
+
+    def submit(self, run_id: str, domain: NotificationDomain, job: Callable[[], None]):
+        """
+        Queues `job`, which executes the run `run_id`. `domain` is the step that is shown as QUEUED until the
+        run starts. Returns immediately. Raises a ValueError if the run is already queued or running, since two
+        executions of a run would write into the same run directory.
+        """
+        with self.state_lock:
+            if self._isScheduled(run_id):
+                raise ValueError(f"Run {run_id} is already queued or running.")
+            self.queued.append(run_id)
+        self.events.sendStepStatus(StepStatus(domain=domain, state=StepState.QUEUED, progress=0))
+        self.queue.put((run_id, job))
+        self._ensureWorkers()
+
+    def isScheduled(self, run_id: str) -> bool:
+        """
+        Returns whether the run is queued or running.
+        """
+        with self.state_lock:
+            return self._isScheduled(run_id)
+
+    def _isScheduled(self, run_id: str) -> bool:
+        return run_id in self.active or run_id in self.queued
+
+    def getQueuePosition(self, run_id: str) -> Optional[int]:
+        """
+        Returns the number of queued runs that will start before the given run (0 if it starts next), or None if
+        the run is not waiting in the queue (it is running, has finished or is unknown).
+        """
+        with self.state_lock:
+            return self.queued.index(run_id) if run_id in self.queued else None
+
+    def getStatistics(self) -> dict:
+        with self.state_lock:
+            return {
+                "queued": len(self.queued),
+                "running": len(self.active),
+                "max_concurrent_runs": self.max_concurrent_runs,
+                "threads_per_run": self.threads_per_run
+            }
+
+    def join(self):
+        """
+        Blocks until all submitted runs have finished.
+        """
+        self.queue.join()
+
+    def _ensureWorkers(self):
+        with self.workers_lock:
+            while len(self.workers) < self.max_concurrent_runs:
+                worker = threading.Thread(target=self._workerLoop, name=f"RunWorker-{len(self.workers)}", daemon=True)
+                worker.start()
+                self.workers.append(worker)
+
+    def _workerLoop(self):
+        while True:
+            run_id, job = self.queue.get()
+            with self.state_lock:
+                self.queued.remove(run_id)
+                self.active.add(run_id)
+            try:
+                job()
+            except Exception:
+                print(f"Run {run_id} failed unexpectedly:")
+                traceback.print_exc()
+            finally:
+                with self.state_lock:
+                    self.active.discard(run_id)
+                self.queue.task_done()
@@ -1,10 +1,40 @@
+import json
+import queue
+import threading
+import time
+
 import webview
 from webview import JavascriptException
 
 from backend.transferObjects.eventTransferObjects import StepStatus, StepLogUpdate
 
 
+# Dispatches every event of a batch as its own CustomEvent on the window
+_DISPATCH_SCRIPT = """
+(function(events) {{
+    for (const e of events) {{
+        window.dispatchEvent(new CustomEvent(e.name, {{ detail: e.detail }}));
+    }}
+}})({events});
+"""
+
+
 class BackendEventApi:
+    """
+    Events are queued and delivered by a single dispatcher thread, which sends all queued events
+    (up to MAX_BATCH_SIZE) with one evaluate_js call. Callers therefore never wait on the webview bridge.
+    """
+    MAX_BATCH_SIZE = 500
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.dispatcher = None
+        self.dispatcher_lock = threading.Lock()
+
+        self.events_sent = 0
+        self.batches_sent = 0
+        self.bridge_time = 0.0
+
     def sendStepLogs(self, stepLogs: StepLogUpdate):
         self.sendEvent("stepLogUpdate", stepLogs.to_json())
 
@@ -12,30 +42,65 @@ class BackendEventApi:
         self.sendEvent("stepStatusUpdate", status.to_json())
 
     def sendEvent(self, event_name, data_json):
-        if not webview.windows:
-            raise RuntimeError("No window set.")
+        self._ensureDispatcher()
+        self.queue.put({"name": event_name, "detail": data_json})
 
+    def flush(self):
+        """
+        Blocks until all events queued so far have been delivered.
+        """
+        if self.dispatcher is not None:
+            self.queue.join()
 
-        try:
-            webview.windows[0].evaluate_js(f"""
-                        (function() {{
-                            const event = new CustomEvent('{event_name}', {{ detail: {data_json} }});
-                            window.dispatchEvent(event);
-                        }})();
-                    """)
-        except JavascriptException as e:
-            print("Error while trying to evaluate javascript:")
-            print(f"""
-                        (function() {{
-                            const event = new CustomEvent('{event_name}', {{ detail: {data_json} }});
-                            window.dispatchEvent(event);
-                        }})();
-                    """)
-            print(repr(e))
-
+    def getStatistics(self) -> dict:
+        return {
+            "events": self.events_sent,
+            "batches": self.batches_sent,
+            "bridge_seconds": round(self.bridge_time, 3),
+            "queued": self.queue.qsize()
+        }
 
+    def _ensureDispatcher(self):
+        if self.dispatcher is not None:
+            return
+        with self.dispatcher_lock:
+            if self.dispatcher is None:
+                self.dispatcher = threading.Thread(target=self._dispatchLoop, name="BackendEventDispatcher",
+                                                   daemon=True)
+                self.dispatcher.start()
 
+    def _dispatchLoop(self):
+        while True:
+            events = [self.queue.get()]
+            while len(events) < self.MAX_BATCH_SIZE:
+                try:
+                    events.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
 
+            try:
+                self._dispatch(events)
+            except Exception as e:
+                print(f"Error while dispatching {len(events)} events: {repr(e)}")
+            finally:
+                for _ in events:
+                    self.queue.task_done()
 
+    def _dispatch(self, events: list):
+        if not webview.windows:
+            raise RuntimeError("No window set.")
 
+        events_json = json.dumps(events, separators=(",", ":"), default=str)
+        script = _DISPATCH_SCRIPT.format(events=events_json)
 
+        start_time = time.perf_counter()
+        try:
+            webview.windows[0].evaluate_js(script)
+        except JavascriptException as e:
+            print("Error while trying to evaluate javascript:")
+            print(script)
+            print(repr(e))
+        finally:
+            self.bridge_time += time.perf_counter() - start_time
+            self.batches_sent += 1
+            self.events_sent += len(events)
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.storage.paths import PATHS
+from backend.transferObjects.eventTransferObjects import LogLevels
+from backend.types.frontendNotifier import FrontendNotifier
+
+
+class EmbeddingStore:
+    """
+    Persistent store of text embeddings, shared by all runs and operations. Embeddings are identified by the
+    space they were computed in (model, pooling, max_length and further options, see `space`) and the hash of
+    the text, so texts that were embedded before are only looked up.
+
+    Every space is a directory with an index (text hash -> segment and row) and segments: float32 arrays of the
+    embeddings saved together, which are read memory-mapped. Segments are evicted least recently used first,
+    once the store exceeds `max_size` bytes.
+    """
+
+    # Increase when the format of the store changes
+    VERSION = 1
+    DEFAULT_MAX_SIZE = 1024 ** 3
+    INDEX_NAME = "index.json"
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.indices: Dict[str, dict] = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def space(model_name: str, pooling: str, max_length: int, **options) -> str:
+        """
+        Identifies the embeddings of a model, computed with the given pooling, truncation and options
+        (e.g. precision or backend).
+        """
+        description = json.dumps({"version": EmbeddingStore.VERSION, "model": model_name, "pooling": pooling,
+                                  "max_length": max_length, **options}, sort_keys=True, default=str)
+        return hashlib.sha256(description.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def textKey(text: str) -> str:
+        return hashlib.sha1(str(text).encode("utf-8")).hexdigest()
+
+    def _spaceDir(self, space: str) -> str:
+        return os.path.join(self.directory, space)
+
+    def _index(self, space: str) -> dict:
+        # Must hold self.lock
+        if space not in self.indices:
+            try:
+                with open(os.path.join(self._spaceDir(space), self.INDEX_NAME), "r") as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {"next_segment": 0, "texts": {}}
+            # Drop entries whose segment was evicted or is missing
+            segments = set(self._segments(space))
+            index["texts"] = {key: entry for key, entry in index["texts"].items() if entry[0] in segments}
+            self.indices[space] = index
+        return self.indices[space]
+
+    def _writeIndex(self, space: str):
+        # Must hold self.lock
+        path = os.path.join(self._spaceDir(space), self.INDEX_NAME)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.indices[space], f)
+        os.replace(temp_path, path)
+
+    def _segmentPath(self, space: str, segment: int) -> str:
+        return os.path.join(self._spaceDir(space), f"{segment}.npy")
+
+    def _segments(self, space: str) -> List[int]:
+        try:
+            names = os.listdir(self._spaceDir(space))
+        except OSError:
+            return []
+        return [int(name[:-4]) for name in names if name.endswith(".npy") and name[:-4].isdigit()]
+
+    def lookup(self, space: str, texts: List[str]) -> Tuple[Dict[int, "np.ndarray"], List[int]]:
+        """
+        Returns the stored embeddings by position in `texts` and the positions of texts that are not stored.
+        """
+        import numpy as np
+
+        keys = [self.textKey(text) for text in texts]
+        with self.lock:
+            entries = self._index(space)["texts"]
+            located = [entries.get(key) for key in keys]
+
+        found, missing = {}, []
+        by_segment: Dict[int, List[Tuple[int, int]]] = {}
+        for position, entry in enumerate(located):
+            if entry is None:
+                missing.append(position)
+            else:
+                by_segment.setdefault(entry[0], []).append((position, entry[1]))
+
+        for segment, rows in by_segment.items():
+            path = self._segmentPath(space, segment)
+            try:
+                vectors = np.load(path, mmap_mode="r")
+                # Mark as recently used
+                os.utime(path)
+            except (OSError, ValueError):
+                missing.extend(position for position, _ in rows)
+                continue
+            for position, row in rows:
+                found[position] = np.array(vectors[row])
+        return found, sorted(missing)
+
+    def save(self, space: str, texts: List[str], vectors: "np.ndarray"):
+        """
+        Stores the embeddings of the texts as one new segment.
+        """
+        import numpy as np
+
+        if len(texts) == 0:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        os.makedirs(self._spaceDir(space), exist_ok=True)
+        with self.lock:
+            index = self._index(space)
+            segment = index["next_segment"]
+            index["next_segment"] += 1
+
+            path = self._segmentPath(space, segment)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                np.save(f, vectors)
+            os.replace(temp_path, path)
+
+            for row, text in enumerate(texts):
+                index["texts"][self.textKey(text)] = (segment, row)
+            self._writeIndex(space)
+        self.evict()
+
+    def getOrCompute(self, space: str, texts: List[str], compute: Callable[[List[str]], "np.ndarray"],
+                     notifier: Optional[FrontendNotifier] = None) -> "np.ndarray":
+        """
+        Returns the embeddings of the texts (one row per text, in order). Only texts that are not stored yet are
+        passed to `compute`, once each, and are stored afterwards.
+        """
+        import numpy as np
+
+        unique = list(dict.fromkeys(texts))
+        found, missing = self.lookup(space, unique)
+        if notifier is not None:
+            notifier.log(f"Found {len(found)} of {len(unique)} embeddings in the embedding store.", LogLevels.INFO)
+
+        if missing:
+            missing_texts = [unique[position] for position in missing]
+            computed = np.asarray(compute(missing_texts), dtype=np.float32)
+            try:
+                self.save(space, missing_texts, computed)
+            except OSError as e:
+                if notifier is not None:
+                    notifier.log(f"Could not store embeddings: {repr(e)}", LogLevels.WARN)
+            for position, vector in zip(missing, computed):
+                found[position] = vector
+
+        rows = {text: position for position, text in enumerate(unique)}
+        return np.stack([found[rows[text]] for text in texts]) if texts else np.zeros((0, 0), dtype=np.float32)
+
+    def evict(self):
+        with self.lock:
+            segments = []
+            for space in os.listdir(self.directory):
+                for segment in self._segments(space):
+                    try:
+                        stat = os.stat(self._segmentPath(space, segment))
+                    except OSError:
+                        continue
+                    segments.append((stat.st_mtime, stat.st_size, space, segment))
+
+            total_size = sum(size for _, size, _, _ in segments)
+            changed = set()
+            for _, size, space, segment in sorted(segments):
+                if total_size <= self.max_size:
+                    break
+                try:
+                    os.remove(self._segmentPath(space, segment))
+                    total_size -= size
+                    changed.add(space)
+                except OSError:
+                    pass
+
+            for space in changed:
+                # Rebuilt without the entries of removed segments
+                self.indices.pop(space, None)
+                self._index(space)
+                self._writeIndex(space)
+
+    def clear(self):
+        with self.lock:
+            for space in os.listdir(self.directory):
+                for segment in self._segments(space):
+                    os.remove(self._segmentPath(space, segment))
+                index_path = os.path.join(self._spaceDir(space), self.INDEX_NAME)
+                if os.path.exists(index_path):
+                    os.remove(index_path)
+            self.indices.clear()
+
+
+# Shared by all operations of the process
+EMBEDDINGS = EmbeddingStore(os.path.join(PATHS.cache, "embeddings"))
@@ -0,0 +1,149 @@
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.types.blueprint import StepBlueprint, StepValues
+from backend.types.payload import Payload
+
+
+class CachedStep:
+    def __init__(self, outputs: Dict[str, Any], visualizations: List[Any], artifacts: Optional[Dict[str, Any]] = None):
+        self.outputs = outputs
+        self.visualizations = visualizations
+        self.artifacts = artifacts if artifacts is not None else {}
+
+
+class StepCache:
+    """
+    Content-addressed cache of step results on disk. A step is identified by its id, its config values and the
+    contents of its inputs, so a rerun with unchanged earlier steps can reuse their outputs and visualizations.
+    Entries are evicted least recently used first, once the cache exceeds `max_size` bytes.
+
+    The implementation is part of the key: the files of the operation's module and of the SHARED_MODULES, the
+    defaults of the step's parameters and, if `modelRevisions` is given, the snapshots the models were loaded
+    from. A re-fetched (or newly resolved) model therefore invalidates all entries.
+    """
+
+    # Increase when the format of cache entries or the results of operations change in a way the fingerprint
+    # does not cover
+    VERSION = 2
+    DEFAULT_MAX_SIZE = 2 * 1024 ** 3
+    # Modules that operations share; changing any of them invalidates all entries
+    SHARED_MODULES = ("backend.types.operation", "backend.operations.operation_utils",
+                      "backend.operations.model_registry", "backend.operations.batching",
+                      "backend.operations.long_texts", "backend.operations.onnx_backend")
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE,
+                 modelRevisions: Optional[Callable[[], dict]] = None):
+        self.directory = directory
+        self.max_size = max_size
+        self.modelRevisions = modelRevisions
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def fingerprint(self, step: StepBlueprint, stepValues: StepValues, payload: Payload) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{StepCache.VERSION}:{step.stepId}".encode())
+        digest.update(json.dumps(stepValues.values, sort_keys=True, default=str).encode())
+        digest.update(self._operationVersion(step).encode())
+        for module in StepCache.SHARED_MODULES:
+            digest.update(f"{module}:{self._moduleVersion(module)}".encode())
+        defaults = {parameter.name: parameter.defaultValue
+                    for parameter in getattr(step.inOutDef, "inputs_static", [])}
+        digest.update(json.dumps(defaults, sort_keys=True, default=str).encode())
+        if self.modelRevisions is not None:
+            digest.update(json.dumps(self.modelRevisions(), sort_keys=True, default=str).encode())
+        for parameter in sorted(step.inOutDef.inputs_dynamic, key=lambda p: p.name):
+            digest.update(parameter.name.encode())
+            if parameter.name in payload:
+                self._hashValue(digest, payload[parameter.name])
+        return digest.hexdigest()
+
+    @staticmethod
+    def _operationVersion(step: StepBlueprint) -> str:
+        # Changes to the implementation of an operation invalidate its cached results.
+        return f"{step.operation.__qualname__}:{StepCache._moduleVersion(step.operation.__module__)}"
+
+    @staticmethod
+    def _moduleVersion(name: str) -> str:
+        """
+        Modification time and size of the module's file, found without importing it; empty if there is none.
+        """
+        try:
+            module = sys.modules.get(name)
+            path = module.__file__ if module is not None else importlib.util.find_spec(name).origin
+            stat = os.stat(path)
+            return f"{stat.st_mtime_ns}:{stat.st_size}"
+        except (AttributeError, TypeError, ValueError, ImportError, OSError):
+            return ""
+
+    @staticmethod
+    def _hashValue(digest, value):
+        import pandas as pd
+
+        if isinstance(value, pd.DataFrame):
+            digest.update(json.dumps([str(c) for c in value.columns]).encode())
+            digest.update(json.dumps([str(t) for t in value.dtypes]).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        else:
+            try:
+                digest.update(pickle.dumps(value))
+            except Exception:
+                digest.update(repr(value).encode())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def load(self, key: str) -> Optional[CachedStep]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            # Mark as recently used
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return CachedStep(entry["outputs"], entry["visualizations"], entry.get("artifacts"))
+
+    def save(self, key: str, outputs: Dict[str, Any], visualizations: List[Any],
+             artifacts: Optional[Dict[str, Any]] = None):
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump({"outputs": outputs, "visualizations": visualizations, "artifacts": artifacts or {}}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".pkl"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    total_size -= size
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self.lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.directory, name))
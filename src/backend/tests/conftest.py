@@ -1,7 +1,42 @@
 import pytest
 from unittest.mock import MagicMock, patch
+import importlib
+import importlib.abc
+import importlib.util
 import sys
 
+
+class BackendAliasFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """
+    Tests import the backend as `src.backend`, while the backend imports itself as `backend`. Resolves every
+    `src.backend` module to the `backend` module of the same name, so that no module (and no enum or class) is
+    loaded twice under different names. The tests themselves keep their names.
+    """
+    PREFIX = "src.backend"
+    EXCLUDED = "src.backend.tests"
+
+    def __init__(self):
+        self.specs = {}
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname == self.EXCLUDED or fullname.startswith(self.EXCLUDED + "."):
+            return None
+        if fullname == self.PREFIX or fullname.startswith(self.PREFIX + "."):
+            return importlib.util.spec_from_loader(fullname, self)
+        return None
+
+    def create_module(self, spec):
+        module = importlib.import_module(spec.name[len("src."):])
+        self.specs[spec.name] = module.__spec__
+        return module
+
+    def exec_module(self, module):
+        # The import system points __spec__ to the alias; the module keeps its own
+        module.__spec__ = self.specs.pop(module.__spec__.name)
+
+
+sys.meta_path.insert(0, BackendAliasFinder())
+
 # Mock the webview module before any tests or their dependencies try to import it
 sys.modules['webview'] = MagicMock()
 
@@ -67,6 +102,7 @@ def mock_spacy_load(*args, **kwargs):
     def mock_nlp_call(text):
         return MockDoc(text)
     nlp_mock.side_effect = mock_nlp_call
+    nlp_mock.pipe.side_effect = lambda texts, **kwargs: (MockDoc(text) for text in texts)
     return nlp_mock
 
 spacy_mock.load.side_effect = mock_spacy_load
@@ -76,21 +112,44 @@ sys.modules['spacy.lang.en'] = MagicMock()
 sys.modules['spacy.lang.en.stop_words'] = MagicMock()
 sys.modules['spacy.lang.en.stop_words'].STOP_WORDS = mock_stop_words # Provide mock STOP_WORDS
 
-def mock_load_pipeline(task, model_name):
+def mock_load_pipeline(task, model_name, **kwargs):
     if task == "sentiment-analysis":
-        def sentiment_pipeline_callable(text, padding, truncation):
+        def predict(text):
             if "great" in text:
-                return [{'label': 'POSITIVE', 'score': 0.999}]
+                return {'label': 'POSITIVE', 'score': 0.999}
             elif "hate" in text:
-                return [{'label': 'NEGATIVE', 'score': 0.998}]
+                return {'label': 'NEGATIVE', 'score': 0.998}
             else:
-                return [{'label': 'NEUTRAL', 'score': 0.5}]
+                return {'label': 'NEUTRAL', 'score': 0.5}
+
+        def sentiment_pipeline_callable(text, padding, truncation, **kwargs):
+            if isinstance(text, list):
+                return [predict(t) for t in text]
+            return [predict(text)]
         return sentiment_pipeline_callable
     return MagicMock() # Default return for other tasks
 
 sys.modules['backend.operations.operation_utils'].load_pipeline.side_effect = mock_load_pipeline
 
-def mock_load_transformer(model_name):
+
+def mock_encode(texts, **kwargs):
+    import numpy as np
+    return np.ones((len(texts), 384), dtype=np.float32)
+
+sys.modules['backend.operations.operation_utils'].load_sentence_transformer.return_value.encode.side_effect = mock_encode
+
+
+@pytest.fixture(autouse=True)
+def embedding_store(tmp_path, monkeypatch):
+    # Embeddings computed by tests must neither be reused by other tests nor end up in the real cache
+    from backend.storage.embeddingStore import EMBEDDINGS
+    directory = tmp_path / "embeddings"
+    directory.mkdir()
+    monkeypatch.setattr(EMBEDDINGS, "directory", str(directory))
+    monkeypatch.setattr(EMBEDDINGS, "indices", {})
+    return EMBEDDINGS
+
+def mock_load_transformer(model_name, **kwargs):
     mock_tokenizer = MagicMock()
     mock_model = MagicMock()
 
@@ -0,0 +1,53 @@
+import numpy as np
+
+from src.backend.operations.batching import length_batches, map_length_batched, map_encoded_batches
+
+
+def test_batches_are_sorted_by_length_and_within_budget():
+    lengths = [50, 3, 40, 5, 4, 60]
+    batches = length_batches(lengths, max_tokens=100, max_batch_size=3)
+
+    assert batches == [[1, 4, 3], [2, 0], [5]]
+    for batch in batches:
+        assert len(batch) * max(lengths[position] for position in batch) <= 100
+
+
+def test_overlong_texts_get_a_batch_of_their_own():
+    assert length_batches([1000, 2, 2], max_tokens=100) == [[1, 2], [0]]
+
+
+def test_results_are_restored_to_the_order_of_the_texts():
+    texts = ["ccc", "a", "bb", "dddd", "e"]
+    calls = []
+
+    def compute(batch):
+        calls.append(batch)
+        return np.array([[len(text)] for text in batch])
+
+    result = map_length_batched(texts, [len(text) for text in texts], compute, max_tokens=6)
+
+    assert calls == [["a", "e", "bb"], ["ccc"], ["dddd"]]
+    assert result[:, 0].tolist() == [3, 1, 2, 4, 1]
+
+
+def test_encoded_batches_are_computed_from_the_stored_features():
+    encoded = {"input_ids": [[1, 2, 3], [4], [5, 6]], "attention_mask": [[1, 1, 1], [1], [1, 1]]}
+    calls = []
+
+    def compute(features):
+        calls.append(features)
+        return np.array([[sum(ids)] for ids in features["input_ids"]])
+
+    result = map_encoded_batches(encoded, compute, max_tokens=4)
+
+    assert calls == [{"input_ids": [[4], [5, 6]], "attention_mask": [[1], [1, 1]]},
+                     {"input_ids": [[1, 2, 3]], "attention_mask": [[1, 1, 1]]}]
+    assert result[:, 0].tolist() == [6, 4, 11]
+
+
+def test_no_texts_give_an_empty_result():
+    def compute(batch):
+        raise AssertionError("no batch to compute")
+
+    assert map_length_batched([], [], compute).shape[0] == 0
+    assert map_encoded_batches({"input_ids": []}, compute).shape[0] == 0
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+
+from src.backend.storage.embeddingStore import EmbeddingStore
+
+
+def counting_encoder(calls):
+    def compute(texts):
+        calls.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+    return compute
+
+
+def test_only_missing_texts_are_computed(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    space = EmbeddingStore.space("model", "mean", 512)
+    calls = []
+
+    first = store.getOrCompute(space, ["a", "bb", "a"], counting_encoder(calls))
+    second = store.getOrCompute(space, ["ccc", "bb", "a"], counting_encoder(calls))
+
+    assert calls == [["a", "bb"], ["ccc"]]
+    assert first.tolist() == [[1, 1], [2, 1], [1, 1]]
+    assert second.tolist() == [[3, 1], [2, 1], [1, 1]]
+
+
+def test_embeddings_persist_and_spaces_are_separate(tmp_path):
+    space = EmbeddingStore.space("model", "mean", 512)
+    other_space = EmbeddingStore.space("model", "mean", 512, precision="int8")
+    EmbeddingStore(str(tmp_path)).getOrCompute(space, ["a"], counting_encoder([]))
+
+    calls = []
+    store = EmbeddingStore(str(tmp_path))
+    store.getOrCompute(space, ["a"], counting_encoder(calls))
+    store.getOrCompute(other_space, ["a"], counting_encoder(calls))
+    assert calls == [["a"]]
+
+
+def test_evicts_least_recently_used_segments(tmp_path):
+    space = EmbeddingStore.space("model", "mean", 512)
+    store = EmbeddingStore(str(tmp_path))
+    store.getOrCompute(space, ["old"], counting_encoder([]))
+    segment_size = os.path.getsize(os.path.join(str(tmp_path), space, "0.npy"))
+    os.utime(os.path.join(str(tmp_path), space, "0.npy"), (0, 0))
+
+    store.max_size = segment_size
+    store.getOrCompute(space, ["new"], counting_encoder([]))
+
+    found, missing = EmbeddingStore(str(tmp_path)).lookup(space, ["old", "new"])
+    assert missing == [0]
+    assert list(found) == [1]
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from src.backend.operations.heatmap import block_labels, block_starts, downsample
+
+
+def test_small_matrices_are_not_aggregated():
+    matrix = np.eye(3, dtype=np.float32)
+    blocks, rows, columns = downsample(matrix, max_cells=3)
+
+    assert blocks.tolist() == matrix.tolist()
+    assert rows == columns == [0, 1, 2]
+
+
+def test_blocks_aggregate_by_max_or_mean():
+    matrix = np.arange(20, dtype=np.float32).reshape(4, 5)
+
+    blocks, rows, columns = downsample(matrix, max_cells=2, aggregation="max")
+    assert rows == [0, 2]
+    assert columns == [0, 3]
+    assert blocks.tolist() == [[7, 9], [17, 19]]
+
+    blocks, _, _ = downsample(matrix, max_cells=2, aggregation="mean")
+    assert blocks.tolist() == pytest.approx([[3.5, 6.0], [13.5, 16.0]])
+
+
+def test_resolution_is_bounded():
+    assert len(block_starts(10001, max_cells=200)) <= 200
+    with pytest.raises(ValueError):
+        downsample(np.zeros((2, 2)), aggregation="median")
+
+
+def test_labels_are_truncated_and_unique():
+    texts = ["same text " * 10, "same text " * 10, "short"]
+
+    assert block_labels(texts, [0, 1, 2], length=10) == ["1: same text…", "2: same text…", "3: short"]
+    assert block_labels(texts, [0, 2], length=10) == ["1-2: same text… …", "3: short"]
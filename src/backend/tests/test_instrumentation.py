@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from src.backend.types import instrumentation
+from src.backend.types.instrumentation import StepMetrics, collecting, span, recordLoad, instrumentPipeline, \
+    TOKENIZE, FORWARD, POST_PROCESS
+
+
+def test_spans_are_recorded_for_the_current_step():
+    metrics = StepMetrics()
+    with collecting(metrics):
+        for _ in range(3):
+            with span(FORWARD):
+                pass
+        recordLoad({"loader": "transformer", "model": "m", "cache": "miss", "seconds": 1.5})
+
+    result = metrics.toJson()
+    assert result["spans"][FORWARD]["count"] == 3
+    assert result["model_loads"][0]["cache"] == "miss"
+    assert result["seconds"] is not None
+    assert any("transformer:m" in line for line in metrics.summary())
+
+
+def test_nothing_is_recorded_outside_a_step():
+    with span(FORWARD):
+        pass
+    recordLoad({"loader": "transformer", "model": "m"})
+    assert instrumentation.currentMetrics() is None
+
+
+def test_propagate_attributes_threads_to_the_step():
+    metrics = StepMetrics()
+
+    def work(_):
+        with span(TOKENIZE):
+            return instrumentation.currentMetrics()
+
+    with collecting(metrics), ThreadPoolExecutor(max_workers=4) as pool:
+        unwrapped = list(pool.map(work, range(4)))
+        wrapped = list(pool.map(instrumentation.propagate(work), range(8)))
+
+    assert all(m is None for m in unwrapped)
+    assert all(m is metrics for m in wrapped)
+    assert metrics.spans[TOKENIZE]["count"] == 8
+
+
+def test_instrument_pipeline_wraps_stages_once():
+    pipeline = SimpleNamespace(preprocess=lambda x: x, _forward=lambda x: x, postprocess=lambda x: x)
+    instrumentPipeline(pipeline)
+    instrumentPipeline(pipeline)
+
+    metrics = StepMetrics()
+    with collecting(metrics):
+        pipeline.postprocess(pipeline._forward(pipeline.preprocess(1)))
+
+    assert {name: span["count"] for name, span in metrics.spans.items()} == \
+           {TOKENIZE: 1, FORWARD: 1, POST_PROCESS: 1}
@@ -0,0 +1,61 @@
+import re
+
+import numpy as np
+
+from src.backend.operations.long_texts import window_texts, window_encodings, pool_windows, MEAN, ATTENTION_WEIGHTED
+
+
+class WhitespaceTokenizer:
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def __call__(self, texts, add_special_tokens=True, return_offsets_mapping=False):
+        return {"offset_mapping": [[match.span() for match in re.finditer(r"\S+", text)] for text in texts]}
+
+
+class WordNumberTokenizer(WhitespaceTokenizer):
+    """Encodes the word "w<n>" as the token id n, with the special tokens -1 and -2 around each input."""
+
+    def __call__(self, texts, add_special_tokens=True):
+        return {"input_ids": [[int(word[1:]) for word in text.split()] for text in texts]}
+
+    def prepare_for_model(self, ids, add_special_tokens=True):
+        return {"input_ids": [-1] + ids + [-2], "attention_mask": [1] * (len(ids) + 2)}
+
+
+def test_long_texts_are_split_into_overlapping_windows():
+    text = " ".join(f"w{i}" for i in range(10))
+    windows, owners, lengths = window_texts(WhitespaceTokenizer(), ["short text", text], max_length=6, overlap=1)
+
+    assert windows == ["short text", "w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"]
+    assert owners == [0, 1, 1, 1]
+    assert lengths == [4, 6, 6, 6]
+
+
+def test_last_window_ends_with_the_text():
+    text = " ".join(f"w{i}" for i in range(6))
+    windows, owners, lengths = window_texts(WhitespaceTokenizer(), [text], max_length=6, overlap=0)
+
+    assert windows == ["w0 w1 w2 w3", "w4 w5"]
+    assert lengths == [6, 4]
+
+
+def test_long_texts_are_split_into_windows_of_token_ids():
+    text = " ".join(f"w{i}" for i in range(10))
+    encodings, owners = window_encodings(WordNumberTokenizer(), ["w1 w2", text], max_length=6, overlap=1)
+
+    assert encodings["input_ids"] == [[-1, 1, 2, -2], [-1, 0, 1, 2, 3, -2], [-1, 3, 4, 5, 6, -2],
+                                      [-1, 6, 7, 8, 9, -2]]
+    assert encodings["attention_mask"][0] == [1, 1, 1, 1]
+    assert owners == [0, 1, 1, 1]
+
+
+def test_windows_are_pooled_per_text():
+    values = [[1.0, 0.0], [0.0, 1.0], [1.0, 1.0], [3.0, 3.0]]
+    owners, lengths = [0, 0, 1, 0], [2, 2, 5, 4]
+
+    mean = pool_windows(values, owners, lengths, 2, MEAN)
+    weighted = pool_windows(values, owners, lengths, 2, ATTENTION_WEIGHTED)
+
+    assert np.allclose(mean, [[4 / 3, 4 / 3], [1.0, 1.0]])
+    assert np.allclose(weighted, [[14 / 8, 14 / 8], [1.0, 1.0]])
@@ -0,0 +1,30 @@
+from concurrent.futures import wait
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from src.backend.operations.model_prewarmer import ModelPrewarmer
+
+
+def make_step(config, loaders):
+    operation = SimpleNamespace(requiredModels=lambda c: loaders if c is config else [])
+    return SimpleNamespace(stepId="step", operation=operation, buildConfig=lambda values: config)
+
+
+def test_prewarms_models_of_ready_steps_only():
+    loaded = []
+    ready = MagicMock(isReady=lambda: True)
+    not_ready = MagicMock(isReady=lambda: False)
+    steps = [make_step(ready, [lambda notifier: loaded.append("a")]),
+             make_step(not_ready, [lambda notifier: loaded.append("b")])]
+
+    wait(ModelPrewarmer().prewarmSteps(steps, [None, None]))
+    assert loaded == ["a"]
+
+
+def test_failing_loader_does_not_raise():
+    def fail(notifier):
+        raise OSError("model not found")
+
+    futures = ModelPrewarmer().prewarm([fail])
+    wait(futures)
+    assert futures[0].exception() is None
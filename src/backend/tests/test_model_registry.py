@@ -0,0 +1,57 @@
+import threading
+import time
+
+from src.backend.operations.model_registry import ModelRegistry
+
+
+class SizedModel:
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+
+def registry_with_sizes(memory_budget):
+    registry = ModelRegistry(memory_budget=memory_budget)
+    registry.estimateSize = lambda model: model.size
+    return registry
+
+
+def test_models_are_loaded_once_per_key():
+    registry = ModelRegistry()
+    loads = []
+
+    def load():
+        loads.append(1)
+        time.sleep(0.05)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("spacy", "de", load))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert all(result is results[0] for result in results)
+    assert registry.get("pipeline", "de", object, task="sentiment") is not results[0]
+
+
+def test_least_recently_used_models_are_evicted_over_budget():
+    registry = registry_with_sizes(memory_budget=250)
+    registry.get("spacy", "a", lambda: SizedModel("a", 100))
+    registry.get("spacy", "b", lambda: SizedModel("b", 100))
+    registry.get("spacy", "a", lambda: SizedModel("a", 100))  # a is now more recently used than b
+    registry.get("spacy", "c", lambda: SizedModel("c", 100))
+
+    assert registry.isLoaded("spacy", "a")
+    assert not registry.isLoaded("spacy", "b")
+    assert registry.isLoaded("spacy", "c")
+    assert registry.getStatistics()["evictions"] == 1
+
+
+def test_model_larger_than_budget_is_still_returned():
+    registry = registry_with_sizes(memory_budget=10)
+    model = registry.get("spacy", "big", lambda: SizedModel("big", 100))
+    assert model.name == "big"
+    assert registry.isLoaded("spacy", "big")
@@ -0,0 +1,157 @@
+import importlib
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.backend.operations.SentimentAnalysisOperation import SentimentAnalysisOperation
+from src.backend.transferObjects.eventTransferObjects import LogLevels
+from src.backend.types.frontendNotifier import FrontendNotifier
+
+TEXTS = ["good text", "bad word1 word2 word3", "text"]
+
+# conftest replaces operation_utils by a mock; the backends below need the real one
+_REAL_MODULES = ("backend.operations.operation_utils", "backend.operations.onnx_backend")
+
+
+@pytest.fixture
+def operation_utils():
+    saved = {name: sys.modules.pop(name) for name in list(sys.modules)
+             if name.replace("src.", "", 1) in _REAL_MODULES}
+    yield importlib.import_module("backend.operations.operation_utils")
+    for name in _REAL_MODULES:
+        sys.modules.pop(name, None)
+        sys.modules.pop(f"src.{name}", None)
+    sys.modules.update(saved)
+
+
+@pytest.fixture
+def onnx_backend(operation_utils, tiny_model, tmp_path, monkeypatch):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    onnx_backend = importlib.import_module("backend.operations.onnx_backend")
+    monkeypatch.setattr(onnx_backend, "resolve_model", lambda model_name: tiny_model)
+    monkeypatch.setattr(onnx_backend.PATHS, "cache", str(tmp_path / "cache"))
+    return onnx_backend
+
+
+@pytest.fixture
+def tiny_model(tmp_path):
+    """A randomly initialized BERT classifier with two layers of 16 dimensions and its tokenizer."""
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "good", "bad", "text"] + [f"word{i}" for i in range(8)]
+    vocab_file = tmp_path / "vocab.txt"
+    vocab_file.write_text("\n".join(vocab))
+    config = transformers.BertConfig(vocab_size=len(vocab), hidden_size=16, num_hidden_layers=2,
+                                     num_attention_heads=2, intermediate_size=32, max_position_embeddings=64,
+                                     num_labels=2, id2label={0: "NEGATIVE", 1: "POSITIVE"},
+                                     label2id={"NEGATIVE": 0, "POSITIVE": 1})
+    torch.manual_seed(0)
+    model_dir = tmp_path / "model"
+    transformers.BertForSequenceClassification(config).save_pretrained(model_dir)
+    transformers.BertTokenizerFast(vocab_file=str(vocab_file), model_max_length=64).save_pretrained(model_dir)
+    return str(model_dir)
+
+
+def torch_outputs(model_dir, model_class):
+    import torch
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = model_class.from_pretrained(model_dir).eval()
+    inputs = tokenizer(TEXTS, return_tensors="pt", padding=True)
+    with torch.no_grad():
+        return model(**inputs)[0].numpy(), inputs["attention_mask"].numpy()
+
+
+def test_onnx_classifier_matches_torch(onnx_backend, tiny_model):
+    import numpy as np
+    from transformers import AutoModelForSequenceClassification
+
+    classifier = onnx_backend.OnnxSequenceClassifier("tiny", precision="fp32")
+    logits, _ = classifier.forward(TEXTS)
+    expected, _ = torch_outputs(tiny_model, AutoModelForSequenceClassification)
+
+    assert np.allclose(logits, expected, atol=1e-4)
+    predictions = classifier(TEXTS)
+    assert [prediction["label"] for prediction in predictions] == \
+        [["NEGATIVE", "POSITIVE"][index] for index in expected.argmax(axis=-1)]
+
+
+def test_onnx_encoder_matches_torch_mean_pooling(onnx_backend, tiny_model):
+    import numpy as np
+    from transformers import AutoModel
+
+    encoder = onnx_backend.OnnxEncoder("tiny", precision="fp32")
+    hidden, mask = torch_outputs(tiny_model, AutoModel)
+    expected = (hidden * mask[..., None]).sum(axis=1) / mask.sum(axis=1, keepdims=True)
+
+    assert np.allclose(encoder.encode(TEXTS), expected, atol=1e-4)
+    inputs = encoder.tokenizer(TEXTS, return_tensors="np", padding=True)
+    assert np.allclose(encoder.encode_inputs(inputs), expected, atol=1e-4)
+
+
+def test_int8_export_stays_close_to_fp32(onnx_backend):
+    import os
+    import numpy as np
+
+    path = onnx_backend.export_model("tiny", onnx_backend.SEQUENCE_CLASSIFICATION, "int8")
+    fp32_logits, _ = onnx_backend.OnnxSequenceClassifier("tiny", precision="fp32").forward(TEXTS)
+    int8_logits, _ = onnx_backend.OnnxSequenceClassifier("tiny", precision="int8").forward(TEXTS)
+
+    assert path.endswith("model.int8.onnx") and os.path.isfile(path)
+    assert np.allclose(int8_logits, fp32_logits, atol=0.05)
+    with pytest.raises(ValueError):
+        onnx_backend.export_model("tiny", onnx_backend.SEQUENCE_CLASSIFICATION, "fp16")
+
+
+def test_apply_precision_quantizes_linear_layers(operation_utils, tiny_model):
+    import numpy as np
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(tiny_model)
+    inputs = tokenizer(TEXTS, return_tensors="pt", padding=True)
+    model = AutoModelForSequenceClassification.from_pretrained(tiny_model).eval()
+    assert operation_utils.apply_precision(model, "fp32") is model
+    with torch.no_grad():
+        expected = model(**inputs).logits.numpy()
+
+    quantized = operation_utils.apply_precision(model, "int8")
+    with torch.no_grad():
+        logits = quantized(**inputs).logits.numpy()
+
+    assert not any(type(module) is torch.nn.Linear for module in quantized.modules())
+    assert np.allclose(logits, expected, atol=0.05)
+    with pytest.raises(ValueError):
+        operation_utils.apply_precision(model, "fp16")
+
+
+def test_sentiment_uses_the_onnx_classifier(monkeypatch):
+    onnx_classifier = MagicMock()
+    monkeypatch.setitem(sys.modules, "backend.operations.onnx_backend",
+                        SimpleNamespace(load_onnx_classifier=lambda model_name, precision: onnx_classifier))
+
+    classifier = SentimentAnalysisOperation._loadClassifier("model", "onnx", "fp32", MagicMock(spec=FrontendNotifier))
+
+    assert classifier is onnx_classifier
+
+
+def test_sentiment_falls_back_to_torch_without_onnx_runtime(monkeypatch):
+    import src.backend.operations.SentimentAnalysisOperation as sentiment
+
+    pipeline = MagicMock()
+    load_pipeline = MagicMock(return_value=pipeline)
+    monkeypatch.setattr(sentiment, "load_pipeline", load_pipeline)
+    # Importing a module that is None in sys.modules raises an ImportError
+    monkeypatch.setitem(sys.modules, "backend.operations.onnx_backend", None)
+    notifier = MagicMock(spec=FrontendNotifier)
+
+    classifier = SentimentAnalysisOperation._loadClassifier("model", "onnx", "int8", notifier)
+
+    assert classifier is pipeline
+    load_pipeline.assert_called_once_with("sentiment-analysis", model_name="model", precision="int8")
+    assert notifier.log.call_args.args[1] == LogLevels.WARN
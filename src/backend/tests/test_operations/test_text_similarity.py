@@ -12,8 +12,11 @@ sys.modules['sklearn'] = MagicMock()
 sys.modules['sklearn.cluster'] = MagicMock()
 sys.modules['sklearn.metrics'] = MagicMock()
 
-@patch.object(TextSimilarityOperation, 'compute_embedding', return_value=torch.randn(1, 768))
-def test_text_similarity_basic(mock_compute_embedding):
+@patch.object(TextSimilarityOperation, '_encode',
+              side_effect=lambda texts: ({"input_ids": [[0] * len(text) for text in texts]}, None))
+@patch.object(TextSimilarityOperation, '_embedFeatures',
+              side_effect=lambda features: torch.randn(len(features["input_ids"]), 768))
+def test_text_similarity_basic(mock_embed_features, mock_encode):
     # Arrange
     test = OperationTest(TextSimilarityOperation, "text_similarity_basic")
 
@@ -11,8 +11,15 @@ sys.modules['sklearn'] = MagicMock()
 sys.modules['sklearn.cluster'] = MagicMock()
 sys.modules['sklearn.metrics'] = MagicMock()
 
-@patch.object(TextSimilarityOperation, 'compute_embedding', return_value=torch.randn(1, 768))
-def test_text_similarity_operation(mock_compute_embedding):
+def encode(texts):
+    """Stands in for _encode: one token per character, and the texts themselves as a feature."""
+    return {"input_ids": [[0] * len(text) for text in texts], "text": list(texts)}, None
+
+
+@patch.object(TextSimilarityOperation, '_encode', side_effect=encode)
+@patch.object(TextSimilarityOperation, '_embedFeatures',
+              side_effect=lambda features: torch.randn(len(features["input_ids"]), 768))
+def test_text_similarity_operation(mock_embed_features, mock_encode):
     test = OperationTest(TextSimilarityOperation, "text_similarity_basic")
     final_state = test.final_state
     payload = test.payload
@@ -20,4 +27,82 @@ def test_text_similarity_operation(mock_compute_embedding):
 
     assert final_state.value == StepState.SUCCESS.value
     assert payload # Check if the list is not empty
-    assert "similarity" in payload[0]
\ No newline at end of file
+    assert "similarity" in payload[0]
+
+VECTORS = {"a": [1.0, 0.0], "b": [0.0, 1.0], "c": [1.0, 1.0]}
+
+
+def run_similarity(columns: dict, config: dict = None, batches: list = None):
+    """
+    Runs the operation on the columns with the embeddings of VECTORS, comparing text1 with text2 unless the config
+    says otherwise, and returns the payload. The texts of every embedded batch are appended to `batches`.
+    """
+    import pandas as pd
+    from src.backend.types.frontendNotifier import FrontendNotifier
+    from src.backend.types.payload import Payload
+
+    def embed(features):
+        if batches is not None:
+            batches.append(features["text"])
+        return torch.tensor([VECTORS[text] for text in features["text"]])
+
+    config = {"first text column": "text1", "second text column": "text2", **(config or {})}
+    operation = TextSimilarityOperation(config, MagicMock(spec=FrontendNotifier))
+    operation.TILE_ROWS = 2
+    payload = Payload({"data": pd.DataFrame(columns)})
+
+    with patch.object(operation, "_encode", side_effect=encode), \
+            patch.object(operation, "_embedFeatures", side_effect=embed):
+        state = operation.run(payload, MagicMock(spec=FrontendNotifier))
+
+    assert state == StepState.SUCCESS
+    return payload
+
+
+def test_pairwise_embeds_each_text_once_in_batches():
+    batches = []
+    payload = run_similarity({"text1": ["a", "a", "c", None], "text2": ["b", "a", "a", "b"]}, {"batch size": 2},
+                             batches)
+
+    assert batches == [["a", "c"], ["b"]]
+    assert payload.data["similarity"].tolist() == pytest.approx([0.0, 1.0, 2 ** -0.5, 0.0], abs=1e-6)
+
+
+def test_cross_comparison_multiplies_embeddings_in_tiles():
+    batches = []
+    payload = run_similarity({"text1": ["a", "b", "c"], "text2": ["c", "a", "b"]}, {"Do cross comparison": True},
+                             batches)
+
+    assert sorted(text for batch in batches for text in batch) == ["a", "b", "c"]
+    assert payload.data.values.tolist() == pytest.approx(
+        [[2 ** -0.5, 1.0, 0.0], [2 ** -0.5, 0.0, 1.0], [1.0, 2 ** -0.5, 2 ** -0.5]], abs=1e-6)
+    artifacts = payload.popArtifacts()
+    assert artifacts["similarity_matrix"].tolist() == pytest.approx(payload.data.values.tolist(), abs=1e-6)
+
+
+@pytest.mark.parametrize("top_k, expected", [
+    (0, [(0, 1, 1.0), (0, 0, 2 ** -0.5), (1, 2, 1.0), (1, 0, 2 ** -0.5), (2, 0, 1.0), (2, 1, 2 ** -0.5),
+         (2, 2, 2 ** -0.5)]),
+    (1, [(0, 1, 1.0), (1, 2, 1.0), (2, 0, 1.0)]),
+])
+def test_cross_comparison_edges_are_thresholded_per_tile(top_k, expected):
+    payload = run_similarity({"text1": ["a", "b", "c"], "text2": ["c", "a", "b"]},
+                             {"Do cross comparison": True, "cross comparison output": "edges",
+                              "similarity threshold": 0.5, "top k": top_k})
+
+    edges = payload.data
+    assert list(edges.columns) == ["source row", "source text", "target row", "target text", "similarity"]
+    assert list(zip(edges["source row"], edges["target row"])) == [(row, column) for row, column, _ in expected]
+    assert edges["similarity"].tolist() == pytest.approx([score for _, _, score in expected], abs=1e-6)
+    assert payload.popArtifacts() == {}
+
+
+def test_cross_comparison_edges_of_a_column_with_itself():
+    payload = run_similarity({"text1": ["a", "b", "c"]},
+                             {"second text column": "text1", "Do cross comparison": True,
+                              "cross comparison output": "edges", "similarity threshold": 0.5})
+
+    edges = payload.data
+    assert list(edges.columns) == ["source row", "source text", "target row", "target text", "similarity"]
+    assert list(zip(edges["source text"], edges["target text"])) == [("a", "c"), ("b", "c"), ("c", "a"), ("c", "b")]
+    assert edges["similarity"].tolist() == pytest.approx([2 ** -0.5] * 4, abs=1e-6)
@@ -0,0 +1,101 @@
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+from src.backend.transferObjects.eventTransferObjects import StepState
+from src.backend.types.frontendNotifier import FrontendNotifier
+from src.backend.types.operation import ParallelizableTextOperation
+from src.backend.types.payload import Payload
+
+
+class UpperCaseOperation(ParallelizableTextOperation):
+    def initialize(self, config, notifier):
+        self.batch_calls = 0
+
+    def single_cell_operation(self, notifier, payload, text: str) -> str:
+        return text.upper()
+
+
+class BatchedUpperCaseOperation(UpperCaseOperation):
+    def batch_operation(self, notifier, payload, texts: list) -> list:
+        self.batch_calls += 1
+        if "explode" in texts:
+            raise RuntimeError("Batch failure")
+        return [text.upper() if isinstance(text, str) else TypeError("No text") for text in texts]
+
+
+def run_operation(operation_class, texts, batch_size=2, **config):
+    config = {"input column": "text", "batch size": batch_size, **config}
+    operation = operation_class(config, MagicMock(spec=FrontendNotifier))
+    payload = Payload({"data": pd.DataFrame({"text": texts})})
+    state = operation.run(payload, MagicMock(spec=FrontendNotifier))
+    return operation, state, payload.data["text"].tolist()
+
+
+def test_falls_back_to_single_cells_without_batch_operation():
+    operation, state, result = run_operation(UpperCaseOperation, ["a", "b", "c"])
+    assert not operation.supportsBatching()
+    assert state == StepState.SUCCESS
+    assert result == ["A", "B", "C"]
+
+
+def test_batches_cells():
+    operation, state, result = run_operation(BatchedUpperCaseOperation, ["a", "b", "c", "d", "e"])
+    assert operation.batch_calls == 3
+    assert state == StepState.SUCCESS
+    assert result == ["A", "B", "C", "D", "E"]
+
+
+def test_failures_stay_isolated_to_single_cells():
+    operation, state, result = run_operation(BatchedUpperCaseOperation, ["a", None, "explode", "d"])
+    assert state == StepState.FAILED
+    assert result == ["A", None, "EXPLODE", "D"]
+
+
+def test_process_mode_keeps_order_and_counts_failures():
+    texts = [f"text {i}" for i in range(20)] + [None]
+    operation, state, result = run_operation(UpperCaseOperation, texts, **{"execution mode": "processes", "workers": 2})
+    assert state == StepState.FAILED
+    assert result == [f"TEXT {i}" for i in range(20)] + [None]
+
+
+class ThreadSafeBatchedUpperCaseOperation(BatchedUpperCaseOperation):
+    THREAD_SAFE = True
+
+
+def test_thread_mode_keeps_order():
+    texts = [f"text {i}" for i in range(50)]
+    operation, state, result = run_operation(ThreadSafeBatchedUpperCaseOperation, texts, batch_size=3,
+                                             **{"execution mode": "threads", "workers": 4})
+    assert state == StepState.SUCCESS
+    assert result == [text.upper() for text in texts]
+
+
+class ThreadSafePrefixOperation(ThreadSafeBatchedUpperCaseOperation):
+    def batch_operation(self, notifier, payload, texts: list) -> list:
+        payload.addVisualization(texts[0])
+        return [payload["prefix"] + text for text in texts]
+
+
+def test_thread_mode_cells_see_the_payload():
+    texts = [f"text {i}" for i in range(10)]
+    operation = ThreadSafePrefixOperation({"input column": "text", "batch size": 3, "execution mode": "threads",
+                                           "workers": 4}, MagicMock(spec=FrontendNotifier))
+    payload = Payload({"data": pd.DataFrame({"text": texts}), "prefix": "> "})
+
+    state = operation.run(payload, MagicMock(spec=FrontendNotifier))
+
+    assert state == StepState.SUCCESS
+    assert payload.data["text"].tolist() == ["> " + text for text in texts]
+    assert payload.popVisualizations() == ["text 0", "text 3", "text 6", "text 9"]
+
+
+def test_cell_and_batch_log_prefixes_are_separated():
+    from src.backend.types.frontendNotifier import BatchNotifierWrapper, CellNotifierWrapper
+
+    notifier = MagicMock(spec=FrontendNotifier)
+    CellNotifierWrapper(notifier, MagicMock(), 3, 10).log("message")
+    BatchNotifierWrapper(notifier, 4, 2, 10).log(["first", "second"])
+
+    assert notifier.log.call_args_list[0].args[0] == "Cell 3/10: message"
+    assert notifier.log.call_args_list[1].args[0] == ["Cells 4-5/10: first", "Cells 4-5/10: second"]
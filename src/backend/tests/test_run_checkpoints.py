@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import MagicMock
+
+from src.backend.run.RunApi import RunApi, RunStorageApi
+
+
+def test_checkpoint_roundtrip(tmp_path):
+    storage = RunStorageApi(run_directory=str(tmp_path))
+    values = {"data": [1, 2, 3], "original_data": [1, 2]}
+    storage.saveCheckpoint("run", 2, values)
+
+    assert storage.hasCheckpoint("run", 2)
+    assert not storage.hasCheckpoint("run", 1)
+    assert storage.loadCheckpoint("run", 2) == values
+
+
+def test_missing_checkpoint_raises(tmp_path):
+    storage = RunStorageApi(run_directory=str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        storage.loadCheckpoint("run", 0)
+
+
+def test_artifact_is_saved_per_step(tmp_path):
+    import numpy as np
+
+    storage = RunStorageApi(run_directory=str(tmp_path))
+    matrix = np.arange(6, dtype=np.float32).reshape(2, 3)
+    path = storage.saveArtifact("run", 1, "similarity_matrix", matrix)
+
+    assert path == storage.getArtifactPath("run", 1, "similarity_matrix")
+    assert np.load(path, mmap_mode="r").tolist() == matrix.tolist()
+    with pytest.raises(FileNotFoundError):
+        storage.getArtifactPath("run", 0, "similarity_matrix")
+
+
+def test_resuming_a_queued_or_running_run_is_rejected():
+    api = RunApi.__new__(RunApi)
+    api._scheduler = MagicMock()
+    api._scheduler.isScheduled.return_value = True
+
+    with pytest.raises(ValueError):
+        api.resumeRun("run", 0)
+    api._scheduler.submit.assert_not_called()
@@ -0,0 +1,64 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.backend.run.RunScheduler import RunScheduler
+from src.backend.transferObjects.eventTransferObjects import NotificationDomain, StepState
+
+
+def test_runs_start_in_submission_order_and_are_reported_as_queued():
+    events = MagicMock()
+    scheduler = RunScheduler(events, max_concurrent_runs=1, threads_per_run=1)
+    order = []
+    started, release = threading.Event(), threading.Event()
+
+    def first():
+        started.set()
+        release.wait()
+        order.append("first")
+
+    scheduler.submit("first", NotificationDomain("first", "pipe", 0), first)
+    scheduler.submit("second", NotificationDomain("second", "pipe", 0), lambda: order.append("second"))
+    assert started.wait(timeout=5)
+    assert scheduler.getQueuePosition("first") is None
+    assert scheduler.getQueuePosition("second") == 0
+
+    release.set()
+    scheduler.join()
+    assert order == ["first", "second"]
+    states = [call.args[0].state for call in events.sendStepStatus.call_args_list]
+    assert states == [StepState.QUEUED, StepState.QUEUED]
+
+
+def test_failing_run_does_not_stop_the_scheduler():
+    scheduler = RunScheduler(MagicMock(), max_concurrent_runs=2, threads_per_run=1)
+    finished = []
+
+    def fail():
+        raise RuntimeError("broken run")
+
+    scheduler.submit("broken", NotificationDomain("broken", "pipe", 0), fail)
+    scheduler.submit("ok", NotificationDomain("ok", "pipe", 0), lambda: finished.append("ok"))
+    scheduler.join()
+    assert finished == ["ok"]
+    assert scheduler.getStatistics()["running"] == 0
+
+
+def test_a_run_cannot_be_submitted_twice():
+    scheduler = RunScheduler(MagicMock(), max_concurrent_runs=1, threads_per_run=1)
+    started, release = threading.Event(), threading.Event()
+
+    def run():
+        started.set()
+        release.wait()
+
+    scheduler.submit("run", NotificationDomain("run", "pipe", 0), run)
+    assert started.wait(timeout=5)
+    assert scheduler.isScheduled("run")
+    with pytest.raises(ValueError):
+        scheduler.submit("run", NotificationDomain("run", "pipe", 1), lambda: None)
+
+    release.set()
+    scheduler.join()
+    assert not scheduler.isScheduled("run")
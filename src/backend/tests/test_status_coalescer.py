@@ -0,0 +1,32 @@
+from unittest.mock import patch
+
+from src.backend.run.LogManager import StatusCoalescer
+from src.backend.transferObjects.eventTransferObjects import StepStatus, StepState, NotificationDomain
+
+
+def status(state, progress, stepIndex=0):
+    return StepStatus(NotificationDomain("run", "pipeline", stepIndex), state, progress)
+
+
+@patch("src.backend.run.LogManager.time.monotonic")
+def test_running_updates_are_rate_limited(monotonic):
+    coalescer = StatusCoalescer(min_interval=1.0)
+
+    monotonic.return_value = 0.0
+    assert coalescer.accept(status(StepState.RUNNING, 1))
+    assert not coalescer.accept(status(StepState.RUNNING, 2))
+    # Other steps are limited independently
+    assert coalescer.accept(status(StepState.RUNNING, 2, stepIndex=1))
+
+    monotonic.return_value = 1.5
+    assert not coalescer.accept(status(StepState.RUNNING, 1.01))
+    assert coalescer.accept(status(StepState.RUNNING, 3))
+
+
+@patch("src.backend.run.LogManager.time.monotonic", return_value=0.0)
+def test_terminal_states_always_pass(monotonic):
+    coalescer = StatusCoalescer(min_interval=1.0)
+    assert coalescer.accept(status(StepState.RUNNING, 50))
+    assert coalescer.accept(status(StepState.SUCCESS, 100))
+    assert coalescer.accept(status(StepState.FAILED, 100))
+    assert coalescer.accept(status(StepState.RUNNING, 50))
@@ -0,0 +1,69 @@
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+
+from src.backend.storage.stepCache import StepCache
+from src.backend.transferObjects.visualization import SimpleTextViz
+from src.backend.types.payload import Payload
+
+
+class DummyOperation:
+    pass
+
+
+def make_step(stepId="step", inputs=("data",)):
+    inOutDef = SimpleNamespace(inputs_dynamic=[SimpleNamespace(name=name) for name in inputs], outputs=[])
+    return SimpleNamespace(stepId=stepId, inOutDef=inOutDef, operation=DummyOperation)
+
+
+def make_payload(texts):
+    return Payload({"data": pd.DataFrame({"text": texts})})
+
+
+def test_fingerprint_depends_on_inputs_values_and_step(tmp_path):
+    cache = StepCache(str(tmp_path))
+    step = make_step()
+    values = SimpleNamespace(values={"language": "en"})
+
+    key = cache.fingerprint(step, values, make_payload(["a", "b"]))
+    assert key == cache.fingerprint(step, values, make_payload(["a", "b"]))
+    assert key != cache.fingerprint(step, values, make_payload(["a", "c"]))
+    assert key != cache.fingerprint(step, SimpleNamespace(values={"language": "de"}), make_payload(["a", "b"]))
+    assert key != cache.fingerprint(make_step("other"), values, make_payload(["a", "b"]))
+
+
+def test_fingerprint_depends_on_model_revisions(tmp_path):
+    revisions = {"model": "snapshots/abc"}
+    cache = StepCache(str(tmp_path), modelRevisions=lambda: dict(revisions))
+    step, values = make_step(), SimpleNamespace(values={})
+
+    key = cache.fingerprint(step, values, make_payload(["a"]))
+    revisions["model"] = "snapshots/def"
+    assert key != cache.fingerprint(step, values, make_payload(["a"]))
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    cache = StepCache(str(tmp_path))
+    data = pd.DataFrame({"text": ["a", "b"]})
+    cache.save("key", {"data": data}, [SimpleTextViz("viz")])
+
+    cached = cache.load("key")
+    assert cached.outputs["data"].equals(data)
+    assert [viz.content for viz in cached.visualizations] == ["viz"]
+    assert cache.load("missing") is None
+
+
+def test_evicts_least_recently_used_entries(tmp_path):
+    cache = StepCache(str(tmp_path))
+    for i, key in enumerate(["old", "used", "new"]):
+        cache.save(key, {"data": "x" * 1000}, [])
+        os.utime(cache._path(key), (i, i))
+    # Reading an entry marks it as recently used
+    assert cache.load("old") is not None
+
+    cache.max_size = 2500
+    cache.evict()
+    assert cache.load("used") is None
+    assert cache.load("old") is not None
+    assert cache.load("new") is not None
@@ -0,0 +1,111 @@
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+from src.backend.types.threadPolicy import ThreadPolicy
+
+
+def fake_torch(threads):
+    torch = SimpleNamespace(threads=threads, interop=1)
+    torch.get_num_threads = lambda: torch.threads
+    torch.set_num_threads = lambda n: setattr(torch, "threads", n)
+    torch.get_num_interop_threads = lambda: torch.interop
+    torch.set_num_interop_threads = lambda n: setattr(torch, "interop", n)
+    return torch
+
+
+def test_applies_and_restores_settings(monkeypatch):
+    torch = fake_torch(16)
+    monkeypatch.setitem(sys.modules, "torch", torch)
+    monkeypatch.setenv("OMP_NUM_THREADS", "16")
+
+    with ThreadPolicy(intra_op_threads=4, inter_op_threads=2).applied():
+        assert torch.threads == 4
+        assert torch.interop == 2
+        assert os.environ["OMP_NUM_THREADS"] == "4"
+
+    assert torch.threads == 16
+    assert os.environ["OMP_NUM_THREADS"] == "16"
+
+
+def test_restores_only_after_last_concurrent_policy(monkeypatch):
+    torch = fake_torch(16)
+    monkeypatch.setitem(sys.modules, "torch", torch)
+
+    policy = ThreadPolicy.forBudget(8)
+    with policy.applied():
+        with policy.applied():
+            pass
+        # Another run is still inside a step
+        assert torch.threads == 8
+    assert torch.threads == 16
+
+
+def test_step_threads_override_the_run_policy():
+    run_policy = ThreadPolicy.forBudget(8)
+
+    assert ThreadPolicy.forStep({"cpu threads": 0}, run_policy) is run_policy
+    assert ThreadPolicy.forStep({}, run_policy) is run_policy
+    step_policy = ThreadPolicy.forStep({"cpu threads": 2}, run_policy)
+    assert (step_policy.intra_op_threads, step_policy.workers) == (2, 1)
+
+
+def test_workers_share_the_budget():
+    run_policy = ThreadPolicy.forBudget(8)
+
+    sequential = ThreadPolicy.forStep({"execution mode": "sequential"}, run_policy)
+    threads = ThreadPolicy.forStep({"execution mode": "threads"}, run_policy)
+    processes = ThreadPolicy.forStep({"execution mode": "processes", "workers": 2}, run_policy)
+
+    assert (sequential.intra_op_threads, sequential.workers) == (8, 1)
+    assert (threads.intra_op_threads, threads.workers) == (1, 8)
+    assert (processes.intra_op_threads, processes.workers) == (4, 2)
+
+
+def test_tokenizers_run_in_parallel_only_without_workers(monkeypatch):
+    monkeypatch.setitem(sys.modules, "torch", fake_torch(16))
+
+    with ThreadPolicy.forBudget(8, workers=8).applied():
+        assert os.environ["TOKENIZERS_PARALLELISM"] == "false"
+        assert os.environ["OMP_NUM_THREADS"] == "1"
+    with ThreadPolicy.forBudget(8).applied():
+        assert os.environ["TOKENIZERS_PARALLELISM"] == "true"
+
+
+def test_different_policies_are_serialized(monkeypatch):
+    torch = fake_torch(16)
+    monkeypatch.setitem(sys.modules, "torch", torch)
+    first_applied, second_applied = threading.Event(), threading.Event()
+    release_first = threading.Event()
+    seen = []
+
+    def first():
+        with ThreadPolicy.forBudget(8).applied():
+            first_applied.set()
+            release_first.wait(5)
+            seen.append(torch.threads)
+
+    def second():
+        first_applied.wait(5)
+        with ThreadPolicy.forBudget(2).applied():
+            second_applied.set()
+            seen.append(torch.threads)
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    assert not second_applied.wait(0.2)
+    release_first.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert seen == [8, 2]
+    assert torch.threads == 16
+
+
+def test_spacy_uses_processes_only_for_a_single_worker():
+    assert ThreadPolicy.pipeOptions(None, 100) == {"n_process": 1, "batch_size": 100}
+    assert ThreadPolicy.pipeOptions(ThreadPolicy.forBudget(4), 100) == {"n_process": 4, "batch_size": 25}
+    assert ThreadPolicy.pipeOptions(ThreadPolicy.forBudget(4), 20) == {"n_process": 1, "batch_size": 20}
+    assert ThreadPolicy.pipeOptions(ThreadPolicy.forBudget(4, workers=4), 100)["n_process"] == 1
@@ -0,0 +1,55 @@
+import pickle
+
+from src.backend.transferObjects.visualization import SimpleTextViz
+from src.backend.types.payload import Payload
+from src.backend.types.visualizationPolicy import VisualizationPolicy, VisualizationCollector
+
+
+def texts_of(visualizations):
+    return [viz.content for viz in visualizations if isinstance(viz, SimpleTextViz)]
+
+
+def test_unlimited_by_default():
+    payload = Payload()
+    for i in range(5):
+        payload.addVisualization(SimpleTextViz(str(i)))
+    assert texts_of(payload.popVisualizations()) == ["0", "1", "2", "3", "4"]
+    assert payload.popVisualizations() == []
+
+
+def test_first_n_keeps_first_visualizations_and_adds_summary():
+    payload = Payload()
+    payload.setVisualizationPolicy(VisualizationPolicy(max_visualizations=3))
+    partial = Payload({}, link_to_parent=payload)
+    for i in range(10):
+        partial.addVisualization(SimpleTextViz(str(i)))
+        partial.summarize("Parity", i % 2)
+
+    visualizations = payload.popVisualizations()
+    assert texts_of(visualizations) == ["0", "1", "2"]
+    assert len(visualizations) == 4
+    assert "Showing 3 (first) of 10" in visualizations[-1].html
+
+
+def test_reservoir_keeps_bounded_ordered_sample():
+    collector = VisualizationCollector(VisualizationPolicy(max_visualizations=5, sampling=VisualizationPolicy.RESERVOIR))
+    for i in range(1000):
+        collector.add(SimpleTextViz(i))
+    sample = [viz.content for viz in collector.pop()[:-1]]
+    assert len(sample) == 5
+    assert sample == sorted(sample)
+
+
+def test_merge_counts_dropped_visualizations_of_workers():
+    policy = VisualizationPolicy(max_visualizations=2)
+    worker = VisualizationCollector(policy)
+    for i in range(4):
+        worker.add(SimpleTextViz(str(i)))
+    worker.summarize("Labels", "POSITIVE", 4)
+    worker = pickle.loads(pickle.dumps(worker))
+
+    collector = VisualizationCollector(policy)
+    collector.merge(worker)
+    assert collector.seen == 4
+    assert collector.summaries["Labels"]["POSITIVE"] == 4
+    assert texts_of(collector.pop()) == ["0", "1"]
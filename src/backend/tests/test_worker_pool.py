@@ -0,0 +1,88 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.backend.operations.model_registry import MODELS
+from src.backend.types import workerPool
+from src.backend.types.frontendNotifier import FrontendNotifier
+
+
+class ModelOperation:
+    loads = 0
+
+    @classmethod
+    def requiredModels(cls, config):
+        return [lambda notifier: MODELS.get("test", config["model"], cls._load)]
+
+    @classmethod
+    def _load(cls):
+        cls.loads += 1
+        return {"weights": [0.5] * 1000}
+
+
+class NoModelOperation:
+    @classmethod
+    def requiredModels(cls, config):
+        return []
+
+
+def is_preloaded(model_name):
+    return MODELS.isLoaded("test", model_name)
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    started = []
+    monkeypatch.setattr(workerPool, "_preloaded", None)
+    monkeypatch.setattr(workerPool, "_startForkServer",
+                        lambda payload: (started.append(payload), setattr(workerPool, "_preloaded", payload)))
+    return started
+
+
+def test_operations_without_models_use_the_default_start_method(fake_server):
+    with workerPool.workerContext(NoModelOperation, {}, MagicMock(spec=FrontendNotifier)) as context:
+        assert context.get_start_method() == multiprocessing.get_start_method()
+    assert fake_server == []
+
+
+def test_server_is_only_replaced_when_not_in_use(fake_server):
+    notifier = MagicMock(spec=FrontendNotifier)
+    with workerPool.workerContext(ModelOperation, {"model": "a"}, notifier) as context:
+        assert context.get_start_method() == "forkserver"
+        with workerPool.workerContext(ModelOperation, {"model": "b"}, notifier):
+            pass
+        with workerPool.workerContext(ModelOperation, {"model": "a"}, notifier):
+            pass
+    assert len(fake_server) == 1
+
+    with workerPool.workerContext(ModelOperation, {"model": "b"}, notifier):
+        pass
+    assert len(fake_server) == 2
+
+
+def test_preload_loads_required_models():
+    ModelOperation.loads = 0
+    workerPool.preloadModels(workerPool._payload(ModelOperation, {"model": "preload-test"}))
+    assert ModelOperation.loads == 1
+    assert is_preloaded("preload-test")
+    MODELS.clear()
+
+
+@pytest.mark.skipif("forkserver" not in multiprocessing.get_all_start_methods(), reason="Requires fork servers")
+def test_workers_inherit_preloaded_models():
+    config = {"model": "shared"}
+    with workerPool.workerContext(ModelOperation, config, MagicMock(spec=FrontendNotifier)) as context, \
+            ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+        assert all(pool.map(is_preloaded, ["shared"] * 4))
+    assert not is_preloaded("shared")
+
+
+def test_default_context_if_the_fork_server_cannot_be_replaced(monkeypatch):
+    monkeypatch.setattr(workerPool, "_preloaded", None)
+    monkeypatch.setattr(workerPool, "_startForkServer", lambda payload: False)
+
+    with workerPool.workerContext(ModelOperation, {"model": "a"}, MagicMock(spec=FrontendNotifier)) as context:
+        assert context.get_start_method() == multiprocessing.get_start_method()
+    assert workerPool._users == 0
@@ -40,6 +40,7 @@ class StepState(Enum):
     RUNNING = 1
     SUCCESS = 2
     FAILED = 3
+    QUEUED = 4
 
 
 class NotificationDomain:
@@ -7,6 +7,7 @@ from backend.types.frontendNotifier import FrontendNotifier
 from backend.types.operation import StepOperation
 from backend.types.params import Parameter, StaticParameter
 from backend.types.payload import Payload
+from backend.types.threadPolicy import ThreadPolicy
 
 
 class InputOutputDefinition:
@@ -36,9 +37,15 @@ class StepBlueprint:
         self.inOutDef = inOutDef
         self.tags = tags if tags else []
 
-    def run(self, configValues: StepValues, payload: Payload, notifier: FrontendNotifier):
+    def buildConfig(self, configValues: StepValues) -> Config:
         config = Config(self.inOutDef.inputs_static)
         config.setValues(configValues.values)
+        return config
+
+    def run(self, configValues: StepValues, payload: Payload, notifier: FrontendNotifier,
+            threadPolicy: ThreadPolicy = None):
+        config = self.buildConfig(configValues)
+        config.setThreadPolicy(threadPolicy)
         if not config.isReady():
             missingValues = list(config.getMissingValues())
             notifier.log(f"Config object seems to miss some values: {config.values}")
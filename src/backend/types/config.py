@@ -18,6 +18,9 @@ class Config(dict[str, Any]):
             else:
                 self.fields[p.name] = p
 
+        # Runtime settings of the run, not part of the step's parameters
+        self.threadPolicy = None
+
         self.values = {}
         for p in parameters:
             if p.name not in self.complexFields and p.defaultValue is not None:
@@ -32,6 +35,16 @@ class Config(dict[str, Any]):
                 self.values[vName] = self.fields[vName].type.parse(vValue)
 
 
+    def setThreadPolicy(self, policy: "ThreadPolicy"):
+        self.threadPolicy = policy
+
+    def getThreadPolicy(self) -> "ThreadPolicy":
+        """
+        Returns the ThreadPolicy of the run (threads and workers an operation should use), or None if the run
+        has none.
+        """
+        return self.threadPolicy
+
     def getMissingValues(self) -> Iterable[str]:
         for key in self.fields:
             if key in self.complexFields:
@@ -62,6 +75,28 @@ class Config(dict[str, Any]):
         complexVals = filter(lambda x: x in self.complexFields, self.fields)
         return itertools.chain(self.values, complexVals)
 
+    def __reduce__(self):
+        # Parameter types hold parse functions that cannot be pickled. Only the parsed values are transferred
+        # (e.g. to worker processes), which is all an operation reads from its config.
+        return Config._fromValueTree, (self._valueTree(),)
+
+    def _valueTree(self):
+        return {
+            "values": dict(self.values),
+            "complex": {name: self.fields[name]._valueTree() for name in self.complexFields},
+            "threadPolicy": self.threadPolicy
+        }
+
+    @staticmethod
+    def _fromValueTree(tree: dict) -> "Config":
+        config = Config([])
+        config.values = tree["values"]
+        config.threadPolicy = tree.get("threadPolicy")
+        for name, innerTree in tree["complex"].items():
+            config.fields[name] = Config._fromValueTree(innerTree)
+            config.complexFields.add(name)
+        return config
+
     def get_values(self):
         result = self.values
         for k, inner_config in self.fields.items():
@@ -1,3 +1,4 @@
+import threading
 from abc import ABC, abstractmethod
 from collections import Counter
 from typing import List
@@ -25,7 +26,7 @@ class CellNotifierWrapper(FrontendNotifier):
         self.counter = successCounter
 
     def log(self, message: str | List[str], level: LogLevels = LogLevels.DEBUG):
-        prefix = f"Cell {self.cell_index}/{self.total_cells}:"
+        prefix = f"Cell {self.cell_index}/{self.total_cells}: "
         if isinstance(message, str):
             message = prefix + message
         else:
@@ -41,6 +42,70 @@ class CellNotifierWrapper(FrontendNotifier):
         relative_progress = (100 * self.cell_index + progress) / self.total_cells
         self.cellNotifier.sendStatus(StepState.RUNNING, relative_progress)
 
+
+class BatchNotifierWrapper(FrontendNotifier):
+
+    def __init__(self, batchNotifier: FrontendNotifier, first_index: int, batch_size: int, total_cells: int):
+        self.batchNotifier = batchNotifier
+        self.first_index = first_index
+        self.batch_size = batch_size
+        self.total_cells = total_cells
+
+    def log(self, message: str | List[str], level: LogLevels = LogLevels.DEBUG):
+        prefix = f"Cells {self.first_index}-{self.first_index + self.batch_size - 1}/{self.total_cells}: "
+        if isinstance(message, str):
+            message = prefix + message
+        else:
+            message = [prefix + m for m in message]
+        return self.batchNotifier.log(message, level)
+
+    def sendStatus(self, stepState: StepState, progress: float = 0.0):
+        relative_progress = (100 * self.first_index + progress * self.batch_size) / self.total_cells
+        self.batchNotifier.sendStatus(StepState.RUNNING, relative_progress)
+
+
+class ConcurrentNotifierWrapper(FrontendNotifier):
+    """
+    Shared by concurrently running workers. Logs are serialized, and progress is derived from a thread-safe
+    count of processed cells instead of cell indices, so it never jumps backwards.
+    """
+
+    def __init__(self, notifier: FrontendNotifier, total_cells: int):
+        self.notifier = notifier
+        self.total_cells = total_cells
+        self.processed_cells = 0
+        self.lock = threading.Lock()
+
+    def log(self, message: str | List[str], level: LogLevels = LogLevels.DEBUG):
+        with self.lock:
+            return self.notifier.log(message, level)
+
+    def sendStatus(self, stepState: StepState, progress: float = 0.0):
+        # Progress of single cells is reported through advance()
+        pass
+
+    def advance(self, num_cells: int):
+        with self.lock:
+            self.processed_cells += num_cells
+            self.notifier.sendStatus(StepState.RUNNING, 100 * self.processed_cells / self.total_cells)
+
+
+class ShardNotifier(FrontendNotifier):
+    """
+    Collects the logs of a worker process so they can be forwarded by the parent. Status updates are dropped,
+    as the parent reports progress per finished shard.
+    """
+
+    def __init__(self):
+        self.logs = []
+
+    def log(self, message: str | List[str], level: LogLevels = LogLevels.DEBUG):
+        self.logs.append((message, level))
+
+    def sendStatus(self, stepState: StepState, progress: float = 0.0):
+        pass
+
+
 class DummyNotifier(FrontendNotifier):
     def log(self, message: str | List[str], level: LogLevels = LogLevels.DEBUG):
         print(f"LOG ({level.name}): {message}")
@@ -0,0 +1,181 @@
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+# Common span names of operations
+TOKENIZE = "tokenize"
+FORWARD = "forward"
+POST_PROCESS = "post-process"
+
+
+class StepMetrics:
+    """
+    Timings and model loads of one step. PipelineRunner makes it the current metrics while the step runs, so that
+    `span` and `recordLoad` called anywhere below the step (also in threads started via `propagate`) end up here.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = {}  # name -> {"count", "seconds"}
+        self.loads = []
+        self.started = time.perf_counter()
+        self.seconds = None
+
+    def addSpan(self, name: str, seconds: float, count: int = 1):
+        with self.lock:
+            span = self.spans.setdefault(name, {"count": 0, "seconds": 0.0})
+            span["count"] += count
+            span["seconds"] += seconds
+
+    def addLoad(self, record: dict):
+        with self.lock:
+            self.loads.append(record)
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+
+    def toJson(self) -> dict:
+        with self.lock:
+            return {
+                "seconds": self.seconds,
+                "spans": {name: dict(span) for name, span in self.spans.items()},
+                "model_loads": list(self.loads)
+            }
+
+    def summary(self) -> List[str]:
+        lines = []
+        with self.lock:
+            if self.seconds is not None:
+                lines.append(f"Step took {self.seconds:.2f}s.")
+            for record in self.loads:
+                line = f"Model {record['loader']}:{record['model']} ({record['cache']}) in {record['seconds']:.2f}s"
+                if record.get("bytes_read") is not None:
+                    line += f", {record['bytes_read'] / 1024 ** 2:.0f} MB read"
+                if record.get("rss_delta") is not None:
+                    line += f", RSS {record['rss_delta'] / 1024 ** 2:+.0f} MB"
+                lines.append(line + ".")
+            for name, span in self.spans.items():
+                lines.append(f"{name}: {span['seconds']:.2f}s in {span['count']} calls.")
+        return lines
+
+
+_current: contextvars.ContextVar[Optional[StepMetrics]] = contextvars.ContextVar("step_metrics", default=None)
+
+
+def currentMetrics() -> Optional[StepMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def collecting(metrics: StepMetrics):
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        metrics.finish()
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Adds the time spent in the block to the span `name` of the current step, if any.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.addSpan(name, time.perf_counter() - start)
+
+
+def propagate(function: Callable) -> Callable:
+    """
+    Threads do not inherit the current metrics; wrap functions that are run in other threads with this.
+    """
+    metrics = _current.get()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        token = _current.set(metrics)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return wrapper
+
+
+def recordLoad(record: dict):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.addLoad(record)
+
+
+def instrumentPipeline(pipeline):
+    """
+    Records the preprocess (tokenize), _forward (forward) and postprocess (post-process) stages of a
+    transformers pipeline. The pipeline may be shared; each call is attributed to the step it runs in.
+    """
+    if getattr(pipeline, "instrumented", False):
+        return
+    for method, name in (("preprocess", TOKENIZE), ("_forward", FORWARD), ("postprocess", POST_PROCESS)):
+        if not hasattr(pipeline, method):
+            continue
+        setattr(pipeline, method, _timed(getattr(pipeline, method), name))
+    pipeline.instrumented = True
+
+
+def _timed(function: Callable, name: str) -> Callable:
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def processRss() -> Optional[int]:
+    """
+    Resident memory of the process in bytes, if it can be determined.
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def processBytesRead() -> Optional[int]:
+    """
+    Bytes the process has read from storage (including memory-mapped files), if it can be determined.
+    """
+    try:
+        import psutil
+        counters = psutil.Process().io_counters()
+        return counters.read_bytes
+    except (ImportError, AttributeError):
+        pass
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                if line.startswith("read_bytes:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
@@ -1,13 +1,18 @@
+import math
+import os
 import time
 import traceback
 from abc import ABC, abstractmethod
 from collections import Counter
+from typing import Any, Callable, List
 
 from pydantic import typing
 
 from backend.transferObjects.eventTransferObjects import StepState, LogLevels
+from backend.types import instrumentation
 from backend.types.config import Config
-from backend.types.frontendNotifier import FrontendNotifier, CellNotifierWrapper
+from backend.types.frontendNotifier import FrontendNotifier, CellNotifierWrapper, BatchNotifierWrapper, \
+    ShardNotifier, ConcurrentNotifierWrapper
 
 
 class StepOperation(ABC):
@@ -18,6 +23,15 @@ class StepOperation(ABC):
     def initialize(self, config: Config, frontendNotifier: FrontendNotifier):
         pass
 
+    @classmethod
+    def requiredModels(cls, config: Config) -> List[Callable[[FrontendNotifier], Any]]:
+        """
+        Returns loaders of the models that initialize will load with this config, so that they can be loaded in
+        advance while earlier steps run. Each loader is called with a notifier and must load through the shared
+        model registry (i.e. the loaders of operation_utils).
+        """
+        return []
+
     @abstractmethod
     def run(self, payload, notifier: FrontendNotifier) -> StepState:
         pass
@@ -26,7 +40,21 @@ class StepOperation(ABC):
         return self.run(payload, notifier)
 
 
+class ExecutionMode:
+    SEQUENTIAL = "sequential"
+    THREADS = "threads"
+    PROCESSES = "processes"
+
+
 class ParallelizableOperation(StepOperation, ABC):
+    # Number of cells handed to batch_operation at once, unless the config defines a "batch size".
+    DEFAULT_BATCH_SIZE = 64
+    # In process mode, the input is split into this many shards per worker to report progress in between.
+    SHARDS_PER_WORKER = 4
+    # Operations whose cell/batch operations may run concurrently on one instance (e.g. because the underlying
+    # model releases the GIL) set this to allow the "threads" execution mode.
+    THREAD_SAFE = False
+
     def __init__(self, config, notifier):
         super(ParallelizableOperation, self).__init__(config, notifier)
         self.config = config
@@ -35,6 +63,18 @@ class ParallelizableOperation(StepOperation, ABC):
         if isinstance(self.input_column, list):
             self.input_column = self.input_column[0]
 
+        batch_size = self.config.get("batch size", None)
+        self.batch_size = max(1, int(batch_size)) if batch_size else self.DEFAULT_BATCH_SIZE
+
+        self.execution_mode = self.config.get("execution mode", None) or ExecutionMode.SEQUENTIAL
+        workers = self.config.get("workers", None)
+        policy = self.config.getThreadPolicy() if isinstance(self.config, Config) else None
+        self.threadPolicy = policy
+        if not workers and policy is not None and policy.workers:
+            # Without an explicit number of workers, stay within the cores assigned to the run
+            workers = policy.workers
+        self.workers = max(1, int(workers)) if workers else (os.cpu_count() or 1)
+
     @abstractmethod
     def single_cell_operation(self, notifier, payload, cell_value):
         """
@@ -43,6 +83,16 @@ class ParallelizableOperation(StepOperation, ABC):
         """
         pass
 
+    def batch_operation(self, notifier, payload, cells: list) -> list:
+        """
+        Optional: Process a batch of cells at once (e.g. to run a model on many texts per call).
+        Must return a list with one entry per cell, each entry being what single_cell_operation would return.
+        An entry may also be an Exception to mark only that cell as failed.
+        If the whole batch raises, its cells are processed one by one via single_cell_operation.
+        Operations that do not override this method are always processed cell by cell.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def getColumnNames(self) -> list:
         """
@@ -50,41 +100,191 @@ class ParallelizableOperation(StepOperation, ABC):
         """
         pass
 
+    def supportsBatching(self) -> bool:
+        return type(self).batch_operation is not ParallelizableOperation.batch_operation
+
+    def _toRow(self, result, output_columns: list):
+        """
+        Validates the result of one cell and converts it into a row of the output columns.
+        """
+        if isinstance(result, Exception):
+            raise result
+        if not isinstance(result, (list, tuple)):
+            raise ValueError("single_cell_operation must return a list or tuple.")
+        if len(result) != len(output_columns):
+            raise ValueError(
+                f"Expected {len(output_columns)} outputs but got {len(result)}."
+            )
+        return result
+
+    def _processCell(self, notifier, payload, cell_value, cell_index, num_cells, counter, output_columns):
+        cellNotifier = CellNotifierWrapper(notifier, counter, cell_index, num_cells)
+        try:
+            result = self._toRow(self.single_cell_operation(cellNotifier, payload, cell_value), output_columns)
+            counter["success"] += 1
+            return result
+        except Exception as e:
+            traceback_str = traceback.format_exc()
+            notifier.log(traceback_str, LogLevels.ERROR)
+            cellNotifier.log(f"Error processing cell {cell_index}: {e}", LogLevels.ERROR)
+            counter["failed"] += 1
+            # Return a tuple with None for each expected output.
+            return tuple([None] * len(output_columns))
+
+    def _processBatch(self, notifier, payload, cells, first_index, num_cells, counter, output_columns):
+        batchNotifier = BatchNotifierWrapper(notifier, first_index, len(cells), num_cells)
+        try:
+            results = self.batch_operation(batchNotifier, payload, cells)
+            if len(results) != len(cells):
+                raise ValueError(f"batch_operation returned {len(results)} results for {len(cells)} cells.")
+        except Exception as e:
+            notifier.log(traceback.format_exc(), LogLevels.ERROR)
+            batchNotifier.log(f"Batch failed ({e}). Processing its cells one by one.", LogLevels.WARN)
+            return [self._processCell(notifier, payload, cell_value, first_index + i, num_cells, counter,
+                                      output_columns)
+                    for i, cell_value in enumerate(cells)]
+
+        rows = []
+        for i, result in enumerate(results):
+            try:
+                rows.append(self._toRow(result, output_columns))
+                counter["success"] += 1
+            except Exception as e:
+                batchNotifier.log(f"Error processing cell {first_index + i}: {e}", LogLevels.ERROR)
+                counter["failed"] += 1
+                rows.append(tuple([None] * len(output_columns)))
+        batchNotifier.sendStatus(StepState.RUNNING, 100)
+        return rows
+
+    def _processCells(self, notifier, payload, cells: list, first_index, num_cells, counter, output_columns):
+        """
+        Processes a consecutive slice of cells, batch-wise if the operation supports it.
+        """
+        if not self.supportsBatching():
+            return [self._processCell(notifier, payload, cell_value, first_index + i, num_cells, counter,
+                                      output_columns)
+                    for i, cell_value in enumerate(cells)]
+
+        rows = []
+        for start in range(0, len(cells), self.batch_size):
+            batch = cells[start:start + self.batch_size]
+            rows.extend(self._processBatch(notifier, payload, batch, first_index + start, num_cells, counter,
+                                           output_columns))
+        return rows
+
+    def _processCellsInThreads(self, notifier, payload, cells: list, counter, output_columns):
+        """
+        Processes chunks of cells (one batch each, if batching is supported) in a bounded pool of threads.
+        Each chunk counts its results and collects its visualizations separately (see Payload.chunkView); both are
+        merged in input order.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        num_cells = len(cells)
+        if self.supportsBatching():
+            chunk_size = self.batch_size
+        else:
+            chunk_size = max(1, math.ceil(num_cells / (self.workers * self.SHARDS_PER_WORKER)))
+
+        concurrentNotifier = ConcurrentNotifierWrapper(notifier, num_cells)
+
+        def processChunk(start):
+            chunk_payload = payload.chunkView()
+            chunk_counter = Counter({"success": 0, "failed": 0})
+            chunk_rows = self._processCells(concurrentNotifier, chunk_payload, cells[start:start + chunk_size],
+                                            start, num_cells, chunk_counter, output_columns)
+            concurrentNotifier.advance(len(chunk_rows))
+            return chunk_rows, chunk_counter, chunk_payload['visualizations']
+
+        notifier.log(f"Processing {num_cells} cells using {self.workers} threads.", LogLevels.INFO)
+        rows = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=type(self).__name__) as pool:
+            # map() yields in submission order, which keeps the output deterministic.
+            chunks = range(0, num_cells, chunk_size)
+            for chunk_rows, chunk_counter, visualizations in pool.map(instrumentation.propagate(processChunk), chunks):
+                rows.extend(chunk_rows)
+                counter.update(chunk_counter)
+                payload.mergeVisualizations(visualizations)
+        return rows
+
+    def _processCellsInProcesses(self, notifier, payload, cells: list, counter, output_columns):
+        """
+        Splits the cells into shards and processes them in a pool of worker processes.
+        Every worker initializes its own instance of this operation once, using the same config. The models it
+        requires are loaded once and shared by all workers (see workerPool).
+        Cells only see a fresh payload that collects their visualizations and summaries.
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from backend.types.visualizationPolicy import VisualizationCollector
+        from backend.types.workerPool import workerContext, ENVIRONMENT_LOCK
+
+        num_cells = len(cells)
+        shard_size = max(1, math.ceil(num_cells / (self.workers * self.SHARDS_PER_WORKER)))
+        rows = [None] * num_cells
+        shard_visualizations = {}
+        policy = payload.getVisualizationPolicy()
+        processed = 0
+
+        notifier.log(f"Processing {num_cells} cells in {math.ceil(num_cells / shard_size)} shards "
+                     f"using {self.workers} worker processes.", LogLevels.INFO)
+        with workerContext(type(self), self.config, notifier) as context, \
+                ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_initializeWorker,
+                                    initargs=(type(self), self.config)) as pool:
+            # Submitting starts the worker processes
+            with ENVIRONMENT_LOCK:
+                futures = {pool.submit(_processShard, cells[start:start + shard_size], start, num_cells, policy):
+                           start for start in range(0, num_cells, shard_size)}
+            for future in as_completed(futures):
+                start = futures[future]
+                end = min(start + shard_size, num_cells)
+                try:
+                    shard = future.result()
+                except Exception as e:
+                    notifier.log(traceback.format_exc(), LogLevels.ERROR)
+                    shard = ShardResult([tuple([None] * len(output_columns))] * (end - start), 0, end - start,
+                                        [(f"Worker failed on cells {start}-{end - 1}: {e}", LogLevels.ERROR)],
+                                        VisualizationCollector(policy))
+
+                rows[start:end] = shard.rows
+                counter["success"] += shard.succeeded
+                counter["failed"] += shard.failed
+                for message, level in shard.logs:
+                    notifier.log(message, level)
+                if shard.failed > 0:
+                    notifier.log(f"Shard {start}-{end - 1}: {shard.failed} of {end - start} cells failed.",
+                                 LogLevels.WARN)
+                shard_visualizations[start] = shard.visualizations
+
+                processed += end - start
+                notifier.sendStatus(StepState.RUNNING, 100 * processed / num_cells)
+
+        # Keep visualizations in the order of the input cells.
+        for start in sorted(shard_visualizations):
+            payload.mergeVisualizations(shard_visualizations[start])
+        return rows
+
     def run(self, payload, notifier) -> 'StepState':
         import pandas as pd
 
         start_time = time.time()
         data: pd.DataFrame = payload.data
         counter = Counter({"success": 0, "failed": 0})
-        num_cells = len(data[self.input_column])
+        cells = data[self.input_column].tolist()
+        num_cells = len(cells)
         output_columns = self.getColumnNames()
 
-        cell_index = 0
+        if self.execution_mode == ExecutionMode.THREADS and not self.THREAD_SAFE:
+            notifier.log(f"{type(self).__name__} is not thread-safe. Processing cells sequentially instead.",
+                         LogLevels.WARN)
+            self.execution_mode = ExecutionMode.SEQUENTIAL
 
-        def transform(cell_value):
-            nonlocal cell_index
-            cellNotifier = CellNotifierWrapper(notifier, counter, cell_index, num_cells)
-            cell_index += 1
-            try:
-                result = self.single_cell_operation(cellNotifier, payload, cell_value)
-                if not isinstance(result, (list, tuple)):
-                    raise ValueError("single_cell_operation must return a list or tuple.")
-                if len(result) != len(output_columns):
-                    raise ValueError(
-                        f"Expected {len(output_columns)} outputs but got {len(result)}."
-                    )
-                counter["success"] += 1
-                return result
-            except Exception as e:
-                traceback_str = traceback.format_exc()
-                notifier.log(traceback_str, LogLevels.ERROR)
-                cellNotifier.log(f"Error processing cell {cell_index}: {e}", LogLevels.ERROR)
-                counter["failed"] += 1
-                # Return a tuple with None for each expected output.
-                return tuple([None] * len(output_columns))
-
-        results = data[self.input_column].apply(transform)
-        result_df = pd.DataFrame(results.tolist(), index=data.index, columns=output_columns)
+        if self.execution_mode == ExecutionMode.PROCESSES and self.workers > 1 and num_cells > 1:
+            results = self._processCellsInProcesses(notifier, payload, cells, counter, output_columns)
+        elif self.execution_mode == ExecutionMode.THREADS and self.workers > 1 and num_cells > 1:
+            results = self._processCellsInThreads(notifier, payload, cells, counter, output_columns)
+        else:
+            results = self._processCells(notifier, payload, cells, 0, num_cells, counter, output_columns)
+        result_df = pd.DataFrame(results, index=data.index, columns=output_columns)
 
         for col in output_columns:
             data[col] = result_df[col]
@@ -120,28 +320,57 @@ class ParallelizableTextOperation(ParallelizableOperation, ABC):
         """
         pass
 
+    def batch_operation(self, notifier, payload, texts: list) -> list:
+        """
+        Optional: Process a batch of cells and return one string (or Exception) per cell.
+        """
+        raise NotImplementedError
+
+    def supportsBatching(self) -> bool:
+        return type(self).batch_operation is not ParallelizableTextOperation.batch_operation
+
     def getColumnNames(self) -> list:
         # For single output operations, simply return one-element list.
         return [self.output_column]
 
-    def run(self, payload, notifier) -> 'StepState':
-        start_time = time.time()
+    def _toRow(self, result, output_columns: list):
+        if isinstance(result, Exception):
+            raise result
+        # Wrap the single output in a tuple so that the parent sees tuple outputs.
+        return super()._toRow((result,), output_columns)
 
-        # Save the original operation.
-        original_operation = self.single_cell_operation
 
-        def wrapper(cell_notifier, payload, text: str):
-            result = original_operation(cell_notifier, payload, text)
-            return (result,)  # Wrap it in a tuple
+class ShardResult:
+    def __init__(self, rows: list, succeeded: int, failed: int, logs: list, visualizations: "VisualizationCollector"):
+        self.rows = rows
+        self.succeeded = succeeded
+        self.failed = failed
+        self.logs = logs
+        self.visualizations = visualizations
 
-        # Swap in our wrapper so that the parent run method sees tuple outputs.
-        self.single_cell_operation = wrapper
-        state = super().run(payload, notifier)
-        self.single_cell_operation = original_operation
 
-        end_time = time.time()
-        notifier.log(f"Total processing time: {end_time - start_time:.2f} seconds", LogLevels.INFO)
-        return state
+# State of a worker process in process execution mode
+_worker_operation: ParallelizableOperation = None
+
+
+def _initializeWorker(operation_class: typing.Type[ParallelizableOperation], config: Config):
+    global _worker_operation
+    # Initialization logs would be repeated by every worker, so they are not forwarded.
+    _worker_operation = operation_class(config, ShardNotifier())
+
+
+def _processShard(cells: list, first_index: int, num_cells: int, policy: "VisualizationPolicy") -> ShardResult:
+    from backend.types.payload import Payload
+
+    notifier = ShardNotifier()
+    # Operations only add visualizations and summaries to the payload of a single cell; these are sent back to
+    # the parent, already bounded by the step's visualization policy.
+    payload = Payload()
+    payload.setVisualizationPolicy(policy)
+    counter = Counter({"success": 0, "failed": 0})
+    rows = _worker_operation._processCells(notifier, payload, cells, first_index, num_cells, counter,
+                                           _worker_operation.getColumnNames())
+    return ShardResult(rows, counter["success"], counter["failed"], notifier.logs, payload['visualizations'])
 
 
 class StepOperationMapper:
@@ -2,6 +2,7 @@ from typing import Dict, Any, Optional, List
 
 
 from backend.types.params import Parameter
+from backend.types.visualizationPolicy import VisualizationCollector, VisualizationPolicy
 
 
 class Payload(Dict[str, Any]):
@@ -12,7 +13,7 @@ class Payload(Dict[str, Any]):
 
         # Initialize protected attributes
         if not link_to_parent:
-            super().__setitem__('visualizations', [])
+            super().__setitem__('visualizations', VisualizationCollector())
 
         if values is not None:
             for k, v in values.items():
@@ -25,7 +26,7 @@ class Payload(Dict[str, Any]):
             super().__setitem__(key, value)
 
     def __getitem__(self, key: str) -> Any:
-        if key == "visualizations" and self.link_to_parent:
+        if key == "visualizations" and self.link_to_parent and key not in self:
             return self.link_to_parent[key]
         if self.link_to_parent and key not in self and key in self.link_to_parent:
             raise ValueError(
@@ -48,12 +49,52 @@ class Payload(Dict[str, Any]):
             raise AttributeError(f"'Payload' object has no attribute '{key}'")
 
     def popVisualizations(self):
-        visualizations = self['visualizations']
-        self['visualizations'] = []
-        return visualizations
+        return self['visualizations'].pop()
 
     def addVisualization(self, viz: Any):
-        self['visualizations'].append(viz)
+        self['visualizations'].add(viz)
+
+    def addArtifact(self, name: str, value: Any):
+        """
+        Adds a file result of the step under `name` (currently a numpy array, e.g. a full similarity matrix that is
+        too large for a visualization). Artifacts are saved in the run directory and are not passed on to later steps.
+        """
+        if self.link_to_parent is not None:
+            self.link_to_parent.addArtifact(name, value)
+            return
+        super().setdefault('artifacts', {})[name] = value
+
+    def popArtifacts(self) -> Dict[str, Any]:
+        if self.link_to_parent is not None:
+            return self.link_to_parent.popArtifacts()
+        return super().pop('artifacts', {})
+
+    def summarize(self, title: str, key: Any, amount: int = 1):
+        """
+        Counts `amount` for `key` in the summary table `title`, which is shown as one aggregate visualization
+        at the end of the step. Unlike addVisualization, this does not grow with the number of rows.
+        """
+        self['visualizations'].summarize(title, key, amount)
+
+    def mergeVisualizations(self, collector: VisualizationCollector):
+        self['visualizations'].merge(collector)
+
+    def getVisualizationPolicy(self) -> VisualizationPolicy:
+        return self['visualizations'].policy
+
+    def setVisualizationPolicy(self, policy: VisualizationPolicy):
+        self['visualizations'].setPolicy(policy)
+
+    def chunkView(self) -> 'Payload':
+        """
+        A view for one chunk of cells that is processed concurrently with other chunks: it reads the values of this
+        payload and writes to it, but collects visualizations and summaries separately, so that they can be merged
+        in input order afterwards (see mergeVisualizations).
+        """
+        view = Payload({key: value for key, value in self.items() if key not in ('visualizations', 'artifacts')},
+                       link_to_parent=self)
+        dict.__setitem__(view, 'visualizations', VisualizationCollector(self.getVisualizationPolicy()))
+        return view
 
     def partialView(self, params: List[Parameter]) -> 'Payload':
         partial_values = {param.name: param.type.parse(self[param.name]) for param in params}
@@ -0,0 +1,176 @@
+import math
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+
+class ThreadPolicy:
+    """
+    CPU parallelism of a run: threads used within one torch operator (intra-op), threads running independent
+    operators (inter-op) and the number of workers operations start (see ParallelizableOperation).
+    None leaves the respective library default untouched. The workers share the budget of `threads`, i.e. each
+    of them gets `threads // workers` intra-op threads, so that workers times intra-op threads stays within it.
+
+    PipelineRunner applies the policy around every step and restores the previous settings afterwards; steps may
+    set their own number of threads with the PARAMETER (see forStep). Operations can read it via
+    Config.getThreadPolicy().
+
+    The settings are process-wide (torch threads, environment). Concurrent runs may apply equal policies at the
+    same time; a policy that differs from the one currently applied waits until no step applies that one
+    anymore, so steps with different policies are serialized.
+    """
+
+    # Step parameter overriding the run's policy; 0 (the default) keeps it
+    PARAMETER = "cpu threads"
+
+    # Read by OpenMP/MKL (torch, numpy) and the tokenizers library when their thread pools start
+    ENVIRONMENT = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "RAYON_RS_NUM_CPUS")
+
+    # spaCy only starts worker processes for at least this many texts per process
+    MIN_TEXTS_PER_PROCESS = 16
+
+    _condition = threading.Condition()
+    _active = 0
+    _applied = None
+    _saved = None
+
+    def __init__(self, intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None,
+                 workers: Optional[int] = None):
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.workers = workers
+
+    @staticmethod
+    def forBudget(threads: int, workers: int = 1) -> "ThreadPolicy":
+        """
+        Policy for a run or step that may use `threads` cores with `workers` workers.
+        """
+        threads = max(1, threads)
+        workers = max(1, min(workers, threads))
+        return ThreadPolicy(intra_op_threads=max(1, threads // workers), inter_op_threads=1 if threads < 4 else 2,
+                            workers=workers)
+
+    @staticmethod
+    def forStep(stepValues: dict, runPolicy: Optional["ThreadPolicy"]) -> Optional["ThreadPolicy"]:
+        """
+        Policy of a step with the given config values. The budget is the step's "cpu threads" if it sets them,
+        otherwise that of the run. It is split between the step's "workers" if it sets them; steps in the
+        "threads" or "processes" execution mode otherwise use one worker per thread, other steps a single worker
+        with all threads.
+        """
+        stepValues = stepValues or {}
+        threads = stepValues.get(ThreadPolicy.PARAMETER)
+        threads = int(threads) if threads and int(threads) > 0 else None
+        if threads is None:
+            if runPolicy is None:
+                return None
+            threads = runPolicy.threads
+
+        workers = stepValues.get("workers")
+        if workers and int(workers) > 0:
+            workers = int(workers)
+        elif stepValues.get("execution mode") in ("threads", "processes"):
+            workers = threads
+        else:
+            workers = 1
+        policy = ThreadPolicy.forBudget(threads, workers)
+        return runPolicy if runPolicy is not None and runPolicy._settings() == policy._settings() else policy
+
+    @property
+    def threads(self) -> int:
+        """
+        The budget of cores: intra-op threads of all workers.
+        """
+        return (self.intra_op_threads or 1) * (self.workers or 1)
+
+    @staticmethod
+    def pipeOptions(policy: Optional["ThreadPolicy"], texts: int) -> dict:
+        """
+        Keyword arguments of spaCy's nlp.pipe for `texts` texts: a single worker may run spaCy in one process
+        per intra-op thread, otherwise the workers are the parallelism and spaCy runs in-process.
+        """
+        processes = 1
+        if policy is not None and (policy.workers or 1) == 1 and policy.intra_op_threads:
+            processes = max(1, min(policy.intra_op_threads, texts // ThreadPolicy.MIN_TEXTS_PER_PROCESS))
+        return {"n_process": processes, "batch_size": max(1, math.ceil(texts / processes))}
+
+    def _settings(self) -> tuple:
+        return self.intra_op_threads, self.inter_op_threads, self.workers
+
+    def __repr__(self):
+        return (f"ThreadPolicy(intra_op_threads={self.intra_op_threads}, inter_op_threads={self.inter_op_threads}, "
+                f"workers={self.workers})")
+
+    @contextmanager
+    def applied(self):
+        """
+        Applies the policy for the duration of the block, waiting while a different policy is applied.
+        Must not be nested with a different policy in the same thread.
+        """
+        with ThreadPolicy._condition:
+            ThreadPolicy._condition.wait_for(
+                lambda: ThreadPolicy._active == 0 or ThreadPolicy._applied == self._settings())
+            if ThreadPolicy._active == 0:
+                ThreadPolicy._saved = ThreadPolicy._currentSettings()
+                ThreadPolicy._applied = self._settings()
+                self._apply()
+            ThreadPolicy._active += 1
+        try:
+            yield self
+        finally:
+            with ThreadPolicy._condition:
+                ThreadPolicy._active -= 1
+                if ThreadPolicy._active == 0:
+                    ThreadPolicy._restore(ThreadPolicy._saved)
+                    ThreadPolicy._applied = None
+                    ThreadPolicy._condition.notify_all()
+
+    def _apply(self):
+        if self.intra_op_threads is not None:
+            # Worker processes inherit these, i.e. one worker's share of the threads
+            for variable in ThreadPolicy.ENVIRONMENT:
+                os.environ[variable] = str(self.intra_op_threads)
+        if self.workers is not None:
+            # Tokenizing in parallel inside worker threads/processes only adds contention
+            os.environ["TOKENIZERS_PARALLELISM"] = "true" if self.workers == 1 and self.threads > 1 else "false"
+
+        # torch reads the environment on import; adjust it directly if it is already imported.
+        # Importing it here would slow down steps that do not need it.
+        torch = sys.modules.get("torch")
+        if torch is None:
+            return
+        if self.intra_op_threads is not None:
+            torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads is not None and torch.get_num_interop_threads() != self.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError:
+                # Can only be set before the first inter-op parallel work of the process
+                pass
+
+    @staticmethod
+    def _currentSettings() -> dict:
+        environment = {variable: os.environ.get(variable)
+                       for variable in ThreadPolicy.ENVIRONMENT + ("TOKENIZERS_PARALLELISM",)}
+        torch = sys.modules.get("torch")
+        return {"environment": environment, "torch_threads": torch.get_num_threads() if torch else None}
+
+    @staticmethod
+    def _restore(settings: dict):
+        for variable, value in settings["environment"].items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+        torch = sys.modules.get("torch")
+        if torch is None:
+            return
+        threads = settings["torch_threads"]
+        if threads is None:
+            # torch was imported during the step; fall back to what it would have used without the policy
+            omp_threads = settings["environment"].get("OMP_NUM_THREADS")
+            threads = int(omp_threads) if omp_threads else (os.cpu_count() or 1)
+        torch.set_num_threads(threads)
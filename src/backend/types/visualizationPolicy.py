@@ -0,0 +1,130 @@
+import html
+import random
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from backend.transferObjects.visualization import Visualization, HTMLViz
+
+
+class VisualizationPolicy:
+    FIRST_N = "first"
+    RESERVOIR = "reservoir"
+
+    def __init__(self, max_visualizations: Optional[int] = None, sampling: str = FIRST_N, seed: int = 0,
+                 summary_entries: int = 20):
+        """
+        :param max_visualizations: Maximum number of visualizations kept per step. None keeps all of them.
+        :param sampling: "first" keeps the first visualizations, "reservoir" keeps a uniform random sample.
+        :param seed: Seed of the reservoir sampling, so that reruns show the same sample.
+        :param summary_entries: Number of entries shown per table of the summary visualization.
+        """
+        if sampling not in (VisualizationPolicy.FIRST_N, VisualizationPolicy.RESERVOIR):
+            raise ValueError(f"Unknown visualization sampling '{sampling}'.")
+        self.max_visualizations = max_visualizations
+        self.sampling = sampling
+        self.seed = seed
+        self.summary_entries = summary_entries
+
+
+class VisualizationCollector:
+    """
+    Collects the visualizations of one step according to a VisualizationPolicy. Visualizations beyond the limit
+    are dropped (or replace sampled ones), while summaries are aggregated incrementally, so memory stays constant
+    regardless of the number of rows.
+    """
+
+    def __init__(self, policy: VisualizationPolicy = None):
+        self.policy = policy if policy else VisualizationPolicy()
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.samples = []  # (position, visualization)
+        self.seen = 0
+        self.summaries: Dict[str, Counter] = {}
+        self.random = random.Random(self.policy.seed)
+
+    def setPolicy(self, policy: VisualizationPolicy):
+        with self.lock:
+            self.policy = policy
+            self.random = random.Random(policy.seed)
+
+    def add(self, viz: Visualization):
+        with self.lock:
+            self._add(viz)
+
+    def _add(self, viz: Visualization):
+        position = self.seen
+        self.seen += 1
+        limit = self.policy.max_visualizations
+        if limit is None or len(self.samples) < limit:
+            self.samples.append((position, viz))
+        elif self.policy.sampling == VisualizationPolicy.RESERVOIR:
+            replace = self.random.randrange(self.seen)
+            if replace < limit:
+                self.samples[replace] = (position, viz)
+
+    def summarize(self, title: str, key, amount: int = 1):
+        with self.lock:
+            self.summaries.setdefault(title, Counter())[key] += amount
+
+    def merge(self, other: "VisualizationCollector"):
+        """
+        Adds the visualizations and summaries collected by another collector (e.g. of a worker) to this one.
+        Visualizations the other collector already dropped still count as seen.
+        """
+        with self.lock:
+            for _, viz in sorted(other.samples, key=lambda sample: sample[0]):
+                self._add(viz)
+            self.seen += other.seen - len(other.samples)
+            for title, counts in other.summaries.items():
+                self.summaries.setdefault(title, Counter()).update(counts)
+
+    def pop(self) -> List[Visualization]:
+        """
+        Returns the kept visualizations in order of their addition, followed by a summary visualization if
+        visualizations were dropped or summaries were collected. Resets the collector.
+        """
+        with self.lock:
+            visualizations = [viz for _, viz in sorted(self.samples, key=lambda sample: sample[0])]
+            if self.summaries or self.seen > len(self.samples):
+                visualizations.append(self._buildSummary())
+            self._reset()
+            return visualizations
+
+    def _buildSummary(self) -> HTMLViz:
+        summary_html = """
+        <div style="font-family: Arial, sans-serif; padding: 20px; border: 1px solid #ddd; border-radius: 8px;">
+            <h4 style="text-align: center; color: #333; margin-bottom: 16px;">Summary</h4>
+        """
+        if self.seen > len(self.samples):
+            sampling = "randomly sampled" if self.policy.sampling == VisualizationPolicy.RESERVOIR else "first"
+            summary_html += (f"<p style='margin: 5px 0; color: #555;'>Showing {len(self.samples)} ({sampling}) "
+                             f"of {self.seen} visualizations.</p>")
+
+        for title, counts in self.summaries.items():
+            summary_html += f"""
+            <h5 style="margin: 12px 0 4px 0; color: #333;">{html.escape(str(title))}</h5>
+            <table style="border-collapse: collapse;">
+            """
+            for key, count in counts.most_common(self.policy.summary_entries):
+                summary_html += (f"<tr><td style='border: 1px solid #ddd; padding: 4px 8px;'>{html.escape(str(key))}</td>"
+                                 f"<td style='border: 1px solid #ddd; padding: 4px 8px;'>{count}</td></tr>")
+            summary_html += "</table>"
+            if len(counts) > self.policy.summary_entries:
+                summary_html += (f"<p style='margin: 4px 0; color: #888;'>... and {len(counts) - self.policy.summary_entries} "
+                                 f"more.</p>")
+
+        summary_html += "</div>"
+        return HTMLViz(summary_html)
+
+    def __getstate__(self):
+        # Locks cannot be pickled, e.g. when collectors are returned by worker processes.
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
@@ -0,0 +1,160 @@
+"""
+Worker processes that share the models of their operation.
+
+Worker processes are forked from a fork server that has loaded the operation's required models (see
+StepOperation.requiredModels) into its model registry first. The workers inherit the loaded weights copy-on-write
+instead of loading them once per worker, so additional workers only cost the memory they write to. The fork server
+itself is a fresh, single-threaded process, which makes forking it safe also while the application runs threads.
+
+Weights are not written to during inference; the only pages that get copied are those of Python objects whose
+reference counts change, which are small compared to the tensors.
+"""
+import base64
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+from contextlib import contextmanager
+from multiprocessing import forkserver
+
+from backend.transferObjects.eventTransferObjects import LogLevels
+from backend.types.frontendNotifier import FrontendNotifier, ShardNotifier
+
+# Hands the operation to preload for to the fork server, which only receives module names and its environment
+PRELOAD_VARIABLE = "ATAP_WORKER_PRELOAD"
+
+# The fork server only loads models; threads started by OpenMP/MKL or tokenizers before forking would not exist in
+# the workers and can leave their libraries in a broken state there. Set by the server itself, before it loads them.
+_SERVER_ENVIRONMENT = {
+    "OMP_NUM_THREADS": "1",
+    "MKL_NUM_THREADS": "1",
+    "TOKENIZERS_PARALLELISM": "false"
+}
+
+# Held while the environment of this process is changed to start the fork server (the only way to pass it the
+# payload and sys.path). Code starting subprocesses holds it too, so that they do not inherit these changes.
+ENVIRONMENT_LOCK = threading.Lock()
+
+# Replacing a running fork server relies on ForkServer._stop, a private API of multiprocessing (Python 3.8+).
+# Without it, a fork server that was started for other models is not replaced, and workers use the default start
+# method instead.
+_CAN_STOP_SERVER = sys.version_info >= (3, 8) and hasattr(forkserver.ForkServer, "_stop")
+
+_lock = threading.Lock()
+# Preload payload of the running fork server and the number of process pools currently forking from it
+_preloaded = None
+_users = 0
+
+
+def _payload(operation_class, config) -> str:
+    return base64.b64encode(pickle.dumps((operation_class, config))).decode("ascii")
+
+
+@contextmanager
+def workerContext(operation_class, config, notifier: FrontendNotifier):
+    """
+    Yields the multiprocessing context to create the worker processes of the operation with.
+
+    Operations that require models get a fork server that has loaded them. The fork server is replaced when an
+    operation needs different models, but not while another process pool still forks from it; its workers then
+    load the models themselves. Operations without models, platforms without fork servers, frozen builds and
+    fork servers that cannot be (re)started use the default start method.
+    """
+    global _users
+
+    if "forkserver" not in multiprocessing.get_all_start_methods() or getattr(sys, "frozen", False) \
+            or not operation_class.requiredModels(config):
+        yield multiprocessing.get_context()
+        return
+
+    payload = _payload(operation_class, config)
+    with _lock:
+        started = True
+        if payload != _preloaded:
+            if _users == 0:
+                notifier.log("Starting worker fork server and loading the models shared by the workers.",
+                             LogLevels.INFO)
+                try:
+                    started = _startForkServer(payload)
+                except Exception as e:
+                    notifier.log(f"Could not start the worker fork server: {repr(e)}", LogLevels.WARN)
+                    started = False
+            else:
+                notifier.log("The worker fork server is in use by another step; each worker loads its own models.",
+                             LogLevels.WARN)
+        if started:
+            _users += 1
+
+    if not started:
+        notifier.log("Workers are started with the default method and load their own models.", LogLevels.WARN)
+        yield multiprocessing.get_context()
+        return
+    try:
+        yield multiprocessing.get_context("forkserver")
+    finally:
+        with _lock:
+            _users -= 1
+
+
+def _startForkServer(payload: str) -> bool:
+    """
+    Starts a fork server that preloads the models of the payload, replacing a running one. Returns False if a
+    running fork server cannot be replaced.
+    """
+    global _preloaded
+
+    server = forkserver._forkserver
+    # Preloaded modules are only imported when the server starts, so a running server must be replaced.
+    # Processes forked from it earlier keep running.
+    if getattr(server, "_forkserver_pid", None) is not None:
+        if not _CAN_STOP_SERVER:
+            return False
+        server._stop()
+
+    environment = {
+        PRELOAD_VARIABLE: payload,
+        # The fork server does not inherit sys.path, which is needed to import the backend and the operation
+        "PYTHONPATH": os.pathsep.join(path for path in sys.path if path and os.path.isdir(path))
+    }
+    with ENVIRONMENT_LOCK:
+        saved = {variable: os.environ.get(variable) for variable in environment}
+        os.environ.update(environment)
+        try:
+            forkserver.set_forkserver_preload([__name__])
+            forkserver.ensure_running()
+        finally:
+            for variable, value in saved.items():
+                if value is None:
+                    os.environ.pop(variable, None)
+                else:
+                    os.environ[variable] = value
+    _preloaded = payload
+    return True
+
+
+def preloadModels(payload: str):
+    """
+    Loads the required models of the operation in the payload into the model registry of this process.
+    """
+    try:
+        operation_class, config = pickle.loads(base64.b64decode(payload))
+        loaders = operation_class.requiredModels(config)
+    except Exception as e:
+        print(f"Worker fork server cannot determine the models to preload: {repr(e)}")
+        return
+
+    notifier = ShardNotifier()
+    for loader in loaders:
+        try:
+            loader(notifier)
+        except Exception as e:
+            # The workers load the model themselves and report the error there
+            print(f"Worker fork server could not preload a model of {operation_class.__name__}: {repr(e)}")
+
+
+# Imported by the fork server on startup (see _startForkServer); the variable is removed so that the workers,
+# which already share this module, do not preload again.
+if os.environ.get(PRELOAD_VARIABLE):
+    os.environ.update(_SERVER_ENVIRONMENT)
+    preloadModels(os.environ.pop(PRELOAD_VARIABLE))
@@ -31,10 +31,10 @@ const RunScreen: React.FC<RunScreenProps> = ({ pipeline, inputHandle }) => {
             const newRunId = await startRun(pipeline.id, inputHandle);
             if (newRunId) {
                 setRunId(newRunId);
-                // Initialize step statuses
+                // Initialize step statuses; the run waits in the backend's run queue until its first step starts
                 const initialStatuses = pipeline.steps.map((step, index) => ({
                     domain: { runId: newRunId, pipelineId: pipeline.id, stepIndex: index },
-                    state: StepState.NOT_STARTED,
+                    state: index === 0 ? StepState.QUEUED : StepState.NOT_STARTED,
                     progress: 0,
                 }));
                 setStepsStatus(initialStatuses);
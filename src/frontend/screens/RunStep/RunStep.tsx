@@ -87,6 +87,8 @@ const RunStep: React.FC<RunStepProps> = ({ step, status, isActive, runId, stepNu
             statusClass = 'failed';
         } else if (status.state === StepState.RUNNING) {
             statusClass = 'running';
+        } else if (status.state === StepState.QUEUED) {
+            statusClass = 'queued';
         } else {
             statusClass = 'not-started';
         }
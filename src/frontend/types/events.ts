@@ -5,6 +5,7 @@ export enum StepState {
     RUNNING = 1,
     SUCCESS = 2,
     FAILED = 3,
+    QUEUED = 4,
 }
 
 export interface NotificationDomain {
@@ -139,6 +139,19 @@ export async function startRun(pipelineId, input : InputHandle): Promise<string>
   }
 }
 
+// Queues the resumption of a finished run at the given step in a separate thread, using the data saved before that step
+export async function resumeRun(run_id: string, from_step: number): Promise<string> {
+  await waitForPywebview()
+  try {
+    const response = await window.pywebview.api.RUNS.resumeRun(run_id, from_step);
+    const result = unpackResponse(response)
+    return result as string;
+  } catch (error) {
+    console.error("Failed to invoke event:", error);
+    return null;
+  }
+}
+
 export async function getRunVisualization(run_id : string, step_index: number): Promise<VisualizationData> {
   await waitForPywebview()
   try {
@@ -1,5 +1,6 @@
 print("Starting NLP Toolkit Backend...")
 
+import multiprocessing
 import os
 import sys
 import threading
@@ -7,6 +8,10 @@ import webview
 import encodings
 from backend.core.Api import Api
 from backend.core.register import GlobalRegistry
+from backend.operations.model_prewarmer import PREWARMER
+
+# Models loaded in the background at startup, see ModelPrewarmer.prewarmModels
+STARTUP_MODELS = ["spacy:en_core_web_sm"]
 
 
 def get_entrypoint():
@@ -35,6 +40,7 @@ def initialize_api(window):
     api = Api(GlobalRegistry)
     print("API initialized")
     window._js_api = api
+    PREWARMER.prewarmModels(STARTUP_MODELS)
 
 
 def loading_window():
@@ -43,6 +49,8 @@ def loading_window():
 
 
 if __name__ == '__main__':
+    # Required for worker processes of operations running in 'processes' mode in packaged builds
+    multiprocessing.freeze_support()
     # loading_window()
     do_debug = not getattr(sys, 'frozen', False)  # Debug mode if not frozen (i.e., not packaged)
 